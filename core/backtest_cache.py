@@ -0,0 +1,173 @@
+"""core/backtest_cache.py
+=======================
+Content-addressed cache of :class:`~core.result_extractor.BacktestResult`.
+
+Keys are SHA-256 digests of the *normalised* Pine Script source (comments,
+trailing whitespace and blank lines removed) together with the symbol,
+timeframe and date range the back-test ran over, so bred children that are
+textually identical to an already evaluated strategy never hit the runner
+again.
+
+Entries live in a :class:`~core.blob_store.BlobStore`: an in-process LRU
+for hot entries over an optional SQLite file that survives restarts, with
+size- and age-based eviction.
+
+Usage example:
+```python
+from core.backtest_cache import BacktestCache, CachedBacktestRunner
+from core.backtest_runner import BacktestRunner
+
+cache = BacktestCache("backtest_cache.db", max_entries=200_000, max_age=7 * 86400)
+runner = CachedBacktestRunner(BacktestRunner(), cache, symbol="BTCUSDT", timeframe="1D")
+result = runner.run_backtest(pine_code)
+print(cache.stats)
+```
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+from core.blob_store import BlobStore, CacheStats
+from core.result_extractor import BacktestResult
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "normalize_pine",
+    "backtest_key",
+    "CacheStats",
+    "BacktestCache",
+    "CachedBacktestRunner",
+]
+
+# Strings are matched first so that "//" inside a string literal survives.
+_COMMENT_RE = re.compile(r"""("(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')|//[^\n]*""")
+
+
+def normalize_pine(source: str) -> str:
+    """Return *source* without comments, trailing whitespace or blank lines."""
+    source = source.replace("\r\n", "\n").replace("\t", "    ")
+    source = _COMMENT_RE.sub(lambda m: m.group(1) or "", source)
+    return "\n".join(line.rstrip() for line in source.split("\n") if line.strip())
+
+
+def backtest_key(
+    source: str,
+    symbol: str = "",
+    timeframe: str = "",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> str:
+    """Content hash identifying one back-test of *source* on one data slice."""
+    h = hashlib.sha256()
+    for part in (normalize_pine(source), symbol, timeframe, start or "", end or ""):
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _encode(result: BacktestResult) -> str:
+    return json.dumps(asdict(result))
+
+
+def _decode(text: str) -> BacktestResult:
+    return BacktestResult(**json.loads(text))
+
+
+class BacktestCache:
+    """Two-level LRU cache of back-test results (a :class:`~core.blob_store.BlobStore`).
+
+    Args:
+        path: SQLite file for the persistent layer; ``None`` keeps the cache
+            in memory only.
+        memory_size: Maximum number of entries in the in-process LRU.
+        max_entries: Maximum number of rows kept on disk (least recently
+            used rows are evicted first).
+        max_age: Seconds after which an entry expires; ``None`` disables
+            age-based eviction.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        memory_size: int = 4096,
+        max_entries: int = 100_000,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self._store = BlobStore(
+            path, "backtest_results", memory_size=memory_size, max_entries=max_entries,
+            max_age=max_age, encode=_encode, decode=_decode,
+        )
+        self.stats: CacheStats = self._store.stats
+
+    @property
+    def max_age(self) -> Optional[float]:
+        return self._store.max_age
+
+    @max_age.setter
+    def max_age(self, value: Optional[float]) -> None:
+        self._store.max_age = value
+
+    def get(self, key: str) -> Optional[BacktestResult]:
+        """Return the cached result for *key* or ``None`` on a miss."""
+        return self._store.get(key)
+
+    def put(self, key: str, result: BacktestResult) -> None:
+        """Store *result* under *key* in both layers."""
+        self._store.put(key, result)
+
+    def evict(self) -> int:
+        """Drop expired rows and trim the disk layer to ``max_entries``."""
+        return self._store.evict()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def close(self) -> None:
+        """Run a final eviction pass and close the SQLite connection."""
+        self._store.close()
+
+
+class CachedBacktestRunner:
+    """Wrap any runner with a :class:`BacktestCache`; same ``run_backtest`` API.
+
+    Parts of the data slice that are not given are taken from the runner's
+    ``cache_slice()`` (``(symbol, timeframe, start, end)``) when it has one,
+    so a cache file reused with other market data never returns stale
+    results.
+    """
+
+    def __init__(
+        self,
+        runner,
+        cache: BacktestCache,
+        symbol: str = "",
+        timeframe: str = "",
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> None:
+        own = runner.cache_slice() if hasattr(runner, "cache_slice") else ("", "", None, None)
+        self.runner = runner
+        self.cache = cache
+        self.symbol = symbol or own[0]
+        self.timeframe = timeframe or own[1]
+        self.start = start if start is not None else own[2]
+        self.end = end if end is not None else own[3]
+
+    def key(self, pine_script: str) -> str:
+        return backtest_key(pine_script, self.symbol, self.timeframe, self.start, self.end)
+
+    def run_backtest(self, pine_script: str) -> BacktestResult:
+        key = self.key(pine_script)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.runner.run_backtest(pine_script)
+            if isinstance(result, BacktestResult):
+                self.cache.put(key, result)
+        return result
@@ -30,10 +30,10 @@ from playwright.sync_api import Browser, BrowserContext
 
 DEFAULT_VIEWPORT: Final = {"width": 1920, "height": 1080}
 
-def _launch_stealth_browser(pw) -> Browser:
+def _launch_stealth_browser(pw, headless: bool = False) -> Browser:
     """以常見反偵測參數啟動 Chrome／Chromium。"""
     return pw.chromium.launch(
-        headless=False,
+        headless=headless,
         channel="chrome",
         args=[
             "--disable-blink-features=AutomationControlled",
@@ -43,8 +43,11 @@ def _launch_stealth_browser(pw) -> Browser:
         ],
     )
 
-def _new_stealth_context(browser: Browser) -> BrowserContext:
-    """隨機 UA + 常用標頭 + JS 覆寫，建立新 context。"""
+def _new_stealth_context(browser: Browser, storage_state: str | Path | None = None) -> BrowserContext:
+    """隨機 UA + 常用標頭 + JS 覆寫，建立新 context。
+
+    *storage_state* 為 ``scripts/gen_tv_state.py`` 匯出的登入狀態檔，給定時免登入。
+    """
     ua = UserAgent()
     user_agent = ua.random
     extra_headers = {
@@ -62,6 +65,7 @@ def _new_stealth_context(browser: Browser) -> BrowserContext:
         locale="en-US",
         timezone_id="Asia/Taipei",
         extra_http_headers=extra_headers,
+        storage_state=str(storage_state) if storage_state is not None else None,
     )
     context.add_init_script(
         """
@@ -73,52 +77,262 @@ def _new_stealth_context(browser: Browser) -> BrowserContext:
     )
     return context
 
-def run_backtest(pine_script: str) -> BacktestResult:
-    with sync_playwright() as pw:
-        browser = _launch_stealth_browser(pw)   # 隨機 UA、--disable-blink-features
-        context = _new_stealth_context(browser) # extra headers + navigator 改寫
-        page = context.new_page()
+class BacktestRunner:
+    """以 Playwright 驅動 TradingView 網頁執行回測的 runner。
+
+    每次 :meth:`run_backtest` 都會啟動新的瀏覽器並重新登入；
+    大量回測請改用共用登入 session 的 :class:`SessionBacktestRunner`，
+    不需要瀏覽器的本地回測請改用 :class:`core.local_backtest.LocalBacktestRunner`。
+    """
+
+    def run_backtest(self, pine_script: str) -> BacktestResult:
+        with sync_playwright() as pw:
+            browser = _launch_stealth_browser(pw)   # 隨機 UA、--disable-blink-features
+            context = _new_stealth_context(browser) # extra headers + navigator 改寫
+            page = context.new_page()
+
+
+            try:
+                # Phase 1
+                logging.info("P1 → signin")
+                page.goto("https://www.tradingview.com/accounts/signin/",
+                          timeout=PLAYWRIGHT_TIMEOUT)
+                logging.info("P1 URL: %s", page.url)
+                _dump(page, "p1_signin")
+
+                # Phase 2
+                logging.info("P2 → fill login")
+                page.wait_for_selector('input[type="email"]', timeout=PLAYWRIGHT_TIMEOUT)
+                page.fill('input[type="email"]', TV_EMAIL)
+                page.fill('input[type="password"]', TV_PASSWORD)
+                _dump(page, "p2_filled")
+                page.click('button[type="submit"]', timeout=PLAYWRIGHT_TIMEOUT)
+
+                # ※ 這行最常 timeout
+                page.wait_for_url("**/chart/**", timeout=PLAYWRIGHT_TIMEOUT)
+                logging.info("P2 URL after submit: %s", page.url)
+                _dump(page, "p2_after_login")
+
+                # Phase 3
+                logging.info("P3 → goto chart")
+                page.goto("https://www.tradingview.com/chart/", timeout=PLAYWRIGHT_TIMEOUT)
+                logging.info("P3 URL: %s", page.url)
+                _dump(page, "p3_chart")
+
+                # Phase 4
+                logging.info("P4 → open Pine Editor")
+                selector = 'button[aria-label="Pine editor"]'
+                page.wait_for_selector(selector, timeout=PLAYWRIGHT_TIMEOUT)
+                page.click(selector)
+                _dump(page, "p4_editor")
+
+            except Exception as exc:
+                logging.error("⚠️  偵錯捕獲：%s", exc)
+                traceback.print_exc(file=sys.stderr)
+            finally:
+                browser.close()
+
+        # 先回傳空結果
+        return BacktestResult(0, 0, 0, 0, 0, 0)
+
+
+# --------------------------------------------------------------------------- #
+# Session reuse：載入 tv_state.json 一次，整個世代共用同一個 Pine Editor 頁面
+# --------------------------------------------------------------------------- #
+import threading
+import time
+from core.result_extractor import extract_report
+
+TV_STATE_FILE = Path("tv_state.json")
+CHART_URL = "https://www.tradingview.com/chart/"
+#: TradingView 介面改版時只需調整這裡
+SELECTORS = {
+    "pine_editor": 'button[aria-label="Pine editor"]',
+    "editor": ".monaco-editor .view-lines",
+    "add_to_chart": 'button[title="Add to chart"]',
+    "strategy_tester": 'button[data-name="backtesting"]',
+    "report": '[data-name="backtesting-content-wrapper"]',
+    "compile_error": '[data-name="pine-console"] .error',
+}
+
+
+class SessionBacktestRunner:
+    """共用登入 session 的 TradingView runner。
 
+    第一次回測時以 ``tv_state.json``（``scripts/gen_tv_state.py`` 匯出的
+    cookies/localStorage）建立 browser context，開啟圖表與 Pine Editor
+    後一直保留；之後每個候選策略只替換編輯器內容、加入圖表並重新讀取
+    Strategy Tester 報表，省下每次約一分鐘的啟動、登入與導航。
 
+    Playwright sync 物件只能在建立它的執行緒使用，請搭配
+    ``executor="serial"``；``"process"`` 時每個 worker 各自開一個 session
+    （pickle 時只保留設定）。回測失敗會拋出例外並重開頁面，
+    ``recycle_after`` 次回測後也會重開頁面以限制記憶體成長。
+
+    Usage example:
+    ```python
+    with SessionBacktestRunner("tv_state.json") as runner:
+        results = [runner.run_backtest(code) for code in population_codes]
+    ```
+    """
+
+    def __init__(
+        self,
+        storage_state: str | Path = TV_STATE_FILE,
+        chart_url: str = CHART_URL,
+        headless: bool = False,
+        timeout: float = PLAYWRIGHT_TIMEOUT,
+        recycle_after: int | None = 200,
+    ) -> None:
+        self.storage_state = Path(storage_state)
+        self.chart_url = chart_url
+        self.headless = headless
+        self.timeout = timeout
+        self.recycle_after = recycle_after
+        self.evaluations = 0
+        self._pw = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._owner: int | None = None
+        self._since_open = 0
+        self._lock = threading.Lock()
+
+    def cache_slice(self) -> tuple:
+        """以圖表 URL 區分回測快取（不同圖表版面的商品與週期不同）。"""
+        return self.chart_url, "", None, None
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in
+                ("storage_state", "chart_url", "headless", "timeout", "recycle_after")}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(**state)
+
+    # ------------------------------------------------------------------
+    # Session
+    # ------------------------------------------------------------------
+
+    def open(self) -> None:
+        """啟動瀏覽器、載入登入狀態並開啟 Pine Editor（已開啟則略過）。"""
+        if self._page is not None:
+            return
+        if not self.storage_state.exists():
+            raise FileNotFoundError(
+                f"{self.storage_state} not found; run scripts/gen_tv_state.py to log in once")
+        start = time.perf_counter()
+        if self._pw is None:
+            self._pw = sync_playwright().start()
+            self._owner = threading.get_ident()
+        if self._browser is None:
+            self._browser = _launch_stealth_browser(self._pw, self.headless)
+            self._context = _new_stealth_context(self._browser, self.storage_state)
+        page = self._context.new_page()
         try:
-            # Phase 1
-            logging.info("P1 → signin")
-            page.goto("https://www.tradingview.com/accounts/signin/",
-                      timeout=PLAYWRIGHT_TIMEOUT)
-            logging.info("P1 URL: %s", page.url)
-            _dump(page, "p1_signin")
-
-            # Phase 2
-            logging.info("P2 → fill login")
-            page.wait_for_selector('input[type="email"]', timeout=PLAYWRIGHT_TIMEOUT)
-            page.fill('input[type="email"]', TV_EMAIL)
-            page.fill('input[type="password"]', TV_PASSWORD)
-            _dump(page, "p2_filled")
-            page.click('button[type="submit"]', timeout=PLAYWRIGHT_TIMEOUT)
-
-            # ※ 這行最常 timeout
-            page.wait_for_url("**/chart/**", timeout=PLAYWRIGHT_TIMEOUT)
-            logging.info("P2 URL after submit: %s", page.url)
-            _dump(page, "p2_after_login")
-
-            # Phase 3
-            logging.info("P3 → goto chart")
-            page.goto("https://www.tradingview.com/chart/", timeout=PLAYWRIGHT_TIMEOUT)
-            logging.info("P3 URL: %s", page.url)
-            _dump(page, "p3_chart")
-
-            # Phase 4
-            logging.info("P4 → open Pine Editor")
-            selector = 'button[aria-label="Pine editor"]'
-            page.wait_for_selector(selector, timeout=PLAYWRIGHT_TIMEOUT)
-            page.click(selector)
-            _dump(page, "p4_editor")
-
-        except Exception as exc:
-            logging.error("⚠️  偵錯捕獲：%s", exc)
-            traceback.print_exc(file=sys.stderr)
-        finally:
-            browser.close()
-
-    # 先回傳空結果
-    return BacktestResult(0, 0, 0, 0, 0, 0)
+            page.goto(self.chart_url, timeout=self.timeout)
+            if "/signin" in page.url:
+                raise RuntimeError(f"Saved TradingView login in {self.storage_state} has expired; "
+                                   "rerun scripts/gen_tv_state.py")
+            page.wait_for_selector(SELECTORS["pine_editor"], timeout=self.timeout)
+            page.click(SELECTORS["pine_editor"])
+            page.wait_for_selector(SELECTORS["editor"], timeout=self.timeout)
+            page.click(SELECTORS["strategy_tester"])
+        except Exception:
+            page.close()
+            raise
+        self._page = page
+        self._since_open = 0
+        logging.info("TradingView session ready in %.1fs", time.perf_counter() - start)
+
+    def _reset_page(self) -> None:
+        if self._page is not None:
+            try:
+                self._page.close()
+            except Exception:  # page or browser already gone
+                pass
+            self._page = None
+
+    def close(self) -> None:
+        """關閉頁面、context、瀏覽器與 Playwright。"""
+        self._reset_page()
+        for handle in (self._context, self._browser):
+            if handle is not None:
+                try:
+                    handle.close()
+                except Exception:
+                    pass
+        self._context = self._browser = None
+        if self._pw is not None:
+            self._pw.stop()
+            self._pw = None
+
+    def __enter__(self) -> "SessionBacktestRunner":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Back-test
+    # ------------------------------------------------------------------
+
+    def _report_html(self) -> str:
+        report = self._page.query_selector(SELECTORS["report"])
+        return report.inner_html() if report is not None else ""
+
+    def _replace_script(self, pine_script: str) -> None:
+        page = self._page
+        page.click(SELECTORS["editor"])
+        page.keyboard.press("ControlOrMeta+A")
+        page.keyboard.press("Delete")
+        page.keyboard.insert_text(pine_script)  # 一次貼上，不逐字輸入
+        page.click(SELECTORS["add_to_chart"])
+
+    def _await_report(self, previous: str) -> BacktestResult:
+        """等待報表更新並解析；編譯錯誤或報表逾時未更新則拋出例外。"""
+        page = self._page
+        deadline = time.monotonic() + self.timeout / 1000
+        while True:
+            error = page.query_selector(SELECTORS["compile_error"])
+            if error is not None:
+                raise ValueError(f"Pine compile error: {error.inner_text().strip()}")
+            html = self._report_html()
+            if html and html != previous:
+                report = extract_report(html)
+                if not [name for name in report.missing if name != "profit_factor"]:
+                    return report.to_result()
+            if time.monotonic() >= deadline:
+                # 報表沒變可能是新策略仍在編譯或靜默失敗，不能沿用上一個策略的結果
+                state = "did not change" if html else "did not appear"
+                raise PWTimeoutError(f"Strategy report {state} within {self.timeout / 1000:.0f}s")
+            page.wait_for_timeout(250)
+
+    def run_backtest(self, pine_script: str) -> BacktestResult:
+        with self._lock:
+            if self._owner is not None and self._owner != threading.get_ident():
+                raise RuntimeError("SessionBacktestRunner must be used from the thread that opened it")
+            if self.recycle_after is not None and self._since_open >= self.recycle_after:
+                self._reset_page()
+            self.open()
+            try:
+                previous = self._report_html()
+                self._replace_script(pine_script)
+                result = self._await_report(previous)
+            except Exception:
+                try:
+                    _dump(self._page, f"session_error_{self.evaluations}")
+                except Exception:
+                    pass
+                self._reset_page()  # 下一個候選從乾淨頁面開始
+                if not self._browser.is_connected():
+                    self.close()  # 瀏覽器當掉：下次重新啟動
+                raise
+            finally:
+                self.evaluations += 1
+                self._since_open += 1
+            return result
+
+
+def run_backtest(pine_script: str) -> BacktestResult:
+    """以預設 :class:`BacktestRunner` 執行單次回測。"""
+    return BacktestRunner().run_backtest(pine_script)
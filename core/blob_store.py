@@ -0,0 +1,210 @@
+"""core/blob_store.py
+===================
+Keyed store of text values shared by the result caches
+(:mod:`core.backtest_cache`, :mod:`core.llm_cache`).
+
+Two layers are used:
+- an optional in-process LRU (:class:`collections.OrderedDict`) of decoded
+  values for hot entries
+- an optional SQLite table that survives restarts, with age (TTL) and size
+  (least recently used) eviction
+
+Values are stored as text; ``encode``/``decode`` convert them from and to
+the caller's objects, so the memory layer never decodes twice.
+
+Usage example:
+```python
+from core.blob_store import BlobStore
+
+store = BlobStore("cache.db", "my_cache", memory_size=1024, max_entries=10_000, max_age=86400)
+store.put("key", "value")
+assert store.get("key") == "value"
+print(store.stats)
+```
+"""
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["CacheStats", "BlobStore"]
+
+_TABLE_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+@dataclass
+class CacheStats:
+    """Hit/miss counters of a :class:`BlobStore`."""
+
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class BlobStore:
+    """Two-level LRU store of text values.
+
+    Args:
+        path: SQLite file for the persistent layer; ``None`` keeps the store
+            in memory only.
+        table: Name of the SQLite table, so several stores can share a file.
+        memory_size: Maximum number of entries in the in-process LRU
+            (``0`` disables it).
+        max_entries: Maximum number of rows kept on disk (least recently
+            used rows are evicted first).
+        max_age: Seconds after which an entry expires; ``None`` disables
+            age-based eviction.
+        encode, decode: Convert values to and from the stored text.
+        evict_every: Puts between on-disk eviction passes.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None,
+        table: str,
+        memory_size: int = 0,
+        max_entries: int = 100_000,
+        max_age: Optional[float] = None,
+        encode: Callable[[Any], str] = _identity,
+        decode: Callable[[str], Any] = _identity,
+        evict_every: int = 256,
+    ) -> None:
+        if not _TABLE_RE.match(table):
+            raise ValueError(f"Invalid table name {table!r}")
+        self.table = table
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.encode = encode
+        self.decode = decode
+        self.evict_every = evict_every
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_accessed ON {table} (accessed_at)")
+            self._conn.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.max_age is not None and now - created_at > self.max_age
+
+    def _remember(self, key: str, created_at: float, value: Any) -> None:
+        if self.memory_size <= 0:
+            return
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the decoded value for *key* or ``None`` on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[0], now):
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+            if self._conn is not None:
+                row = self._conn.execute(
+                    f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    value = self.decode(row[0])
+                    self._remember(key, row[1], value)
+                    self.stats.disk_hits += 1
+                    return value
+            self.stats.misses += 1
+            return None
+
+    def put(self, key: str, value: Any) -> int:
+        """Store *value* under *key* in both layers; returns the rows evicted meanwhile."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._conn is None:
+                return 0
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, self.encode(value), now, now),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                return self._evict_locked(now)
+            return 0
+
+    def evict(self) -> int:
+        """Drop expired rows and trim the disk layer to ``max_entries``."""
+        with self._lock:
+            return self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float) -> int:
+        if self._conn is None:
+            return 0
+        removed = 0
+        if self.max_age is not None:
+            removed += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.max_age,)
+            ).rowcount
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_entries:
+            removed += self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            ).rowcount
+        self._conn.commit()
+        self.stats.evictions += removed
+        if removed:
+            logger.debug("Evicted %d rows from %s", removed, self.table)
+        return removed
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                return len(self._memory)
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self) -> None:
+        """Run a final eviction pass and close the SQLite connection."""
+        if self._conn is not None:
+            self.evict()
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,160 @@
+"""core/checkpoint.py
+===================
+Per-generation checkpoints of a training run.
+
+A checkpoint holds what is needed to continue evolution exactly where it
+stopped: the population (codes, scores, meta), the trainer's parameters and
+RNG state, and the generation number.  It is one compact JSON file per
+generation, written to a temporary file, fsync'ed and atomically renamed,
+so a crash mid-write never leaves a truncated "latest" checkpoint behind.
+
+Every run writes to its own ``<directory>/<run_id>/`` subdirectory, and only
+the newest ``keep`` files of that run are retained, so runs sharing a
+directory never prune or resume each other's checkpoints.  A checkpoint
+also records the run's configuration so a resume can refuse one written for
+different settings.
+
+Usage example:
+```python
+from core.checkpoint import CheckpointStore, latest_run
+
+store = CheckpointStore("checkpoints", run_id=latest_run("checkpoints"))
+store.save(gen, population, trainer.get_state(), mode="ga", config={"pop_size": 50})
+latest = store.load_latest()
+if latest is not None:
+    trainer.set_state(latest.trainer_state)
+```
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core import instrumentation
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["Checkpoint", "CheckpointStore", "new_run_id", "latest_run"]
+
+_FORMAT_VERSION = 2
+_NAME_RE = re.compile(r"^generation_(\d+)\.json$")
+_RUN_RE = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]*$")
+
+
+def new_run_id() -> str:
+    """A fresh, time-sortable run id such as ``20240501-120000-1a2b3c``."""
+    return time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+
+def latest_run(directory: str | Path) -> Optional[str]:
+    """Id of the run in *directory* whose newest checkpoint is most recent."""
+    root = Path(directory)
+    if not root.is_dir():
+        return None
+    newest: Dict[str, float] = {}
+    for run_dir in root.iterdir():
+        if not run_dir.is_dir() or not _RUN_RE.match(run_dir.name):
+            continue
+        mtimes = [p.stat().st_mtime for p in run_dir.iterdir() if _NAME_RE.match(p.name)]
+        if mtimes:
+            newest[run_dir.name] = max(mtimes)
+    return max(newest, key=newest.__getitem__) if newest else None
+
+
+@dataclass
+class Checkpoint:
+    """State of a run after ``generation`` completed."""
+
+    generation: int
+    population: List[Dict[str, Any]]
+    trainer_state: Dict[str, Any] = field(default_factory=dict)
+    mode: str = "ga"
+    run_id: str = ""
+    config: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    version: int = _FORMAT_VERSION
+
+
+class CheckpointStore:
+    """Directory of one run's per-generation checkpoint files.
+
+    Args:
+        directory: Root under which each run gets a subdirectory of
+            ``generation_<n>.json`` files.
+        keep: Number of newest checkpoints of the run to retain.
+        run_id: The run to read and write; a new id when omitted.
+    """
+
+    def __init__(self, directory: str | Path = "checkpoints", keep: int = 3,
+                 run_id: Optional[str] = None) -> None:
+        self.run_id = run_id or new_run_id()
+        if not _RUN_RE.match(self.run_id):
+            raise ValueError(f"Invalid run id {self.run_id!r}")
+        self.root = Path(directory)
+        self.directory = self.root / self.run_id
+        self.keep = max(1, keep)
+
+    def _path(self, generation: int) -> Path:
+        return self.directory / f"generation_{generation:05d}.json"
+
+    def generations(self) -> List[int]:
+        """Generations with a checkpoint on disk, ascending."""
+        if not self.directory.is_dir():
+            return []
+        found = (_NAME_RE.match(p.name) for p in self.directory.iterdir())
+        return sorted(int(m.group(1)) for m in found if m)
+
+    def save(
+        self,
+        generation: int,
+        population: List[Dict[str, Any]],
+        trainer_state: Optional[Dict[str, Any]] = None,
+        mode: str = "ga",
+        config: Optional[Dict[str, Any]] = None,
+    ) -> Path:
+        """Atomically write the checkpoint of *generation* and prune the run's old ones."""
+        checkpoint = Checkpoint(generation, list(population), dict(trainer_state or {}), mode,
+                                self.run_id, dict(config or {}))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._path(generation)
+        with instrumentation.span("checkpoint"):
+            fd, tmp = tempfile.mkstemp(prefix=".generation_", suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                    json.dump(asdict(checkpoint), fh, ensure_ascii=False, separators=(",", ":"))
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                os.replace(tmp, target)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp)
+                raise
+        for old in self.generations()[:-self.keep]:
+            with contextlib.suppress(OSError):
+                self._path(old).unlink()
+        return target
+
+    def load(self, generation: int) -> Checkpoint:
+        with self._path(generation).open("r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        if data.get("version") != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {data.get('version')!r}")
+        return Checkpoint(**data)
+
+    def load_latest(self) -> Optional[Checkpoint]:
+        """Return the newest readable checkpoint, or ``None`` if there is none."""
+        for generation in reversed(self.generations()):
+            try:
+                return self.load(generation)
+            except (OSError, ValueError, TypeError) as exc:
+                logger.warning("Skipping unreadable checkpoint %s: %s", self._path(generation), exc)
+        return None
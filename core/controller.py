@@ -3,56 +3,510 @@
 Orchestrates full pipeline: generate → back-test → score → evolve, and persist.
 
 Usage:
-    python core/controller.py --mode ga --generations 10 --pop-size 20 --verbose
+    python core/controller.py --mode ga --generations 10 --pop-size 20 --verbose \
+        --backtest-cache backtest_cache.db --symbol BINANCE:BTCUSDT --timeframe 1D \
+        --executor process --workers 8 \
+        --metrics-json metrics.json --metrics-prom metrics.prom --profile 3
+
+    # overlap LLM calls, back-tests, scoring and DB writes
+    python core/controller.py --mode ga --generations 10 --pop-size 50 --pipelined \
+        --llm-concurrency 8 --workers 4 --queue-size 16
+
+    # continue an interrupted run (the most recent, or --run-id) from its last completed generation
+    python core/controller.py --mode ga --generations 10 --pop-size 20 --resume
+
+    # log in once from tv_state.json and keep one Pine Editor page for the whole run
+    python core/controller.py --mode ga --generations 10 --pop-size 20 --tv-session tv_state.json
+
+    # back-test on job_worker processes of any node sharing DATABASE_URL
+    python core/controller.py --mode ga --generations 10 --pop-size 50 --executor queue
+    python core/job_worker.py --batch 4 --executor process --workers 4   # on each node
+
+    # back-test locally on a CSV file or a core/market_data.py store (required for PPO)
+    python core/controller.py --mode ppo --generations 20 --pop-size 8 --data data/BTCUSDT_1D.csv
+    python core/controller.py --mode ga --generations 10 --pop-size 20 --data data/store \
+        --symbol BTCUSDT,ETHUSDT --timeframe 1D --start-date 2021-01-01
+
+    # four islands in separate processes, best two migrate along a ring every 5 generations
+    python core/controller.py --mode ga --generations 50 --pop-size 80 --islands 4 \
+        --migration-interval 5 --migrants 2 --topology ring
+
+    # the same islands on different nodes, one command per node (i = 0..3)
+    python core/controller.py --mode ga --generations 50 --pop-size 20 --islands 4 \
+        --island-index i --exchange sqlite:////shared/migrants.db --run-id bb-search-1
 """
 import argparse
+import contextlib
 import logging
-from core.strategy_generator import generate_strategy
-from core.backtest_runner import run_backtest, BacktestResult
+import os
+from pathlib import Path
+from core import instrumentation
+from core.strategy_generator import configure_response_cache, generate_strategies, generate_strategy
+from core.llm_cache import LLMResponseCache
+from core.backtest_runner import run_backtest, BacktestResult, BacktestRunner, SessionBacktestRunner
+from core.backtest_cache import BacktestCache, CachedBacktestRunner
+from core.checkpoint import CheckpointStore, latest_run
+from core.local_backtest import LocalBacktestRunner, load_bars
+from core.market_data import MarketDataRunner, MarketDataStore, to_epoch
+from core.islands import IslandModel, exchange_from_url
+from core.pine_validator import PineValidator
+from core.similarity_index import SimilarityIndex
+from core.pipeline import (
+    Pipeline, StageError, backtest_stage, generation_stage, persist_stage, score_stage, validate_stage,
+)
 from core.scorer import scorer_factory
-from core.reinforcement import TrainerFactory
+from core.reinforcement import GATrainer, TrainerFactory
 from database.db_handler import init_db
-from database.strategy_db import save_strategy
+from database.strategy_db import delete_strategies, save_strategies
+
 
+INITIAL_PROMPT = "產生一個隨機 Pine Script 策略"
 
-def create_initial_population(size: int):
-    """Generate an initial population of random Pine Script strategies."""
+
+def create_initial_population(size: int, concurrency: int = 8, fresh: bool = False,
+                              validator: PineValidator | None = None,
+                              similarity_index: SimilarityIndex | None = None):
+    """Generate an initial population of random Pine Script strategies.
+
+    Requests run concurrently; prompts that still fail after retries are
+    dropped from the population instead of aborting the run, as are
+    responses the *validator* can neither accept nor repair and, with a
+    *similarity_index*, near-clones of stored strategies or of each other.
+    """
+    codes = generate_strategies(
+        [INITIAL_PROMPT] * size,
+        concurrency=concurrency, return_exceptions=True, bypass_cache=fresh,
+    )
     population = []
-    for _ in range(size):
-        code = generate_strategy("產生一個隨機 Pine Script 策略")
+    batch = None  # near-clone check within this batch (same hash family as the index)
+    if similarity_index is not None:
+        batch = SimilarityIndex(similarity_index.threshold, similarity_index.num_perm,
+                                similarity_index.shingle_size, similarity_index.seed)
+    for code in codes:
+        if isinstance(code, Exception):
+            logging.warning("Strategy generation failed: %s", code)
+            continue
+        if validator is not None:
+            code = validator.clean(code)
+            if code is None:
+                continue
+        if batch is not None:
+            signature = batch.signature(code)
+            if similarity_index.nearest(code, signature) or batch.nearest(code, signature):
+                continue
+            batch.add(len(population), code, signature=signature)
         population.append({"code": code, "score": 0.0, "meta": {}})
+    if len(population) < len(codes):
+        logging.warning("Dropped %d of %d generated strategies", len(codes) - len(population), len(codes))
     return population
 
 
-def run_pipeline(mode: str, generations: int, pop_size: int, verbose: bool):
-    """Run the full GA/PPO pipeline and persist results to the database."""
+def _drop_failures(items):
+    for item in items:
+        if isinstance(item, StageError):
+            logging.warning("Pipeline item failed in %s", item)
+    return [item for item in items if not isinstance(item, StageError)]
+
+
+def create_initial_population_pipelined(
+    size: int, runner, scorer, llm_workers: int = 8, backtest_workers: int = 4,
+    queue_size: int = 32, fresh: bool = False, validator: PineValidator | None = None,
+    run_id: str | None = None,
+):
+    """Generate, back-test, score and persist (as generation 0) in one pipeline.
+
+    Back-tests start as soon as the first strategy arrives from GPT, so slow
+    LLM calls and slow back-tests overlap.  Failed generations are dropped;
+    strategies the *validator* rejects are kept with a zero score but never
+    back-tested.
+    """
+    stages = [
+        generation_stage(lambda sample: generate_strategy(INITIAL_PROMPT, sample=sample, bypass_cache=fresh),
+                         workers=llm_workers),
+        backtest_stage(runner, workers=backtest_workers),
+        score_stage(scorer),
+        persist_stage(generation=0, run_id=run_id),
+    ]
+    if validator is not None:
+        stages.insert(1, validate_stage(validator))
+    pipe = Pipeline(stages, queue_size=queue_size)
+    return _drop_failures(pipe.run(range(size)))
+
+
+def train_epoch_pipelined(trainer: GATrainer, population, generation: int,
+                          backtest_workers: int = 4, queue_size: int = 32, run_id: str | None = None):
+    """One GA generation with children streamed through back-test → score → persist.
+
+    As in :meth:`GATrainer.train_epoch`, near-clones of scored strategies
+    skip the pipeline and back-tested children join the similarity index.
+    Rows are tagged with *run_id*.
+    """
+    elites = trainer.select_elites(population)
+    clones, children = trainer.split_near_clones(trainer.breed(elites, len(population) - len(elites)))
+    save_strategies(elites + list(clones.values()), generation=generation, run_id=run_id)
+    stages = [
+        backtest_stage(trainer.runner, workers=backtest_workers),
+        score_stage(trainer.scorer),
+        persist_stage(generation=generation, run_id=run_id),
+    ]
+    if trainer.evaluator.validator is not None:
+        stages.insert(0, validate_stage(trainer.evaluator.validator))
+    pipe = Pipeline(stages, queue_size=queue_size)
+    evaluated = _drop_failures(pipe.run({"code": code, "score": 0.0, "meta": {}} for code in children))
+    trainer.remember(evaluated)
+    return elites + list(clones.values()) + evaluated
+
+
+def local_runner(data: str, symbol: str = "", timeframe: str = "",
+                 start_date: str | None = None, end_date: str | None = None):
+    """Local back-test runner over *data*: a CSV file or a MarketDataStore directory.
+
+    A store needs ``symbol`` (comma-separated for several) and ``timeframe``;
+    both limit the bars to ``start_date <= time < end_date``.
+    """
+    if Path(data).is_dir():
+        if not symbol or not timeframe:
+            raise ValueError("A market data store needs a symbol and a timeframe")
+        return MarketDataRunner(MarketDataStore(data), timeframe, symbol.split(","), start_date, end_date)
+    return LocalBacktestRunner(load_bars(data).slice(to_epoch(start_date), to_epoch(end_date)))
+
+
+def run_pipeline(
+    mode: str,
+    generations: int,
+    pop_size: int,
+    verbose: bool,
+    backtest_cache: str | None = None,
+    executor: str = "serial",
+    workers: int | None = None,
+    task_timeout: float | None = None,
+    seed: int | None = None,
+    llm_concurrency: int = 8,
+    llm_cache: str | None = None,
+    llm_cache_ttl: float | None = None,
+    fresh_llm: bool = False,
+    metrics_json: str | None = None,
+    metrics_prom: str | None = None,
+    profile_generation: int | None = None,
+    profile_dir: str = "profiles",
+    checkpoint_dir: str | None = "checkpoints",
+    keep_checkpoints: int = 3,
+    resume: bool = False,
+    run_id: str | None = None,
+    pipelined: bool = False,
+    queue_size: int = 32,
+    validate: bool = True,
+    similarity_threshold: float | None = None,
+    min_diversity: float = 0.0,
+    islands: int = 0,
+    migration_interval: int = 5,
+    migrants: int = 2,
+    topology: str = "ring",
+    exchange: str | None = None,
+    island_index: int | None = None,
+    tv_session: str | None = None,
+    symbol: str = "",
+    timeframe: str = "",
+    start_date: str | None = None,
+    end_date: str | None = None,
+    data: str | None = None,
+):
+    """Run the full GA/PPO pipeline and persist results to the database.
+
+    With ``metrics_json``/``metrics_prom`` per-stage timings and counters are
+    collected and written after every generation; ``profile_generation``
+    wraps that generation in cProfile/tracemalloc (output in ``profile_dir``).
+
+    After the initial population and after every generation a checkpoint is
+    written to the run's own ``checkpoint_dir/<run_id>`` directory (a new id
+    unless ``run_id`` is given).  With ``resume`` the run ``run_id``, or the
+    most recent run, continues from its newest checkpoint instead of
+    generating a new population; a checkpoint written with another mode,
+    population size, generation count or data is refused.  Strategy rows
+    are tagged with the run id, and the rows a crashed generation already
+    wrote are deleted before it is redone.
+
+    With ``pipelined`` (GA mode) the stages run concurrently joined by
+    bounded queues of ``queue_size``: ``llm_concurrency`` generation
+    workers and ``workers`` back-test workers.
+
+    With ``validate`` generated and bred strategies pass a
+    :class:`~core.pine_validator.PineValidator` before any back-test time is
+    spent on them.
+
+    With ``similarity_threshold`` every stored strategy is indexed in a
+    :class:`~core.similarity_index.SimilarityIndex`: near-clones are dropped
+    from the initial population and GA children that near-clone a scored
+    strategy are not back-tested.  ``min_diversity`` sets the GA's share of
+    children that must not be near-clones of their parents or siblings.
+
+    With ``islands`` > 1 (GA mode) the population is split over that many
+    :class:`~core.islands.IslandModel` islands evolving in separate processes;
+    every ``migration_interval`` generations each sends its best ``migrants``
+    along ``topology``.  With ``island_index`` only that island runs here on
+    a ``pop_size`` population, exchanging migrants through ``exchange``
+    (a shared directory or ``sqlite:///`` file) with the other nodes; the
+    exchange is scoped by ``run_id``, which all nodes must be given.
+    Checkpoints are written before and after the island run only.
+
+    ``symbol``, ``timeframe``, ``start_date`` and ``end_date`` name the data
+    the back-tests run on and are part of every ``backtest_cache`` key, so a
+    cache file reused for another chart never returns stale results.
+
+    With ``data`` (a CSV file or :class:`~core.market_data.MarketDataStore`
+    directory, see :func:`local_runner`) back-tests run on the local NumPy
+    engine instead of the TradingView UI.  PPO mode requires it: its
+    rollouts need thousands of back-tests per generation.  It cannot be
+    combined with the ``queue`` executor, whose workers use their own runner.
+
+    With ``tv_session`` (a ``scripts/gen_tv_state.py`` state file) back-tests
+    run on a :class:`~core.backtest_runner.SessionBacktestRunner` that logs in
+    once and keeps its Pine Editor page open for the whole run.
+    """
+    if mode == "ppo" and not data:
+        raise ValueError("PPO rollouts need a local back-test engine; pass --data with a CSV file or store")
+    if data and tv_session:
+        raise ValueError("--data and --tv-session select different back-test engines")
+    if data and executor == "queue":
+        # Jobs carry only the code; workers would back-test on their own runner
+        raise ValueError("--data back-tests run in this process; use the serial, thread or process "
+                         "executor instead of --executor queue")
+    if exchange and not run_id:
+        # Each node would otherwise pick its own id and never see the others' migrants
+        raise ValueError("--exchange needs a --run-id shared by every node of the run")
+    run_config = {
+        "mode": mode, "pop_size": pop_size, "generations": generations,
+        "data": os.path.abspath(data) if data else None, "symbol": symbol, "timeframe": timeframe,
+        "start_date": start_date, "end_date": end_date,
+    }
+    store = None
+    if checkpoint_dir:
+        store = CheckpointStore(checkpoint_dir, keep=keep_checkpoints,
+                                run_id=run_id or (latest_run(checkpoint_dir) if resume else None))
+        if not resume and store.generations():
+            raise ValueError(f"Run {store.run_id!r} already has checkpoints in {checkpoint_dir}; "
+                             "pass --resume or another --run-id")
+        run_id = store.run_id
+    checkpoint = store.load_latest() if store is not None and resume else None
+    if checkpoint is not None and checkpoint.config != run_config:
+        changed = sorted(k for k in {**run_config, **checkpoint.config}
+                         if run_config.get(k) != checkpoint.config.get(k))
+        raise ValueError(f"Checkpoint of run {store.run_id!r} was written with a different "
+                         f"configuration ({', '.join(changed)}); start a new run instead")
+    if metrics_json or metrics_prom:
+        instrumentation.get().reset()
+        instrumentation.enable()
     init_db()
-    trainer = TrainerFactory.get_trainer(mode)
-    population = create_initial_population(pop_size)
-    for gen in range(1, generations + 1):
+    response_cache = None
+    if llm_cache:
+        response_cache = LLMResponseCache(llm_cache, ttl=llm_cache_ttl)
+        configure_response_cache(response_cache)
+    session = None
+    if tv_session:
+        # The session belongs to the thread that opened it; thread pools and
+        # the pipeline's per-generation stage threads would score 0 instead
+        if executor == "thread" or pipelined:
+            raise ValueError("A TradingView session cannot be shared between threads; "
+                             "use the serial or process executor without --pipelined")
+        session = SessionBacktestRunner(tv_session)
+    if data:
+        runner = local_runner(data, symbol, timeframe, start_date, end_date)
+        symbol = symbol or Path(data).name  # keys of one CSV never collide with another's
+    else:
+        runner = session or BacktestRunner()
+    cache = None
+    if backtest_cache:
+        # The wrapper hides LocalBacktestRunner.run_signals, so PPO rollouts
+        # are then back-tested one by one instead of in a single batch
+        cache = BacktestCache(backtest_cache)
+        runner = CachedBacktestRunner(runner, cache, symbol, timeframe, start_date, end_date)
+    validator = PineValidator() if validate else None
+    similarity_index = None
+    if similarity_threshold is not None:
+        similarity_index = SimilarityIndex.from_database(threshold=similarity_threshold)
+    options = dict(executor=executor, max_workers=workers, task_timeout=task_timeout, seed=seed,
+                   validator=validator)
+    if mode == "ga":
+        options.update(similarity_index=similarity_index, min_diversity=min_diversity)
+    trainer = TrainerFactory.get_trainer(mode, runner=runner, **options)
+    if checkpoint is not None:
+        population = checkpoint.population
+        trainer.set_state(checkpoint.trainer_state)
+        start = checkpoint.generation + 1
+        # Rows this run wrote after its checkpoint (a crash mid-generation,
+        # or between save_strategies and the checkpoint) are written again
+        removed = delete_strategies(store.run_id, from_generation=start)
+        if removed:
+            logging.info("Dropped %d rows of unfinished generation %d", removed, start)
+        logging.info("Resuming run %s after generation %d", store.run_id, checkpoint.generation)
+    else:
+        if resume:
+            logging.warning("No checkpoint found in %s; starting a new run", store.directory if store else None)
+        instrumentation.set_generation(0)
+        with instrumentation.span("generate"):
+            if pipelined and isinstance(trainer, GATrainer):
+                population = create_initial_population_pipelined(
+                    pop_size, trainer.runner, trainer.scorer, llm_concurrency,
+                    workers or 4, queue_size, fresh_llm, validator, run_id,
+                )
+            else:
+                population = create_initial_population(pop_size, llm_concurrency, fresh_llm, validator,
+                                                       similarity_index)
+        if store is not None:
+            store.save(0, population, trainer.get_state(), mode, run_config)
+        start = 1
+    if mode == "ga" and (islands > 1 or island_index is not None):
+        # Islands run in their own processes, so each evaluates serially
+        # unless the back-tests go to the shared job queue.
+        island_options = {k: v for k, v in options.items() if k != "seed"}
+        island_options["executor"] = "queue" if executor == "queue" else "serial"
+        if executor != "queue" and island_options.pop("task_timeout", None) is not None:
+            logging.warning("--task-timeout is not enforced inside islands; they evaluate serially")
+        model = IslandModel(
+            runner, trainer.scorer, max(islands, 1), topology=topology,
+            migration_interval=migration_interval, n_migrants=migrants,
+            exchange=exchange_from_url(exchange, run_id) if exchange else None, seed=seed, persist=True,
+            trainer_options=island_options, run_id=run_id,
+        )
+        with instrumentation.span("islands"):
+            if island_index is not None:
+                population = model.run_one(island_index, population, generations - start + 1, start).population
+            else:
+                population = [g for pop in model.run(population, generations - start + 1, start) for g in pop]
+        if store is not None:
+            store.save(generations, population, trainer.get_state(), mode, run_config)
+        start = generations + 1
+    for gen in range(start, generations + 1):
         if verbose:
             logging.info(f"=== Generation {gen} ===")
-        population = trainer.train_epoch(population)
-        for indiv in population:
-            save_strategy(
-                generation=gen,
-                score=indiv.get("score", 0.0),
-                code=indiv.get("code", ""),
-                meta=indiv.get("meta", {}),
-            )
+        instrumentation.set_generation(gen)
+        profiler = (
+            instrumentation.profile(Path(profile_dir) / f"generation_{gen}")
+            if gen == profile_generation else contextlib.nullcontext()
+        )
+        with profiler, instrumentation.span("generation"):
+            if pipelined and isinstance(trainer, GATrainer):
+                with instrumentation.span("train_epoch"):
+                    population = train_epoch_pipelined(trainer, population, gen, workers or 4, queue_size,
+                                                       run_id)
+            else:
+                with instrumentation.span("train_epoch"):
+                    population = trainer.train_epoch(population)
+                save_strategies(population, generation=gen, run_id=run_id)
+            if store is not None:
+                store.save(gen, population, trainer.get_state(), mode, run_config)
+        _export_metrics(metrics_json, metrics_prom)
+    trainer.close()
+    if session is not None:
+        logging.info("TradingView session: %d back-tests", session.evaluations)
+        session.close()
+    if cache is not None:
+        logging.info(
+            "Back-test cache: %d hits, %d misses (%.0f%% hit rate)",
+            cache.stats.hits, cache.stats.misses, cache.stats.hit_rate * 100,
+        )
+        cache.close()
+    if validator is not None:
+        stats = validator.stats
+        logging.info(
+            "Validator: %d passed, %d repaired, %d rejected",
+            stats.passed, stats.repaired, stats.rejected,
+        )
+    if response_cache is not None:
+        logging.info(
+            "LLM cache: %d hits, %d misses, %d tokens saved",
+            response_cache.stats.hits, response_cache.stats.misses, response_cache.stats.saved_tokens,
+        )
+        configure_response_cache(None)
+        response_cache.close()
+    _export_metrics(metrics_json, metrics_prom)
     if verbose:
         logging.info("Pipeline completed.")
 
 
+def _export_metrics(metrics_json: str | None, metrics_prom: str | None) -> None:
+    registry = instrumentation.get()
+    if metrics_json:
+        registry.write_json(metrics_json)
+    if metrics_prom:
+        registry.write_prometheus(metrics_prom)
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", choices=["ga", "ppo"], required=True)
     parser.add_argument("--generations", type=int, required=True)
     parser.add_argument("--pop-size", type=int, required=True)
     parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--backtest-cache", help="SQLite file caching back-test results across runs")
+    parser.add_argument("--symbol", default="", help="Symbol the back-tests run on (part of the cache key)")
+    parser.add_argument("--timeframe", default="", help="Timeframe the back-tests run on (part of the cache key)")
+    parser.add_argument("--start-date", help="Start of the back-test range (part of the cache key)")
+    parser.add_argument("--end-date", help="End of the back-test range (part of the cache key)")
+    parser.add_argument("--data", metavar="CSV_OR_STORE",
+                        help="Back-test locally on an OHLCV CSV file or market data store "
+                             "(required for PPO; not with --executor queue)")
+    parser.add_argument("--executor", choices=["serial", "thread", "process", "queue"], default="serial",
+                        help="How GA children are evaluated ('queue': by core/job_worker.py processes)")
+    parser.add_argument("--workers", type=int, help="Evaluation pool size (default: CPU count)")
+    parser.add_argument("--tv-session", nargs="?", const="tv_state.json", metavar="STATE",
+                        help="Reuse one logged-in TradingView page (state from scripts/gen_tv_state.py)")
+    parser.add_argument("--task-timeout", type=float,
+                        help="Seconds before one evaluation scores 0 (thread, process and queue executors; "
+                             "the serial executor and islands cannot enforce it)")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible breeding")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Max concurrent GPT requests")
+    parser.add_argument("--llm-cache", help="SQLite file caching GPT responses across runs")
+    parser.add_argument("--llm-cache-ttl", type=float, help="Seconds before a cached GPT response expires")
+    parser.add_argument("--fresh-llm", action="store_true", help="Bypass the GPT cache for fresh samples")
+    parser.add_argument("--metrics-json", help="Write per-generation stage timings and counters as JSON")
+    parser.add_argument("--metrics-prom", help="Write the same metrics in Prometheus text format")
+    parser.add_argument("--profile", type=int, nargs="?", const=1, metavar="GEN",
+                        help="Profile generation GEN (default 1) with cProfile and tracemalloc")
+    parser.add_argument("--profile-dir", default="profiles", help="Where --profile writes its output")
+    parser.add_argument("--checkpoint-dir", default="checkpoints",
+                        help="Directory for per-generation checkpoints ('' disables them)")
+    parser.add_argument("--keep-checkpoints", type=int, default=3, help="Number of checkpoints to retain")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue --run-id (default: the most recent run) from its newest checkpoint")
+    parser.add_argument("--run-id", help="Name of this run's checkpoint directory (default: a new id)")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Run generation, back-tests, scoring and DB writes as concurrent stages (GA)")
+    parser.add_argument("--queue-size", type=int, default=32, help="Bound of each inter-stage queue")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="Back-test strategies without the pre-back-test Pine validator")
+    parser.add_argument("--similarity-threshold", type=float,
+                        help="Skip strategies at least this similar (0-1) to a stored one")
+    parser.add_argument("--min-diversity", type=float, default=0.0,
+                        help="Share of GA children that must not be near-clones of their family")
+    parser.add_argument("--islands", type=int, default=0,
+                        help="Evolve this many GA sub-populations in separate processes")
+    parser.add_argument("--migration-interval", type=int, default=5, help="Generations between migrations")
+    parser.add_argument("--migrants", type=int, default=2, help="Best strategies each island sends")
+    parser.add_argument("--topology", choices=["ring", "bidirectional", "full", "random"], default="ring",
+                        help="Which islands receive each island's migrants")
+    parser.add_argument("--exchange", help="Shared directory or sqlite:/// file carrying migrants between nodes "
+                                           "(scoped by --run-id, which is then required)")
+    parser.add_argument("--island-index", type=int,
+                        help="Run only this island (with --exchange, one island per node)")
     args = parser.parse_args()
     logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
-    run_pipeline(args.mode, args.generations, args.pop_size, args.verbose)
+    run_pipeline(
+        args.mode, args.generations, args.pop_size, args.verbose, args.backtest_cache,
+        executor=args.executor, workers=args.workers, task_timeout=args.task_timeout, seed=args.seed,
+        llm_concurrency=args.llm_concurrency, llm_cache=args.llm_cache,
+        llm_cache_ttl=args.llm_cache_ttl, fresh_llm=args.fresh_llm,
+        metrics_json=args.metrics_json, metrics_prom=args.metrics_prom,
+        profile_generation=args.profile, profile_dir=args.profile_dir,
+        checkpoint_dir=args.checkpoint_dir or None, keep_checkpoints=args.keep_checkpoints,
+        resume=args.resume, run_id=args.run_id, pipelined=args.pipelined, queue_size=args.queue_size,
+        validate=not args.no_validate, similarity_threshold=args.similarity_threshold,
+        min_diversity=args.min_diversity, islands=args.islands,
+        migration_interval=args.migration_interval, migrants=args.migrants, topology=args.topology,
+        exchange=args.exchange, island_index=args.island_index, tv_session=args.tv_session,
+        symbol=args.symbol, timeframe=args.timeframe, start_date=args.start_date, end_date=args.end_date,
+        data=args.data,
+    )
 
 
 if __name__ == "__main__":
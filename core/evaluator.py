@@ -0,0 +1,382 @@
+"""core/evaluator.py
+==================
+Concurrent fitness evaluation of a batch of Pine Script strategies.
+
+:class:`PopulationEvaluator` back-tests and scores a whole batch of bred
+children on a :mod:`concurrent.futures` thread or process pool (or inline
+when ``executor="serial"``).  Each evaluation is isolated: an exception, a
+crashed worker process or a per-task timeout only turns that candidate into
+a zero-score :class:`Evaluation` with an ``error`` message.  Results are
+returned in input order, so the outcome of a generation never depends on
+the number of workers.
+
+Identical strategies within a batch are evaluated once, and when the runner
+is a :class:`~core.backtest_cache.CachedBacktestRunner` the cache is
+consulted in the calling process so only misses are shipped to workers.
+With a :class:`~core.pine_validator.PineValidator` every strategy is
+checked first: rejected code scores 0 without a back-test and repaired code
+is back-tested in its repaired form.
+
+With ``executor="queue"`` the back-tests that remain are enqueued in the
+``jobs`` table (:mod:`database.job_queue`) and evaluated by
+:mod:`core.job_worker` processes on any node; ``evaluate`` waits for them.
+
+Usage example:
+```python
+from core.evaluator import PopulationEvaluator
+
+with PopulationEvaluator(runner, scorer, executor="process", max_workers=8, task_timeout=120) as ev:
+    evaluations = ev.evaluate(codes)
+```
+"""
+from __future__ import annotations
+
+import contextlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core import instrumentation
+from core.backtest_cache import CachedBacktestRunner, normalize_pine
+from core.result_extractor import BacktestResult
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["Evaluation", "PopulationEvaluator"]
+
+_EXECUTORS = ("serial", "thread", "process", "queue")
+_POLL_INTERVAL = 0.05  # seconds between task-timeout checks
+
+
+@dataclass
+class Evaluation:
+    """Outcome of evaluating one strategy."""
+
+    score: float
+    result: Optional[BacktestResult] = None
+    error: Optional[str] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if isinstance(self.result, BacktestResult) and "metrics" not in self.meta:
+            self.meta["metrics"] = asdict(self.result)
+        if self.error and "error" not in self.meta:
+            self.meta["error"] = self.error
+
+
+def _evaluate(runner, scorer, code: str) -> Evaluation:
+    """Back-test and score *code*; never raises.
+
+    Stage durations are returned in ``timings`` so they can be recorded in
+    the parent process whatever executor ran the evaluation.
+    """
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+    try:
+        result = runner.run_backtest(code)
+        scored = time.perf_counter()
+        timings["backtest"] = scored - start
+        score = float(scorer.score(result))
+        timings["score"] = time.perf_counter() - scored
+        return Evaluation(score, result, timings=timings)
+    except Exception as exc:  # failure isolation: a broken strategy scores 0
+        logger.debug("Evaluation failed: %s", exc)
+        timings.setdefault("backtest", time.perf_counter() - start)
+        return Evaluation(0.0, None, f"{type(exc).__name__}: {exc}", timings=timings)
+
+
+# Per-process state installed by the pool initializer so the runner and
+# scorer are pickled once per worker rather than once per task.
+_worker_runner = None
+_worker_scorer = None
+_worker_started = None
+
+
+def _init_worker(runner, scorer, started=None) -> None:
+    global _worker_runner, _worker_scorer, _worker_started
+    _worker_runner, _worker_scorer, _worker_started = runner, scorer, started
+
+
+def _evaluate_in_worker(code: str, task: Optional[int] = None) -> Evaluation:
+    if task is not None and _worker_started is not None:
+        _worker_started.put((task, os.getpid(), time.time()))
+    return _evaluate(_worker_runner, _worker_scorer, code)
+
+
+def _evaluate_in_thread(started, task: Optional[int], runner, scorer, code: str) -> Evaluation:
+    if task is not None:
+        started.put((task, None, time.time()))
+    return _evaluate(runner, scorer, code)
+
+
+class PopulationEvaluator:
+    """Evaluate batches of strategies concurrently.
+
+    Args:
+        runner: Any object with ``run_backtest(code) -> BacktestResult``.
+        scorer: A :class:`~core.scorer.BaseScorer`.
+        executor: ``"serial"``, ``"thread"``, ``"process"`` or ``"queue"``
+            (distributed job queue; ``max_workers`` is then up to the
+            workers and a batch gets ``task_timeout`` seconds per job).
+        max_workers: Pool size (defaults to ``os.cpu_count()``).
+        task_timeout: Seconds a single evaluation may take, counted from
+            when a worker starts it, before it is abandoned with a zero
+            score (a hung process worker is killed); ``None`` waits
+            indefinitely.  The ``"serial"`` executor runs evaluations in the
+            calling thread and cannot abandon them, so it ignores the
+            timeout (with a warning).
+        validator: Optional :class:`~core.pine_validator.PineValidator`
+            run before any back-test.
+    """
+
+    def __init__(
+        self,
+        runner,
+        scorer,
+        executor: str = "serial",
+        max_workers: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        validator=None,
+    ) -> None:
+        if executor not in _EXECUTORS:
+            raise ValueError(f"Unknown executor {executor!r}; expected one of {_EXECUTORS}")
+        if executor == "serial" and task_timeout is not None:
+            logger.warning("task_timeout=%s is ignored by the serial executor; use the thread or process "
+                           "executor to enforce it", task_timeout)
+            task_timeout = None
+        self.cache = runner.cache if isinstance(runner, CachedBacktestRunner) else None
+        self.cached_runner = runner if self.cache is not None else None
+        self.runner = runner.runner if self.cache is not None else runner
+        self.scorer = scorer
+        self.executor = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.task_timeout = task_timeout
+        self.validator = validator
+        self.poll_interval = 1.0  # seconds between job-queue polls
+        self._pool: Optional[Executor] = None
+        self._started = None  # queue on which workers report when a task starts
+        self._task_ids = itertools.count()
+
+    # ------------------------------------------------------------------
+    # Pool management
+    # ------------------------------------------------------------------
+
+    def _new_pool(self, workers: int) -> Executor:
+        if self._started is None:
+            self._started = multiprocessing.Queue() if self.executor == "process" else queue.SimpleQueue()
+        if self.executor == "process":
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.runner, self.scorer, self._started),
+            )
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            self._pool = self._new_pool(self.max_workers)
+        return self._pool
+
+    def _reset_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self) -> "PopulationEvaluator":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def _submit(self, pool: Executor, task: Optional[int], code: str) -> Future:
+        if self.executor == "process":
+            return pool.submit(_evaluate_in_worker, code, task)
+        return pool.submit(_evaluate_in_thread, self._started, task, self.runner, self.scorer, code)
+
+    def _run_batch(self, codes: Sequence[str]) -> List[Evaluation]:
+        if self.executor == "serial":
+            return [_evaluate(self.runner, self.scorer, code) for code in codes]
+        if self.executor == "queue":
+            return self._run_queued(codes)
+
+        results, crashed = self._run_pooled(codes, self._get_pool)
+        if crashed:
+            # A dead worker fails every pending future; re-run the victims one
+            # at a time so only the actual culprit scores zero.
+            self._reset_pool()
+            logger.warning("Worker pool crashed; isolating %d evaluations", len(crashed))
+            for i in crashed:
+                results[i] = self._run_isolated(codes[i])
+        return results  # type: ignore[return-value]
+
+    def _run_pooled(self, codes: Sequence[str], get_pool) -> Tuple[List[Optional[Evaluation]], List[int]]:
+        """Evaluate *codes* on ``get_pool()``; returns results and the indexes lost to a crash.
+
+        ``task_timeout`` counts from the moment a worker starts a task (workers
+        report it), so queueing never eats into a task's budget.  A hung task
+        scores zero and its pool is retired: hung process workers are killed,
+        hung threads are left behind, and tasks that had not started yet (or
+        were running in a killed pool) move to a fresh pool.
+        """
+        results: List[Optional[Evaluation]] = [None] * len(codes)
+        crashed: List[int] = []
+        waiting = list(range(len(codes)))
+        inflight: Dict[Future, Tuple[int, Optional[int], Executor]] = {}
+        started: Dict[int, Tuple[float, Optional[int]]] = {}  # task -> (start time, worker pid)
+        retired: List[Executor] = []
+        while waiting or inflight:
+            if waiting:
+                pool = get_pool()
+                for i in waiting:
+                    task = next(self._task_ids) if self.task_timeout is not None else None
+                    inflight[self._submit(pool, task, codes[i])] = (i, task, pool)
+                waiting = []
+            timeout = None
+            if self.task_timeout is not None:
+                self._drain_started(started)
+                timeout = _POLL_INTERVAL
+            done, _ = wait(list(inflight), timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, _task, pool = inflight.pop(fut)
+                try:
+                    results[i] = fut.result()
+                except BrokenProcessPool:
+                    # Victims of a worker we killed are innocent: run them again
+                    (waiting if any(pool is r for r in retired) else crashed).append(i)
+                except Exception as exc:
+                    results[i] = Evaluation(0.0, None, f"{type(exc).__name__}: {exc}")
+            if self.task_timeout is None:
+                continue
+            self._drain_started(started)
+            now = time.time()
+            hung = [fut for fut, (_i, task, _pool) in inflight.items()
+                    if task in started and now - started[task][0] >= self.task_timeout]
+            for fut in hung:
+                i, task, pool = inflight.pop(fut)
+                results[i] = Evaluation(0.0, None, f"timeout after {self.task_timeout}s")
+                pid = started[task][1]
+                if pid is not None:
+                    with contextlib.suppress(OSError):
+                        os.kill(pid, signal.SIGTERM)
+                if not any(pool is r for r in retired):
+                    retired.append(pool)
+                    if pool is self._pool:
+                        self._pool = None
+                    pool.shutdown(wait=False)
+            if hung:
+                instrumentation.incr("evaluation.timeouts", len(hung))
+                for fut, (i, _task, pool) in list(inflight.items()):
+                    if any(pool is r for r in retired) and fut.cancel():
+                        del inflight[fut]
+                        waiting.append(i)
+        return results, crashed
+
+    def _drain_started(self, started: Dict[int, Tuple[float, Optional[int]]]) -> None:
+        while True:
+            try:
+                task, pid, when = self._started.get_nowait()
+            except queue.Empty:
+                return
+            started[task] = (when, pid)
+
+    def _run_queued(self, codes: Sequence[str]) -> List[Evaluation]:
+        from database.job_queue import cancel, enqueue, get_outcomes, wait_for
+
+        ids = enqueue(codes)
+        # Without live workers nothing ever finishes: give the batch as long as
+        # one worker would need, then score whatever is left 0
+        timeout = None if self.task_timeout is None else self.task_timeout * len(ids)
+        try:
+            outcomes = wait_for(ids, poll_interval=self.poll_interval, timeout=timeout)
+        except TimeoutError:
+            cancelled = cancel(ids, f"not finished within {timeout:g}s")
+            logger.warning("%d of %d queued evaluations timed out; are any job workers running?",
+                           cancelled, len(ids))
+            outcomes = get_outcomes(ids)
+        results = []
+        for job_id in ids:
+            outcome = outcomes[job_id]
+            result = BacktestResult(**outcome.result) if outcome.result else None
+            error = outcome.error if outcome.status == "done" else f"job failed: {outcome.error}"
+            results.append(Evaluation(outcome.score or 0.0, result, error))
+        return results
+
+    def _run_isolated(self, code: str) -> Evaluation:
+        pool = self._new_pool(1)
+        try:
+            results, crashed = self._run_pooled([code], lambda: pool)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        return Evaluation(0.0, None, "worker process crashed") if crashed else results[0]
+
+    def evaluate(self, codes: Sequence[str]) -> List[Evaluation]:
+        """Evaluate *codes* and return one :class:`Evaluation` per input, in order."""
+        with instrumentation.span("evaluate"):
+            return self._evaluate_all(codes)
+
+    def _evaluate_all(self, codes: Sequence[str]) -> List[Evaluation]:
+        rejected: Dict[int, Evaluation] = {}
+        if self.validator is not None:
+            checked = []
+            for i, code in enumerate(codes):
+                report = self.validator.check(code)
+                if not report.ok:
+                    rejected[i] = Evaluation(0.0, None, f"invalid Pine: {report.summary()}")
+                checked.append(report.code)
+            codes = checked
+        keys = [self.cached_runner.key(c) if self.cache is not None else normalize_pine(c) for c in codes]
+        evaluations: Dict[str, Evaluation] = {}
+        pending: Dict[str, str] = {}
+        for i, (key, code) in enumerate(zip(keys, codes)):
+            if i in rejected or key in evaluations or key in pending:
+                continue
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                try:
+                    evaluations[key] = Evaluation(float(self.scorer.score(cached)), cached)
+                except Exception as exc:
+                    evaluations[key] = Evaluation(0.0, None, f"{type(exc).__name__}: {exc}")
+            else:
+                pending[key] = code
+
+        if pending:
+            for key, ev in zip(pending, self._run_batch(list(pending.values()))):
+                evaluations[key] = ev
+                for stage, seconds in ev.timings.items():
+                    instrumentation.observe(stage, seconds)
+                if self.cache is not None and isinstance(ev.result, BacktestResult):
+                    self.cache.put(key, ev.result)
+
+        failures = sum(1 for ev in evaluations.values() if ev.error)
+        if failures:
+            logger.info("%d of %d evaluations failed", failures, len(evaluations))
+        if rejected:
+            logger.info("%d of %d strategies rejected before back-testing", len(rejected), len(codes))
+        instrumentation.incr("evaluation.requested", len(codes))
+        instrumentation.incr("evaluation.backtests", len(pending))
+        instrumentation.incr("evaluation.cache_hits", len(evaluations) - len(pending))
+        instrumentation.incr("evaluation.failures", failures)
+        instrumentation.incr("evaluation.rejected", len(rejected))
+        return [
+            Evaluation(ev.score, ev.result, ev.error, dict(ev.meta))
+            for ev in (rejected.get(i) or evaluations[key] for i, key in enumerate(keys))
+        ]
@@ -0,0 +1,358 @@
+"""core/genetic_ops.py
+===================
+Structure-aware genetic operators for Pine Script genomes.
+
+Both operators work on the :func:`~core.pine_compiler.parse` tree rather
+than on raw text, and only return children that compile with
+:func:`~core.pine_compiler.compile_pine`:
+
+- :func:`crossover` replaces one condition/order block of the first parent
+  (a top-level ``if`` or ``strategy.*`` call) with a block of the second
+  parent, or swaps just the ``if`` condition.  Definitions the donated block
+  depends on are copied along from the donor.
+- :func:`mutate` perturbs one numeric ``input.int``/``input.float`` default
+  within its ``minval``/``maxval`` bounds, perturbs a numeric literal
+  (indicator length, threshold), or swaps an indicator for one of the same
+  family and signature (``ta.sma`` ↔ ``ta.ema`` ↔ ``ta.rma`` ↔ ``ta.wma`` …).
+
+Operators return ``None`` when no valid child was found within
+``attempts`` tries (e.g. for a parent outside the compiler's Pine subset).
+
+The same edit targets are exposed as :class:`Slot`\\ s by :func:`edit_slots`
+so that other search strategies (e.g. the PPO trainer) can choose edits
+themselves and apply them with :func:`adjust` and :func:`swap`.
+
+Usage example:
+```python
+import random
+from core.genetic_ops import crossover, mutate
+
+rng = random.Random(0)
+child = crossover(parent1_code, parent2_code, rng) or parent1_code
+child = mutate(child, rng) or child
+```
+"""
+from __future__ import annotations
+
+import copy
+import logging
+import random
+from dataclasses import dataclass, fields
+from typing import Dict, Iterator, List, Optional, Set
+
+from core.pine_compiler import (
+    Assign,
+    Binary,
+    Call,
+    ExprStmt,
+    If,
+    Name,
+    Node,
+    Num,
+    PineSyntaxError,
+    Script,
+    Unary,
+    compile_pine,
+    parse,
+    unparse,
+)
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "is_valid", "crossover", "mutate", "INDICATOR_FAMILIES", "SLOT_KINDS", "Slot", "edit_slots", "adjust", "swap",
+]
+
+# Interchangeable indicators (same parameter signature).
+INDICATOR_FAMILIES = (
+    ("ta.sma", "ta.ema", "ta.rma", "ta.wma"),
+    ("ta.highest", "ta.lowest"),
+    ("ta.mom", "ta.roc", "ta.change"),
+    ("ta.crossover", "ta.crossunder", "ta.cross"),
+)
+_FAMILY: Dict[str, tuple] = {func: family for family in INDICATOR_FAMILIES for func in family}
+# Position of integer (length) arguments of ta.* calls
+_LENGTH_ARGS: Dict[str, Set[int]] = {
+    "ta.sma": {1}, "ta.ema": {1}, "ta.rma": {1}, "ta.wma": {1}, "ta.rsi": {1}, "ta.stdev": {1},
+    "ta.highest": {1}, "ta.lowest": {1}, "ta.change": {1}, "ta.mom": {1}, "ta.roc": {1},
+    "ta.bb": {1}, "ta.macd": {1, 2, 3}, "ta.atr": {0}, "ta.stoch": {3},
+}
+
+
+def is_valid(code: str) -> bool:
+    """Whether *code* compiles with :func:`~core.pine_compiler.compile_pine`."""
+    try:
+        compile_pine(code)
+    except (PineSyntaxError, ValueError, KeyError, TypeError):
+        return False
+    return True
+
+
+def _parse(code: str) -> Optional[Script]:
+    if not is_valid(code):
+        return None
+    return parse(code)
+
+
+def _walk(node: Node) -> Iterator[Node]:
+    yield node
+    for f in fields(node):
+        value = getattr(node, f.name)
+        items = value if isinstance(value, list) else [value]
+        for item in items:
+            if isinstance(item, tuple):  # (name, node) keyword arguments
+                item = item[1]
+            if isinstance(item, Node):
+                yield from _walk(item)
+
+
+def _names(node: Node) -> Set[str]:
+    return {n.id for n in _walk(node) if isinstance(n, Name)}
+
+
+def _defined(body: List[Node]) -> Set[str]:
+    return {t for node in body if isinstance(node, Assign) for t in node.targets}
+
+
+def _is_block(node: Node) -> bool:
+    if isinstance(node, If):
+        return True
+    return isinstance(node, ExprStmt) and isinstance(node.expr, Call) and node.expr.func.startswith("strategy.")
+
+
+def _finish(script: Script, parents: List[Script]) -> Optional[str]:
+    """Source of *script* unless it equals a parent or fails to compile."""
+    if any(script == parent for parent in parents):
+        return None
+    code = unparse(script)
+    if not is_valid(code):
+        return None
+    return code
+
+
+# ---------------------------------------------------------------------------
+# Crossover
+# ---------------------------------------------------------------------------
+
+def _dependencies(donated: Node, donor: List[Node], host_defined: Set[str]) -> Optional[List[Node]]:
+    """Donor definitions *donated* needs that the host lacks, in donor order."""
+    donor_defined = _defined(donor)
+    needed = (_names(donated) & donor_defined) - host_defined
+    picked: Set[int] = set()
+    while needed:
+        name = needed.pop()
+        for i, node in enumerate(donor):
+            if isinstance(node, Assign) and name in node.targets and i not in picked:
+                if set(node.targets) & host_defined:
+                    return None  # a tuple assignment would redeclare a host variable
+                picked.add(i)
+                needed |= (_names(node.value) & donor_defined) - host_defined - {
+                    t for j in picked for t in donor[j].targets}
+    return [copy.deepcopy(donor[i]) for i in sorted(picked)]
+
+
+def crossover(code_a: str, code_b: str, rng: random.Random, attempts: int = 8) -> Optional[str]:
+    """Child of *code_a* with one block (or ``if`` condition) taken from *code_b*."""
+    a, b = _parse(code_a), _parse(code_b)
+    if a is None or b is None:
+        return None
+    host_blocks = [i for i, node in enumerate(a.body) if _is_block(node)]
+    donor_blocks = [node for node in b.body if _is_block(node)]
+    if not host_blocks or not donor_blocks:
+        return None
+    for _ in range(attempts):
+        child = copy.deepcopy(a)
+        at = rng.choice(host_blocks)
+        donated = copy.deepcopy(rng.choice(donor_blocks))
+        if isinstance(child.body[at], If) and isinstance(donated, If) and rng.random() < 0.5:
+            child.body[at].cond = donated.cond  # swap the condition only
+            donated = donated.cond
+        else:
+            child.body[at] = donated
+        deps = _dependencies(donated, b.body, _defined(a.body))
+        if deps is None:
+            continue
+        child.body[at:at] = deps
+        result = _finish(child, [a, b])
+        if result is not None:
+            return result
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Mutation
+# ---------------------------------------------------------------------------
+
+def _literal(node: Optional[Node]) -> Optional[float]:
+    if isinstance(node, Num):
+        return node.value
+    if isinstance(node, Unary) and node.op == "-" and isinstance(node.operand, Num):
+        return -node.operand.value
+    return None
+
+
+def _perturb(value: float, integer: bool, rng: random.Random,
+             low: Optional[float] = None, high: Optional[float] = None) -> float:
+    if integer:
+        step = max(1, int(round(abs(value) * 0.25)))
+        new = value + rng.choice((-1, 1)) * rng.randint(1, step)
+    else:
+        new = value * (1.0 + rng.uniform(-0.25, 0.25)) if value else rng.uniform(0.1, 1.0)
+        new = round(new, 2) if abs(new) >= 0.1 else round(new, 4)
+    if low is not None:
+        new = max(new, low)
+    if high is not None:
+        new = min(new, high)
+    return float(int(round(new))) if integer else float(new)
+
+
+def _set_number(num: Num, value: float, integer: bool) -> None:
+    num.value = value
+    num.raw = str(int(value)) if integer else repr(value)
+
+
+def _input_targets(script: Script) -> List[Call]:
+    return [n for n in _walk(script) if isinstance(n, Call) and n.func in ("input.int", "input.float")]
+
+
+def _mutate_input(call: Call, rng: random.Random) -> bool:
+    kwargs = dict(call.kwargs)
+    node = call.args[0] if call.args else kwargs.get("defval")
+    if not isinstance(node, Num):
+        return False
+    integer = call.func == "input.int"
+    low = _literal(kwargs.get("minval"))
+    if low is None and integer:
+        low = 1  # integer inputs are almost always lengths
+    new = _perturb(node.value, integer, rng, low, _literal(kwargs.get("maxval")))
+    step = _literal(kwargs.get("step"))
+    if step and not integer:
+        new = round(round(new / step) * step, 10)
+    if new == node.value:
+        return False
+    _set_number(node, new, integer)
+    return True
+
+
+def _literal_targets(script: Script) -> List[tuple]:
+    """``(Num, integer, low)`` of indicator lengths and comparison thresholds."""
+    targets = []
+    for node in _walk(script):
+        if isinstance(node, Call) and node.func in _LENGTH_ARGS:
+            targets += [(node.args[i], True, 1) for i in _LENGTH_ARGS[node.func]
+                        if i < len(node.args) and isinstance(node.args[i], Num)]
+        elif isinstance(node, Binary) and node.op in ("<", ">", "<=", ">="):
+            for side in (node.left, node.right):
+                if isinstance(side, Num):
+                    targets.append((side, side.raw is not None and "." not in side.raw, None))
+    return targets
+
+
+def mutate(code: str, rng: random.Random, attempts: int = 8) -> Optional[str]:
+    """Child of *code* with one input, literal or indicator type changed."""
+    script = _parse(code)
+    if script is None:
+        return None
+    for _ in range(attempts):
+        child = copy.deepcopy(script)
+        kinds = []
+        if _input_targets(child):
+            kinds.append("input")
+        if _literal_targets(child):
+            kinds.append("literal")
+        swappable = [n for n in _walk(child) if isinstance(n, Call) and n.func in _FAMILY]
+        if swappable:
+            kinds.append("indicator")
+        if not kinds:
+            return None
+        kind = rng.choice(kinds)
+        if kind == "input":
+            changed = _mutate_input(rng.choice(_input_targets(child)), rng)
+        elif kind == "literal":
+            num, integer, low = rng.choice(_literal_targets(child))
+            new = _perturb(num.value, integer, rng, low)
+            changed = new != num.value
+            if changed:
+                _set_number(num, new, integer)
+        else:
+            call = rng.choice(swappable)
+            call.func = rng.choice([f for f in _FAMILY[call.func] if f != call.func])
+            changed = True
+        if changed:
+            result = _finish(child, [script])
+            if result is not None:
+                return result
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Edit slots
+# ---------------------------------------------------------------------------
+
+SLOT_KINDS = ("input_int", "input_float", "length", "threshold", "indicator")
+
+
+@dataclass
+class Slot:
+    """One editable value of a parsed strategy.
+
+    ``node`` is the :class:`~core.pine_compiler.Num` literal of a numeric
+    slot or the :class:`~core.pine_compiler.Call` of an ``indicator`` slot.
+    """
+
+    kind: str
+    node: Node
+    integer: bool = False
+    low: Optional[float] = None
+    high: Optional[float] = None
+    step: Optional[float] = None
+
+
+def edit_slots(script: Script) -> List[Slot]:
+    """Editable inputs, literals and indicators of *script*, in a stable order."""
+    slots = []
+    for call in _input_targets(script):
+        kwargs = dict(call.kwargs)
+        node = call.args[0] if call.args else kwargs.get("defval")
+        if isinstance(node, Num):
+            integer = call.func == "input.int"
+            low = _literal(kwargs.get("minval"))
+            slots.append(Slot("input_int" if integer else "input_float", node, integer,
+                              1 if low is None and integer else low,
+                              _literal(kwargs.get("maxval")), _literal(kwargs.get("step"))))
+    for num, integer, low in _literal_targets(script):
+        slots.append(Slot("length" if low == 1 else "threshold", num, integer, low))
+    slots += [Slot("indicator", n) for n in _walk(script) if isinstance(n, Call) and n.func in _FAMILY]
+    return slots
+
+
+def adjust(slot: Slot, change: float) -> bool:
+    """Scale a numeric slot by ``1 + change`` within its bounds; whether it changed.
+
+    Integers move by at least one unit; a zero value moves to ``change``.
+    """
+    value = slot.node.value
+    new = value * (1.0 + change) if value else change
+    if slot.integer:
+        new = value + (1 if change > 0 else -1) * max(1, abs(int(round(new - value))))
+    elif slot.step:
+        new = round(round(new / slot.step) * slot.step, 10)
+    else:
+        new = round(new, 2) if abs(new) >= 0.1 else round(new, 4)
+    if slot.low is not None:
+        new = max(new, slot.low)
+    if slot.high is not None:
+        new = min(new, slot.high)
+    if new == value:
+        return False
+    _set_number(slot.node, float(new), slot.integer)
+    return True
+
+
+def swap(slot: Slot, offset: int) -> bool:
+    """Replace an indicator by the family member *offset* places further; whether it changed."""
+    family = _FAMILY[slot.node.func]
+    new = family[(family.index(slot.node.func) + offset) % len(family)]
+    changed = new != slot.node.func
+    slot.node.func = new
+    return changed
@@ -0,0 +1,172 @@
+"""core/indicator_cache.py
+========================
+Memoisation of indicator series shared by every strategy evaluated in a
+process.
+
+Generated strategies overwhelmingly reuse the same building blocks
+(``ta.ema(close, 20)``, ``ta.rsi(close, 14)``, ``ta.bb(close, 20, 2.0)`` …).
+:meth:`core.pine_compiler.CompiledStrategy.evaluate` looks every ``ta.*``
+step up in an :class:`IndicatorCache` before computing it, keyed by
+
+- the function and its literal parameters,
+- the source series, as the canonical expression it was derived from with
+  ``input.*`` values substituted (so ``len = input.int(20)`` followed by
+  ``ta.ema(close, len)`` shares its entry with ``ta.ema(close, 20)``), and
+- the data slice, identified by the buffers of the bars' OHLCV columns.
+
+Cached arrays are read-only.  Entries hold only weak references to the
+underlying bars, so a slice that has been freed can never be confused with
+a new one allocated at the same address.  The cache is an LRU bounded by the
+total ``nbytes`` of the stored arrays.
+
+Usage example:
+```python
+from core import indicator_cache
+from core.pine_compiler import compile_pine
+
+cache = indicator_cache.shared()
+signals = compile_pine(pine_code).evaluate(bars, cache=cache)
+print(cache.stats.hit_rate)
+```
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+import numpy as np
+
+from core import instrumentation
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["IndicatorStats", "IndicatorCache", "slice_token", "shared"]
+
+_COLUMNS = ("open", "high", "low", "close", "volume")
+_MISSING = object()
+
+
+@dataclass
+class IndicatorStats:
+    """Hit/miss counters and memory use of an :class:`IndicatorCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def _owner(array: np.ndarray) -> np.ndarray:
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def slice_token(bars: Any) -> Tuple[Tuple[Hashable, ...], Tuple[weakref.ref, ...]]:
+    """Identity of the data slice *bars*: buffer addresses plus weak owner refs."""
+    arrays = [np.asarray(getattr(bars, name)) for name in _COLUMNS]
+    token = tuple((a.__array_interface__["data"][0], a.shape, a.strides, a.dtype.str) for a in arrays)
+    return token, tuple(weakref.ref(_owner(a)) for a in arrays)
+
+
+def _nbytes(value: Any) -> int:
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return value.nbytes if isinstance(value, np.ndarray) else 0
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+class IndicatorCache:
+    """Thread-safe, memory-bounded LRU of computed indicator series.
+
+    Args:
+        max_bytes: Upper bound on the total size of the cached arrays; least
+            recently used entries are evicted first.  ``0`` disables caching.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.stats = IndicatorStats()
+        # key -> (owner refs, value, nbytes)
+        self._entries: "OrderedDict[Tuple, Tuple[Tuple[weakref.ref, ...], Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, token, expr: str, compute: Callable[[], Any]) -> Any:
+        """Return the cached value of *expr* on the slice *token*, computing it once.
+
+        *token* is the result of :func:`slice_token` for the bars *compute*
+        reads from.
+        """
+        ident, refs = token
+        key = (ident, expr)
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                if all(ref() is not None for ref in entry[0]):
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    instrumentation.incr("indicator.cache_hits")
+                    return entry[1]
+                self._drop(key)
+            self.stats.misses += 1
+        instrumentation.incr("indicator.cache_misses")
+
+        value = _freeze(compute())
+        size = _nbytes(value)
+        if 0 < size <= self.max_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self._drop(key)
+                self._entries[key] = (refs, value, size)
+                self.stats.bytes += size
+                self.stats.entries = len(self._entries)
+                while self.stats.bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+                    self.stats.evictions += 1
+        return value
+
+    def _drop(self, key) -> None:
+        _, _, size = self._entries.pop(key)
+        self.stats.bytes -= size
+        self.stats.entries = len(self._entries)
+
+    def clear(self) -> None:
+        """Drop every entry (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self.stats.bytes = 0
+            self.stats.entries = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_shared: Optional[IndicatorCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> IndicatorCache:
+    """Process-wide cache used by :func:`core.pine_compiler.pine_signals`."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = IndicatorCache()
+    return _shared
@@ -0,0 +1,295 @@
+"""core/instrumentation.py
+=======================
+Lightweight timing spans and counters for the pipeline stages.
+
+Every stage reports into one process-wide :class:`Instrumentation` registry:
+
+- ``span(name)`` times a block (count, total and max seconds)
+- ``observe(name, seconds)`` records a duration measured elsewhere, e.g. in
+  a worker process
+- ``incr(name, n)`` bumps a counter (tokens, cache hits, failures, rows...)
+
+Measurements are aggregated per generation (see :meth:`Instrumentation.
+set_generation`; generation 0 is the initial population) and exported as
+JSON or in the Prometheus text exposition format.  The registry is disabled
+by default, in which case every call is a flag check that returns
+immediately.  Spans of concurrent tasks overlap, so their totals can exceed
+wall-clock time.
+
+:func:`profile` wraps a block in :mod:`cProfile` and :mod:`tracemalloc` and
+dumps the results next to a given path prefix.
+
+Usage example:
+```python
+from core import instrumentation as inst
+
+inst.enable()
+inst.set_generation(1)
+with inst.span("backtest"):
+    run()
+inst.incr("db.rows_written", 50)
+inst.get().write_json("metrics.json")
+```
+"""
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "Instrumentation",
+    "get",
+    "enable",
+    "disable",
+    "set_generation",
+    "span",
+    "observe",
+    "incr",
+    "profile",
+]
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("_registry", "_name", "_start")
+
+    def __init__(self, registry: "Instrumentation", name: str) -> None:
+        self._registry = registry
+        self._name = name
+
+    def __enter__(self) -> "_Span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._registry.observe(self._name, time.perf_counter() - self._start)
+
+
+class Instrumentation:
+    """Thread-safe registry of per-generation spans and counters."""
+
+    def __init__(self, enabled: bool = False, prefix: str = "strategist") -> None:
+        self.enabled = enabled
+        self.prefix = prefix
+        self.generation = 0
+        self._lock = threading.Lock()
+        # generation -> name -> [count, total_s, max_s]
+        self._spans: Dict[int, Dict[str, list]] = {}
+        # generation -> name -> value
+        self._counters: Dict[int, Dict[str, float]] = {}
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def span(self, name: str):
+        """Context manager timing the enclosed block under *name*."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration of stage *name*."""
+        if not self.enabled:
+            return
+        with self._lock:
+            stat = self._spans.setdefault(self.generation, {}).setdefault(name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += seconds
+            if seconds > stat[2]:
+                stat[2] = seconds
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Add *value* to counter *name*."""
+        if not self.enabled or not value:
+            return
+        with self._lock:
+            counters = self._counters.setdefault(self.generation, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def dump(self) -> Dict[str, Any]:
+        """Raw per-generation spans and counters, for :meth:`merge` in another process."""
+        with self._lock:
+            return {
+                "spans": {gen: {n: list(s) for n, s in spans.items()} for gen, spans in self._spans.items()},
+                "counters": {gen: dict(counters) for gen, counters in self._counters.items()},
+            }
+
+    def merge(self, data: Dict[str, Any]) -> None:
+        """Add the measurements of a :meth:`dump` (e.g. from a worker process)."""
+        with self._lock:
+            for gen, spans in data.get("spans", {}).items():
+                for name, (count, total, peak) in spans.items():
+                    stat = self._spans.setdefault(gen, {}).setdefault(name, [0, 0.0, 0.0])
+                    stat[0] += count
+                    stat[1] += total
+                    stat[2] = max(stat[2], peak)
+            for gen, counters in data.get("counters", {}).items():
+                merged = self._counters.setdefault(gen, {})
+                for name, value in counters.items():
+                    merged[name] = merged.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self.generation = 0
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-generation and total aggregates as plain JSON-able data."""
+        with self._lock:
+            generations: Dict[str, Any] = {}
+            total_spans: Dict[str, list] = {}
+            total_counters: Dict[str, float] = {}
+            for gen in sorted(set(self._spans) | set(self._counters)):
+                spans = self._spans.get(gen, {})
+                counters = self._counters.get(gen, {})
+                generations[str(gen)] = {
+                    "spans": {n: _span_dict(s) for n, s in sorted(spans.items())},
+                    "counters": dict(sorted(counters.items())),
+                }
+                for name, (count, total, peak) in spans.items():
+                    agg = total_spans.setdefault(name, [0, 0.0, 0.0])
+                    agg[0] += count
+                    agg[1] += total
+                    agg[2] = max(agg[2], peak)
+                for name, value in counters.items():
+                    total_counters[name] = total_counters.get(name, 0) + value
+            return {
+                "generations": generations,
+                "totals": {
+                    "spans": {n: _span_dict(s) for n, s in sorted(total_spans.items())},
+                    "counters": dict(sorted(total_counters.items())),
+                },
+            }
+
+    def write_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.snapshot(), indent=2), encoding="utf-8")
+
+    def to_prometheus(self) -> str:
+        """Render all aggregates in the Prometheus text exposition format."""
+        snap = self.snapshot()["generations"]
+        p = self.prefix
+        lines = []
+        for metric, kind, help_text, pick in (
+            (f"{p}_stage_seconds_total", "counter", "Time spent in a pipeline stage", lambda s: s["total_s"]),
+            (f"{p}_stage_calls_total", "counter", "Number of timed stage executions", lambda s: s["count"]),
+            (f"{p}_stage_seconds_max", "gauge", "Longest single stage execution", lambda s: s["max_s"]),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for gen, data in snap.items():
+                for name, stat in data["spans"].items():
+                    lines.append(f'{metric}{{stage="{_escape(name)}",generation="{gen}"}} {pick(stat)!r}')
+        metric = f"{p}_events_total"
+        lines += [f"# HELP {metric} Pipeline event counters", f"# TYPE {metric} counter"]
+        for gen, data in snap.items():
+            for name, value in data["counters"].items():
+                lines.append(f'{metric}{{name="{_escape(name)}",generation="{gen}"}} {value!r}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        Path(path).write_text(self.to_prometheus(), encoding="utf-8")
+
+
+def _span_dict(stat: list) -> Dict[str, float]:
+    count, total, peak = stat
+    return {"count": count, "total_s": total, "max_s": peak, "mean_s": total / count if count else 0.0}
+
+
+def _escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# ---------------------------------------------------------------------------
+# Process-wide registry
+# ---------------------------------------------------------------------------
+
+_registry = Instrumentation()
+
+
+def get() -> Instrumentation:
+    """Return the process-wide registry."""
+    return _registry
+
+
+def enable() -> Instrumentation:
+    _registry.enabled = True
+    return _registry
+
+
+def disable() -> None:
+    _registry.enabled = False
+
+
+def set_generation(generation: int) -> None:
+    """Attribute subsequent measurements to *generation*."""
+    _registry.generation = generation
+
+
+def span(name: str):
+    if not _registry.enabled:
+        return _NULL_SPAN
+    return _Span(_registry, name)
+
+
+def observe(name: str, seconds: float) -> None:
+    if _registry.enabled:
+        _registry.observe(name, seconds)
+
+
+def incr(name: str, value: float = 1) -> None:
+    if _registry.enabled:
+        _registry.incr(name, value)
+
+
+@contextlib.contextmanager
+def profile(prefix: str | Path, top: int = 40) -> Iterator[None]:
+    """Profile the block with cProfile and tracemalloc.
+
+    Writes ``<prefix>.prof`` (load with :mod:`pstats` or snakeviz),
+    ``<prefix>.txt`` (top functions by cumulative time) and
+    ``<prefix>_memory.txt`` (top allocation sites and peak memory).
+    """
+    prefix = Path(prefix)
+    prefix.parent.mkdir(parents=True, exist_ok=True)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        profiler.dump_stats(f"{prefix}.prof")
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(top)
+        Path(f"{prefix}.txt").write_text(text.getvalue(), encoding="utf-8")
+
+        lines = [f"peak traced memory: {peak / 1024:.1f} KiB", "top allocation growth:"]
+        lines += [str(stat) for stat in after.compare_to(before, "lineno")[:top]]
+        Path(f"{prefix}_memory.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+        logger.info("Profile written to %s.{prof,txt} and %s_memory.txt", prefix, prefix)
@@ -0,0 +1,524 @@
+"""core/islands.py
+===============
+Island-model genetic algorithm: independent sub-populations with migration.
+
+Each island evolves its own population with a
+:class:`~core.reinforcement.GATrainer` using its own elitism, crossover and
+mutation rates (:class:`IslandConfig`).  Every ``migration_interval``
+generations an island sends copies of its best ``n_migrants`` strategies to
+its neighbours on the migration ``topology`` and replaces its worst members
+with whatever immigrants have arrived.  Migration is asynchronous: an island
+never waits for another one, so islands run at their own pace and search
+throughput scales with the number of cores.
+
+Islands run in separate processes (or threads with ``processes=False``).
+Migrants travel through an exchange:
+
+- :class:`QueueExchange` – multiprocessing queues, for islands of one
+  :class:`IslandModel` on one machine (the default);
+- :class:`FileExchange` – one JSON file per migration in a shared directory;
+- :class:`SQLiteExchange` – rows of a SQLite table.
+
+The file and SQLite exchanges let islands run on different nodes: start one
+process per island with :func:`run_island` (``controller.py --islands N
+--island-index i --exchange <dir or sqlite:///file> --run-id <id>``).  They
+are scoped by run id, so migrants left over from an earlier run sharing the
+directory or file never reach the islands of a new one.
+
+Usage example:
+```python
+from core.islands import IslandConfig, IslandModel
+
+model = IslandModel(runner, scorer, IslandConfig.spread(4, seed=0),
+                    topology="ring", migration_interval=5, n_migrants=2)
+populations = model.run(population, generations=50)
+best = max((g for pop in populations for g in pop), key=lambda g: g["score"])
+```
+"""
+from __future__ import annotations
+
+import contextlib
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Union
+
+from core import instrumentation
+from core.backtest_cache import normalize_pine
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "IslandConfig",
+    "IslandResult",
+    "TOPOLOGIES",
+    "destinations",
+    "QueueExchange",
+    "FileExchange",
+    "SQLiteExchange",
+    "exchange_from_url",
+    "run_island",
+    "IslandModel",
+]
+
+Genome = Dict[str, Any]
+TOPOLOGIES = ("ring", "bidirectional", "full", "random")
+Topology = Union[str, Mapping[int, Sequence[int]]]
+
+
+@dataclass
+class IslandConfig:
+    """GA parameters of one island."""
+
+    elitism_rate: float = 0.2
+    crossover_rate: float = 0.5
+    mutation_rate: float = 0.1
+    seed: Optional[int] = None
+
+    @classmethod
+    def spread(cls, n: int, seed: Optional[int] = None) -> List["IslandConfig"]:
+        """*n* islands from exploitative (low mutation) to explorative (high mutation)."""
+        configs = []
+        for i in range(n):
+            u = i / (n - 1) if n > 1 else 0.0
+            configs.append(cls(
+                elitism_rate=round(0.3 - 0.1 * u, 3),
+                crossover_rate=round(0.7 - 0.3 * u, 3),
+                mutation_rate=round(0.05 + 0.35 * u, 3),
+                seed=None if seed is None else seed + i,
+            ))
+        return configs
+
+
+@dataclass
+class IslandResult:
+    """Final population, migration counts and counters of one island."""
+
+    index: int
+    population: List[Genome]
+    sent: int = 0
+    received: int = 0
+    best_scores: List[float] = field(default_factory=list)  # per generation
+    validator_stats: Dict[str, int] = field(default_factory=dict)  # this island's checks
+    metrics: Dict[str, Any] = field(default_factory=dict)  # instrumentation dump of an island process
+
+
+def destinations(topology: Topology, src: int, n: int, rng: random.Random) -> List[int]:
+    """Islands that *src* sends migrants to."""
+    if n < 2:
+        return []
+    if isinstance(topology, Mapping):
+        return [int(d) for d in topology.get(src, ()) if int(d) != src]
+    if topology == "ring":
+        return [(src + 1) % n]
+    if topology == "bidirectional":
+        return sorted({(src - 1) % n, (src + 1) % n})
+    if topology == "full":
+        return [d for d in range(n) if d != src]
+    if topology == "random":
+        return [rng.choice([d for d in range(n) if d != src])]
+    raise ValueError(f"Unknown topology {topology!r}; expected one of {TOPOLOGIES} or a mapping")
+
+
+# ---------------------------------------------------------------------------
+# Exchanges
+# ---------------------------------------------------------------------------
+
+class QueueExchange:
+    """In-machine exchange over one :class:`multiprocessing.Queue` per island."""
+
+    def __init__(self, n_islands: int, context=None) -> None:
+        context = context or multiprocessing.get_context()
+        self._queues = [context.Queue() for _ in range(n_islands)]
+
+    def send(self, src: int, dst: int, generation: int, migrants: List[Genome]) -> None:
+        self._queues[dst].put(migrants)
+
+    def receive(self, dst: int) -> List[Genome]:
+        arrived: List[Genome] = []
+        while True:
+            try:
+                arrived += self._queues[dst].get_nowait()
+            except queue.Empty:
+                return arrived
+
+
+def _check_run_id(run_id: str) -> str:
+    if run_id in (".", "..") or Path(run_id).name != run_id:
+        raise ValueError(f"Invalid run id {run_id!r}")
+    return run_id
+
+
+class FileExchange:
+    """Exchange through JSON files in ``<directory>/<run_id>/to_<island>/`` (shared storage)."""
+
+    def __init__(self, directory: Union[str, Path], run_id: str = "") -> None:
+        self.run_id = _check_run_id(run_id) if run_id else ""
+        self.directory = Path(directory) / self.run_id if self.run_id else Path(directory)
+
+    def _inbox(self, island: int) -> Path:
+        inbox = self.directory / f"to_{island}"
+        inbox.mkdir(parents=True, exist_ok=True)
+        return inbox
+
+    def send(self, src: int, dst: int, generation: int, migrants: List[Genome]) -> None:
+        inbox = self._inbox(dst)
+        name = f"{generation:06d}_{src}_{uuid.uuid4().hex}.json"
+        fd, tmp = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=inbox)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(migrants, fh)
+            os.replace(tmp, inbox / name)  # readers never see a partial file
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp)
+            raise
+
+    def receive(self, dst: int) -> List[Genome]:
+        arrived: List[Genome] = []
+        for path in sorted(self._inbox(dst).glob("[0-9]*.json")):
+            try:
+                arrived += json.loads(path.read_text(encoding="utf-8"))
+                path.unlink()
+            except FileNotFoundError:
+                continue
+        return arrived
+
+
+class SQLiteExchange:
+    """Exchange through a ``migrants`` table of a SQLite file.
+
+    Rows carry the ``run_id`` they were sent under and only that run
+    receives them.  Each process opens its own connection; only the path and
+    run id are pickled.
+    """
+
+    def __init__(self, path: Union[str, Path], run_id: str = "") -> None:
+        self.path = str(path)
+        self.run_id = run_id
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path, "run_id": self.run_id}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["path"], state.get("run_id", ""))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS migrants ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, src INTEGER NOT NULL, dst INTEGER NOT NULL,"
+                " generation INTEGER NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL,"
+                " run_id TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(migrants)")}
+            if "run_id" not in columns:  # table written before exchanges were scoped by run
+                with contextlib.suppress(sqlite3.OperationalError):  # another node added it first
+                    self._conn.execute("ALTER TABLE migrants ADD COLUMN run_id TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_migrants_run_dst ON migrants (run_id, dst, id)")
+        return self._conn
+
+    def send(self, src: int, dst: int, generation: int, migrants: List[Genome]) -> None:
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO migrants (src, dst, generation, payload, created_at, run_id)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (src, dst, generation, json.dumps(migrants), time.time(), self.run_id),
+            )
+
+    def receive(self, dst: int) -> List[Genome]:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute("SELECT id, payload FROM migrants WHERE run_id = ? AND dst = ? ORDER BY id",
+                                    (self.run_id, dst)).fetchall()
+                if rows:
+                    conn.execute("DELETE FROM migrants WHERE run_id = ? AND dst = ? AND id <= ?",
+                                 (self.run_id, dst, rows[-1][0]))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [genome for _, payload in rows for genome in json.loads(payload)]
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def exchange_from_url(url: str, run_id: str = ""):
+    """``sqlite:///path.db`` → :class:`SQLiteExchange`; a directory → :class:`FileExchange`.
+
+    Both are scoped to *run_id*, which every node of the run must share.
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteExchange(url[len("sqlite:///"):], run_id)
+    if url.startswith("file://"):
+        url = url[len("file://"):]
+    return FileExchange(url, run_id)
+
+
+# ---------------------------------------------------------------------------
+# Islands
+# ---------------------------------------------------------------------------
+
+def _integrate(population: List[Genome], immigrants: List[Genome]) -> int:
+    """Replace the worst members of *population* with new *immigrants*; returns how many."""
+    present = {normalize_pine(g["code"]) for g in population}
+    fresh = []
+    for genome in sorted(immigrants, key=lambda g: g["score"], reverse=True):
+        key = normalize_pine(genome["code"])
+        if key not in present:
+            present.add(key)
+            fresh.append(genome)
+    population.sort(key=lambda g: g["score"], reverse=True)
+    fresh = [g for g in fresh[:len(population)] if g["score"] > population[-1]["score"]] if population else []
+    if fresh:
+        population[-len(fresh):] = fresh
+    return len(fresh)
+
+
+def run_island(
+    index: int,
+    n_islands: int,
+    population: List[Genome],
+    generations: int,
+    config: IslandConfig,
+    runner,
+    scorer,
+    exchange,
+    topology: Topology = "ring",
+    migration_interval: int = 5,
+    n_migrants: int = 2,
+    start_generation: int = 1,
+    persist: bool = False,
+    trainer_options: Optional[Dict[str, Any]] = None,
+    run_id: Optional[str] = None,
+) -> IslandResult:
+    """Evolve one island for *generations* generations, migrating as configured.
+
+    With ``persist`` every generation is written with
+    :func:`database.strategy_db.save_strategies` (``meta["island"]`` set,
+    rows tagged with ``run_id``).
+    """
+    from core.reinforcement import GATrainer
+
+    options = dict(trainer_options or {})
+    validator = options.get("validator")
+    if validator is not None:
+        # Count this island's checks apart from the other islands'
+        validator = options["validator"] = copy.copy(validator)
+        validator.stats = type(validator.stats)()
+    trainer = GATrainer(runner, scorer, seed=config.seed, **options)
+    trainer.elitism_rate = config.elitism_rate
+    trainer.crossover_rate = config.crossover_rate
+    trainer.mutation_rate = config.mutation_rate
+    rng = random.Random(config.seed)
+    result = IslandResult(index, [dict(g) for g in population])
+    try:
+        for gen in range(start_generation, start_generation + generations):
+            with instrumentation.span("island.generation"):
+                result.population = trainer.train_epoch(result.population)
+            if migration_interval > 0 and (gen - start_generation + 1) % migration_interval == 0:
+                best = sorted(result.population, key=lambda g: g["score"], reverse=True)[:n_migrants]
+                migrants = [{"code": g["code"], "score": g["score"],
+                             "meta": {**(g.get("meta") or {}), "origin_island": index}} for g in best]
+                for dst in destinations(topology, index, n_islands, rng):
+                    exchange.send(index, dst, gen, migrants)
+                    result.sent += len(migrants)
+                received = _integrate(result.population, exchange.receive(index))
+                result.received += received
+                instrumentation.incr("island.migrants_received", received)
+            for genome in result.population:
+                genome["meta"] = {**(genome.get("meta") or {}), "island": index}
+            if persist:
+                from database.strategy_db import save_strategies
+                save_strategies(result.population, generation=gen, run_id=run_id)
+            result.best_scores.append(max(g["score"] for g in result.population))
+            logger.debug("Island %d generation %d: best %.4f", index, gen, result.best_scores[-1])
+    finally:
+        trainer.close()
+    if validator is not None:
+        result.validator_stats = asdict(validator.stats)
+    return result
+
+
+def _island_main(results, kwargs: Dict[str, Any], generation: Optional[int] = None) -> None:
+    # With a *generation* this is an island process of an instrumented run:
+    # it records into an empty registry (even when forked) and reports it
+    registry = instrumentation.get()
+    if generation is not None:
+        registry.reset()
+        registry.enabled = True
+        registry.generation = generation
+    try:
+        result = run_island(**kwargs)
+        if generation is not None:
+            result.metrics = registry.dump()
+        results.put(("ok", kwargs["index"], result))
+    except BaseException:
+        results.put(("error", kwargs["index"], traceback.format_exc()))
+
+
+class IslandModel:
+    """Run several :func:`run_island` islands concurrently.
+
+    Args:
+        runner: Back-test runner; must be picklable with ``processes=True``.
+        scorer: A :class:`~core.scorer.BaseScorer`.
+        islands: Per-island :class:`IslandConfig`\\ s, or a count for
+            :meth:`IslandConfig.spread`.
+        topology: ``"ring"``, ``"bidirectional"``, ``"full"``, ``"random"`` or
+            a mapping ``island -> destination islands``.
+        migration_interval: Generations between migrations (``0`` disables).
+        n_migrants: Best strategies each island sends per destination.
+        exchange: Migrant transport; defaults to a :class:`QueueExchange`.
+        processes: Run islands in processes (``False``: threads).
+        seed: Base seed when *islands* is a count.
+        persist: Save every island generation to the database.
+        run_id: Tag of the persisted rows (the controller's run id).
+        trainer_options: Extra :class:`~core.reinforcement.GATrainer`
+            keyword arguments (``validator``, ``min_diversity`` …).
+    """
+
+    def __init__(
+        self,
+        runner,
+        scorer,
+        islands: Union[int, Sequence[IslandConfig]] = 4,
+        topology: Topology = "ring",
+        migration_interval: int = 5,
+        n_migrants: int = 2,
+        exchange=None,
+        processes: bool = True,
+        seed: Optional[int] = None,
+        persist: bool = False,
+        trainer_options: Optional[Dict[str, Any]] = None,
+        start_method: Optional[str] = None,
+        run_id: Optional[str] = None,
+    ) -> None:
+        self.configs = IslandConfig.spread(islands, seed) if isinstance(islands, int) else list(islands)
+        if not self.configs:
+            raise ValueError("An island model needs at least one island")
+        if isinstance(topology, str) and topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology {topology!r}; expected one of {TOPOLOGIES} or a mapping")
+        self.runner = runner
+        self.scorer = scorer
+        self.topology = topology
+        self.migration_interval = migration_interval
+        self.n_migrants = n_migrants
+        self.processes = processes
+        self.persist = persist
+        self.run_id = run_id
+        self.trainer_options = dict(trainer_options or {})
+        self._context = multiprocessing.get_context(start_method)
+        self.exchange = exchange if exchange is not None else QueueExchange(
+            len(self.configs), self._context if processes else None)
+
+    def split(self, population: Sequence[Genome]) -> List[List[Genome]]:
+        """Deal *population* round-robin (best first) onto the islands."""
+        ranked = sorted(population, key=lambda g: g["score"], reverse=True)
+        parts = [ranked[i::len(self.configs)] for i in range(len(self.configs))]
+        for part, config in zip(parts, self.configs):
+            if max(1, int(len(part) * config.elitism_rate)) < 2:
+                raise ValueError(
+                    f"{len(part)} strategies per island leave fewer than 2 elites to breed from; "
+                    "use a larger population or fewer islands")
+        return parts
+
+    def _kwargs(self, index: int, population: List[Genome], generations: int,
+                start_generation: int) -> Dict[str, Any]:
+        return dict(
+            index=index, n_islands=len(self.configs), population=population, generations=generations,
+            config=self.configs[index], runner=self.runner, scorer=self.scorer, exchange=self.exchange,
+            topology=self.topology, migration_interval=self.migration_interval,
+            n_migrants=self.n_migrants, start_generation=start_generation, persist=self.persist,
+            trainer_options=self.trainer_options, run_id=self.run_id,
+        )
+
+    def run_one(self, index: int, population: Sequence[Genome], generations: int,
+                start_generation: int = 1) -> IslandResult:
+        """Run only island *index* in this process (one node of a distributed run)."""
+        result = run_island(**self._kwargs(index, list(population), generations, start_generation))
+        self._merge_counters([result])
+        return result
+
+    def run_islands(self, population: Sequence[Genome], generations: int,
+                    start_generation: int = 1) -> List[IslandResult]:
+        """Evolve all islands concurrently; results in island order."""
+        parts = self.split(population)
+        if self.processes:
+            registry = instrumentation.get()
+            generation = registry.generation if registry.enabled else None
+            results = self._context.Queue()
+            workers = [self._context.Process(target=_island_main,
+                                             args=(results, self._kwargs(i, part, generations, start_generation),
+                                                   generation),
+                                             name=f"island-{i}", daemon=True)
+                       for i, part in enumerate(parts)]
+        else:
+            results = queue.Queue()
+            workers = [threading.Thread(target=_island_main, args=(results, self._kwargs(i, part, generations,
+                                                                                       start_generation)),
+                                        name=f"island-{i}", daemon=True)
+                       for i, part in enumerate(parts)]
+        for worker in workers:
+            worker.start()
+        outcomes: Dict[int, Any] = {}
+        errors = []
+        while len(outcomes) + len(errors) < len(workers):
+            try:
+                status, index, value = results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [i for i, w in enumerate(workers)
+                        if not w.is_alive() and i not in outcomes and getattr(w, "exitcode", 0)]
+                if dead:
+                    raise RuntimeError(f"Island process(es) {dead} died")
+                continue
+            if status == "ok":
+                outcomes[index] = value
+            else:
+                errors.append(f"island {index}:\n{value}")
+        for worker in workers:
+            worker.join()
+        if errors:
+            raise RuntimeError("Island failed: " + "\n".join(errors))
+        self._merge_counters(outcomes.values())
+        return [outcomes[i] for i in range(len(workers))]
+
+    def _merge_counters(self, results) -> None:
+        """Add the islands' validator checks and (from island processes) measurements here."""
+        validator = self.trainer_options.get("validator")
+        for result in results:
+            instrumentation.get().merge(result.metrics)
+            if validator is not None:
+                for name, value in result.validator_stats.items():
+                    setattr(validator.stats, name, getattr(validator.stats, name) + value)
+
+    def run(self, population: Sequence[Genome], generations: int, start_generation: int = 1) -> List[List[Genome]]:
+        """Evolve and return the final population of every island."""
+        with instrumentation.span("islands"):
+            results = self.run_islands(population, generations, start_generation)
+        logger.info("Islands finished: best %s, migrants received %s",
+                    [round(max(r.best_scores), 4) if r.best_scores else None for r in results],
+                    [r.received for r in results])
+        return [r.population for r in results]
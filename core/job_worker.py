@@ -0,0 +1,201 @@
+"""core/job_worker.py
+===================
+Worker process of the distributed evaluation queue (:mod:`database.job_queue`).
+
+A :class:`JobWorker` repeatedly claims a batch of jobs, back-tests and
+scores them with a :class:`~core.evaluator.PopulationEvaluator` and reports
+each outcome.  While a batch is being evaluated a heartbeat thread keeps the
+lease alive; if the worker dies the lease expires and another worker retries
+the jobs.  Start any number of workers on any node that can reach
+``DATABASE_URL``; a controller run with ``--executor queue`` enqueues its
+back-tests for them.
+
+Usage:
+    DATABASE_URL=postgresql://user:pw@db/strategies \\
+        python core/job_worker.py --batch 8 --executor process --workers 8
+
+Usage example:
+```python
+from core.job_worker import JobWorker
+
+worker = JobWorker(runner, scorer, lease=120, batch_size=4)
+worker.run(idle_timeout=60)    # until no job arrived for a minute
+```
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+from core import instrumentation
+from core.backtest_cache import BacktestCache, CachedBacktestRunner
+from core.backtest_runner import BacktestRunner, SessionBacktestRunner
+from core.evaluator import PopulationEvaluator
+from core.scorer import scorer_factory
+from database import job_queue
+from database.db_handler import init_db
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["JobWorker"]
+
+
+class JobWorker:
+    """Claim, evaluate and report queued jobs.
+
+    Args:
+        runner: Back-test runner (defaults to :class:`BacktestRunner`).
+        scorer: A :class:`~core.scorer.BaseScorer`.
+        worker_id: Name recorded on claimed jobs (default ``host:pid``).
+        lease: Seconds a claim stays valid without a heartbeat.
+        heartbeat_interval: Seconds between heartbeats (default ``lease / 3``).
+        batch_size: Jobs claimed at once.
+        poll_interval: Seconds to sleep when the queue is empty.
+        executor, max_workers, task_timeout, validator: Passed to the
+            :class:`~core.evaluator.PopulationEvaluator` evaluating a batch.
+    """
+
+    def __init__(
+        self,
+        runner=None,
+        scorer=None,
+        *,
+        worker_id: Optional[str] = None,
+        lease: float = 60.0,
+        heartbeat_interval: Optional[float] = None,
+        batch_size: int = 1,
+        poll_interval: float = 1.0,
+        executor: str = "serial",
+        max_workers: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        validator=None,
+    ) -> None:
+        if executor == "queue":
+            raise ValueError("A job worker cannot evaluate through the queue itself")
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = lease
+        self.heartbeat_interval = heartbeat_interval or lease / 3
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.evaluator = PopulationEvaluator(
+            runner or BacktestRunner(), scorer or scorer_factory(),
+            executor=executor, max_workers=max_workers, task_timeout=task_timeout, validator=validator,
+        )
+        self.processed = 0
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        """Finish the current batch, then return from :meth:`run`."""
+        self._stop.set()
+
+    def _keep_alive(self, token: str, done: threading.Event) -> None:
+        while not done.wait(self.heartbeat_interval):
+            try:
+                if not job_queue.heartbeat(token, self.lease):
+                    logger.warning("Worker %s lost lease %s", self.worker_id, token)
+                    return
+            except Exception:
+                logger.exception("Heartbeat failed")
+
+    def run_once(self) -> int:
+        """Claim and process one batch; returns the number of jobs claimed."""
+        jobs = job_queue.claim(self.worker_id, self.batch_size, self.lease)
+        if not jobs:
+            return 0
+        done = threading.Event()
+        beat = threading.Thread(target=self._keep_alive, args=(jobs[0].token, done), daemon=True)
+        beat.start()
+        try:
+            with instrumentation.span("worker.batch"):
+                evaluations = self.evaluator.evaluate([job.code for job in jobs])
+        except Exception as exc:
+            logger.exception("Worker %s failed on jobs %s", self.worker_id, [job.id for job in jobs])
+            for job in jobs:
+                job_queue.fail(job.id, job.token, f"{type(exc).__name__}: {exc}")
+            return len(jobs)
+        finally:
+            done.set()
+            beat.join()
+        for job, ev in zip(jobs, evaluations):
+            if not job_queue.complete(job.id, job.token, ev.score, ev.meta.get("metrics"), ev.error):
+                logger.warning("Job %d was taken over before worker %s finished it", job.id, self.worker_id)
+        self.processed += len(jobs)
+        return len(jobs)
+
+    def run(self, max_jobs: Optional[int] = None, idle_timeout: Optional[float] = None) -> int:
+        """Process jobs until stopped, *max_jobs* were handled or the queue
+        stayed empty for *idle_timeout* seconds; returns the jobs processed."""
+        start = self.processed
+        idle_since = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if max_jobs is not None and self.processed - start >= max_jobs:
+                    break
+                if self.run_once():
+                    idle_since = time.monotonic()
+                elif idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                    break
+                else:
+                    self._stop.wait(self.poll_interval)
+        finally:
+            self.evaluator.close()
+        logger.info("Worker %s processed %d jobs", self.worker_id, self.processed - start)
+        return self.processed - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate queued strategies from DATABASE_URL")
+    parser.add_argument("--worker-id", help="Name recorded on claimed jobs (default host:pid)")
+    parser.add_argument("--lease", type=float, default=60.0, help="Seconds a claim lives without a heartbeat")
+    parser.add_argument("--heartbeat", type=float, help="Seconds between heartbeats (default lease/3)")
+    parser.add_argument("--batch", type=int, default=1, help="Jobs claimed at once")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds between polls of an empty queue")
+    parser.add_argument("--executor", choices=["serial", "thread", "process"], default="serial",
+                        help="How a claimed batch is evaluated")
+    parser.add_argument("--workers", type=int, help="Evaluation pool size (default: CPU count)")
+    parser.add_argument("--task-timeout", type=float,
+                        help="Seconds before one evaluation scores 0 (not enforced by --executor serial)")
+    parser.add_argument("--backtest-cache", help="SQLite file caching back-test results on this node")
+    parser.add_argument("--tv-session", nargs="?", const="tv_state.json", metavar="STATE",
+                        help="Reuse one logged-in TradingView page (state from scripts/gen_tv_state.py)")
+    parser.add_argument("--purge-after", type=float, metavar="SECONDS",
+                        help="On start, delete jobs finished more than SECONDS ago")
+    parser.add_argument("--max-jobs", type=int, help="Exit after this many jobs")
+    parser.add_argument("--idle-timeout", type=float, help="Exit after this many seconds without jobs")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    init_db()
+    if args.purge_after is not None:
+        logger.info("Purged %d finished jobs", job_queue.purge(args.purge_after))
+    if args.tv_session and args.executor == "thread":
+        parser.error("--tv-session cannot be shared between threads; use the serial or process executor")
+    session = SessionBacktestRunner(args.tv_session) if args.tv_session else None
+    runner = session or BacktestRunner()
+    cache = None
+    if args.backtest_cache:
+        cache = BacktestCache(args.backtest_cache)
+        runner = CachedBacktestRunner(runner, cache)
+    worker = JobWorker(
+        runner, worker_id=args.worker_id, lease=args.lease, heartbeat_interval=args.heartbeat,
+        batch_size=args.batch, poll_interval=args.poll, executor=args.executor,
+        max_workers=args.workers, task_timeout=args.task_timeout,
+    )
+    try:
+        worker.run(max_jobs=args.max_jobs, idle_timeout=args.idle_timeout)
+    except KeyboardInterrupt:
+        logger.info("Interrupted; unfinished jobs will be retried after their lease expires")
+    finally:
+        if session is not None:
+            session.close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""core/llm_cache.py
+==================
+Persistent on-disk cache of GPT chat completions used by
+:mod:`core.strategy_generator`.
+
+Entries are keyed on everything that determines a completion — model,
+system prompt, user prompt, temperature, ``max_tokens`` — plus a *sample*
+index, so asking for fifty strategies from the same prompt still yields
+fifty distinct (cached) samples instead of one answer repeated.
+
+The cache is a :class:`~core.blob_store.BlobStore` table in a single SQLite
+file, with TTL and size-bounded (least recently used) eviction.  Hit/miss
+counters and the number of tokens saved by hits are kept in
+:attr:`LLMResponseCache.stats`.
+
+Usage example:
+```python
+from core.llm_cache import LLMResponseCache
+from core.strategy_generator import configure_response_cache
+
+configure_response_cache(LLMResponseCache("llm_cache.db", ttl=30 * 86400))
+```
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from core.blob_store import BlobStore
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["llm_cache_key", "LLMCacheStats", "LLMResponseCache"]
+
+
+def llm_cache_key(
+    model: str,
+    system: Optional[str],
+    prompt: str,
+    temperature: float,
+    max_tokens: int,
+    sample: int = 0,
+) -> str:
+    """Stable hash of one chat-completion request."""
+    payload = json.dumps(
+        [model, system or "", prompt, float(temperature), int(max_tokens), int(sample)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class LLMCacheStats:
+    """Counters of an :class:`LLMResponseCache`."""
+
+    hits: int = 0
+    misses: int = 0
+    saved_tokens: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of completion texts (a :class:`~core.blob_store.BlobStore`).
+
+    Args:
+        path: SQLite file; ``":memory:"`` for a throwaway cache.
+        ttl: Seconds an entry stays valid; ``None`` never expires.
+        max_entries: Maximum number of rows before LRU eviction.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = "llm_cache.db",
+        ttl: Optional[float] = None,
+        max_entries: int = 50_000,
+    ) -> None:
+        self.stats = LLMCacheStats()
+        self._lock = threading.Lock()
+        self._store = BlobStore(path, "llm_responses", max_entries=max_entries, max_age=ttl,
+                                encode=json.dumps, decode=json.loads, evict_every=128)
+
+    @property
+    def ttl(self) -> Optional[float]:
+        return self._store.max_age
+
+    @ttl.setter
+    def ttl(self, value: Optional[float]) -> None:
+        self._store.max_age = value
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for *key*, or ``None``."""
+        entry = self._store.get(key)
+        with self._lock:
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self.stats.saved_tokens += entry[1]
+        return entry[0]
+
+    def put(self, key: str, content: str, tokens: int = 0) -> None:
+        """Store *content* (and the tokens it cost) under *key*."""
+        evicted = self._store.put(key, [content, int(tokens or 0)])
+        with self._lock:
+            self.stats.evictions += evicted
+
+    def evict(self) -> int:
+        """Drop expired rows and trim the cache to ``max_entries``."""
+        removed = self._store.evict()
+        with self._lock:
+            self.stats.evictions += removed
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def close(self) -> None:
+        self._store.close()
@@ -0,0 +1,584 @@
+"""core/local_backtest.py
+=======================
+Vectorised NumPy back-test engine that evaluates strategies locally over
+OHLCV bars instead of round-tripping through the TradingView UI.
+
+The engine never loops over bars in Python.  :func:`backtest` reduces the
+entry/exit signals to their events, folds them into segments of constant
+position and derives every :class:`~core.result_extractor.BacktestResult`
+field from per-side prefix sums of the bar returns and range tables of the
+log equity, so its cost follows the number of signals rather than the
+number of bars.  A ``(k, n_bars)`` signal matrix evaluates *k* strategies in
+one call and :class:`LocalBacktestRunner` builds the price tables once.  The
+dense per-bar helpers (:func:`positions_from_signals`,
+:func:`strategy_returns`, :func:`compute_metrics`) compute the same figures
+bar by bar.
+
+Fill model: signals are evaluated on a bar's close and orders fill on that
+same close (TradingView's ``process_orders_on_close=true``).  Entries reverse
+an opposite position, ``pyramiding`` is always 0 and an open position at the
+end of the data is marked to market and counted as a trade.
+
+Usage example:
+```python
+from core.local_backtest import LocalBacktestRunner, load_bars
+
+runner = LocalBacktestRunner(load_bars("data/BTCUSDT_1D.csv"))
+result = runner.run_backtest(pine_code)
+```
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from core.result_extractor import BacktestResult
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "Bars",
+    "Signals",
+    "stack_signals",
+    "load_bars",
+    "positions_from_signals",
+    "strategy_returns",
+    "compute_metrics",
+    "backtest",
+    "LocalBacktestRunner",
+]
+
+_OHLCV = ("open", "high", "low", "close", "volume")
+_TIME_COLUMNS = ("time", "timestamp", "date", "datetime")
+
+
+@dataclass(frozen=True)
+class Bars:
+    """Columnar OHLCV series; ``time`` holds UTC epoch seconds."""
+
+    time: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __post_init__(self) -> None:
+        n = len(self.time)
+        for name in _OHLCV:
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"Column {name!r} has {len(getattr(self, name))} rows, expected {n}")
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def slice(self, start: Optional[int] = None, end: Optional[int] = None) -> "Bars":
+        """Return the bars with ``start <= time < end`` as views (no copy)."""
+        lo = 0 if start is None else int(np.searchsorted(self.time, start, side="left"))
+        hi = len(self) if end is None else int(np.searchsorted(self.time, end, side="left"))
+        return Bars(*(getattr(self, name)[lo:hi] for name in ("time",) + _OHLCV))
+
+
+@dataclass(frozen=True)
+class Signals:
+    """Boolean entry/exit series produced by a compiled strategy.
+
+    ``long_exit``/``short_exit`` may be ``None`` when the strategy only
+    reverses between entries.
+    """
+
+    long_entry: np.ndarray
+    short_entry: np.ndarray
+    long_exit: Optional[np.ndarray] = None
+    short_exit: Optional[np.ndarray] = None
+
+
+SignalFn = Callable[[str, Bars], Signals]
+
+
+def stack_signals(signals: Sequence[Signals]) -> Signals:
+    """Stack the signals of several strategies into one ``(k, n_bars)`` batch.
+
+    A missing exit series is equivalent to one without any exit.
+    """
+    def stack(name: str) -> Optional[np.ndarray]:
+        series = [getattr(s, name) for s in signals]
+        if all(x is None for x in series):
+            return None
+        n = np.shape(signals[0].long_entry)[-1]
+        return np.concatenate([np.zeros((1, n), bool) if x is None else np.atleast_2d(np.asarray(x, bool))
+                               for x in series])
+    return Signals(stack("long_entry"), stack("short_entry"), stack("long_exit"), stack("short_exit"))
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+def _parse_times(values: Sequence[str]) -> np.ndarray:
+    """Parse epoch seconds or ISO-8601 timestamps into int64 epoch seconds."""
+    try:
+        return np.asarray([float(v) for v in values], dtype=np.float64).astype(np.int64)
+    except ValueError:
+        return np.asarray(values, dtype="datetime64[s]").astype(np.int64)
+
+
+def load_bars(path: str | Path) -> Bars:
+    """Load OHLCV bars from a ``.csv`` or ``.npz`` file.
+
+    CSV files need a header with a time column (``time``/``timestamp``/
+    ``date``/``datetime``) plus ``open``, ``high``, ``low`` and ``close``;
+    ``volume`` is optional.  ``.npz`` archives must contain arrays with the
+    same names.  Rows are sorted by time.
+    """
+    path = Path(path)
+    if path.suffix == ".npz":
+        with np.load(path) as data:
+            columns = {name: data[name] for name in data.files}
+        time_key = next((c for c in _TIME_COLUMNS if c in columns), None)
+        if time_key is None:
+            raise ValueError(f"{path}: no time column in archive")
+        times = columns[time_key].astype(np.int64)
+    else:
+        with path.open("r", encoding="utf-8", newline="") as fh:
+            reader = csv.reader(fh)
+            header = [h.strip().lower() for h in next(reader)]
+            rows = [row for row in reader if row]
+        cols = list(zip(*rows)) if rows else [()] * len(header)
+        columns = dict(zip(header, cols))
+        time_key = next((c for c in _TIME_COLUMNS if c in columns), None)
+        if time_key is None:
+            raise ValueError(f"{path}: no time column in header {header}")
+        times = _parse_times(columns[time_key])
+
+    missing = [c for c in _OHLCV[:4] if c not in columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing}")
+    arrays = {
+        name: np.asarray(columns[name], dtype=np.float64)
+        if name in columns else np.zeros(len(times))
+        for name in _OHLCV
+    }
+    order = np.argsort(times, kind="stable")
+    logger.debug("Loaded %d bars from %s", len(times), path)
+    return Bars(time=times[order], **{name: arr[order] for name, arr in arrays.items()})
+
+
+# ---------------------------------------------------------------------------
+# Vectorised core
+# ---------------------------------------------------------------------------
+
+def positions_from_signals(
+    long_entry: np.ndarray,
+    short_entry: np.ndarray,
+    long_exit: Optional[np.ndarray] = None,
+    short_exit: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Fold entry/exit signals into a position series of ``+1/0/-1``.
+
+    The position at bar *t* follows the most recent entry; an exit for that
+    side after the entry flattens it.  Entries win over exits on the same bar
+    and simultaneous long and short entries cancel out.
+    """
+    le, se = np.broadcast_arrays(np.asarray(long_entry, bool), np.asarray(short_entry, bool))
+    n = le.shape[-1]
+    idx = np.arange(n, dtype=np.int32 if n < 2 ** 29 else np.int64)
+    # Pack (bar index, direction + 1) into one integer, so a single running
+    # maximum carries the most recent entry together with its direction
+    code = le.astype(idx.dtype) - se  # +1 long, -1 short, 0 none or both
+    entries = code != 0
+    code += 1
+    code |= idx << 2
+    code[~entries] = -1
+    np.maximum.accumulate(code, axis=-1, out=code)
+    direction = (code & 3).astype(np.int8)
+    direction -= 1
+    direction[code < 0] = 0
+    last_entry = code >> 2
+
+    for side, exits in ((1, long_exit), (-1, short_exit)):
+        if exits is None:
+            continue
+        exits = np.broadcast_to(np.asarray(exits, bool), direction.shape)
+        last_exit = np.where(exits, idx, -1)
+        np.maximum.accumulate(last_exit, axis=-1, out=last_exit)
+        direction[(direction == side) & (last_exit > last_entry)] = 0
+    return direction
+
+
+def strategy_returns(close: np.ndarray, position: np.ndarray, commission_pct: float = 0.0) -> np.ndarray:
+    """Per-bar strategy returns for *position* held from each bar's close.
+
+    ``commission_pct`` is charged on every unit of position change.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    bar_ret = np.zeros_like(close)
+    if len(close) > 1:
+        np.divide(close[1:], close[:-1], out=bar_ret[1:])
+        bar_ret[1:] -= 1.0
+
+    position = np.asarray(position)
+    held = np.zeros(position.shape, dtype=position.dtype)
+    held[..., 1:] = position[..., :-1]
+    returns = np.multiply(held, bar_ret, dtype=np.float64)
+    if commission_pct:
+        turnover = np.diff(held, axis=-1, prepend=0)
+        np.abs(turnover, out=turnover)
+        returns -= turnover * (commission_pct / 100.0)
+    # A position cannot lose more than the whole equity
+    return np.maximum(returns, -1.0, out=returns)
+
+
+def compute_metrics(
+    returns: np.ndarray,
+    position: np.ndarray,
+    periods_per_year: float = 252.0,
+) -> List[BacktestResult]:
+    """Compute :class:`BacktestResult` statistics for each row of *returns*.
+
+    Parameters
+    ----------
+    returns
+        Per-bar strategy returns, shape ``(n_bars,)`` or ``(k, n_bars)``.
+    position
+        Positions that produced *returns* (same shape).
+    periods_per_year
+        Bars per year used to annualise the Sharpe ratio.
+    """
+    returns = np.atleast_2d(np.asarray(returns, dtype=np.float64))
+    position = np.atleast_2d(position)
+    k, n = returns.shape
+    if n == 0:
+        return [BacktestResult(0.0, 0.0, 0.0, 0, 0.0, 0.0) for _ in range(k)]
+
+    # Strategies are flat on most bars, so the equity curves are computed
+    # over the non-zero returns only: row i of ``log_eq`` holds the running
+    # log equity after each of its non-zero returns, padded with its final
+    # value.  Zero returns leave equity unchanged, so every figure below is
+    # the same as over the full rows.
+    rows, cols = np.nonzero(returns != 0)
+    values = returns[rows, cols]
+    counts = np.bincount(rows, minlength=k)
+    offsets = np.zeros(k + 1, dtype=np.intp)
+    np.cumsum(counts, out=offsets[1:])
+    log_eq = np.zeros((k, counts.max(initial=1)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_eq[rows, np.arange(len(rows)) - offsets[rows]] = np.log1p(values)
+    np.cumsum(log_eq, axis=1, out=log_eq)
+    equity = np.exp(log_eq)
+    net_profit = np.expm1(log_eq[:, -1]) * 100.0
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    max_dd = (1.0 - equity / peak).max(axis=1) * 100.0
+
+    if n > 1:
+        mean = np.bincount(rows, weights=values, minlength=k) / n
+        dev = values - mean[rows]
+        var = (np.bincount(rows, weights=dev * dev, minlength=k) + (n - counts) * mean * mean) / (n - 1)
+        std = np.sqrt(var)
+        sharpe = np.divide(mean, std, out=np.zeros(k), where=std > 0) * math.sqrt(periods_per_year)
+    else:
+        sharpe = np.zeros(k)
+
+    # Trades are runs of a constant non-zero held position; nothing is held
+    # on the first bar, so every run starts at column >= 1
+    held = np.zeros((k, n), dtype=position.dtype)
+    held[:, 1:] = position[:, :-1]
+    change = np.zeros((k, n + 1), dtype=bool)
+    np.not_equal(held[:, 1:], held[:, :-1], out=change[:, 1:n])
+    change[:, n] = True
+    in_trade = held != 0
+    start_rows, start_cols = np.nonzero(change[:, :n] & in_trade)
+    _, end_cols = np.nonzero(change[:, 1:] & in_trade)
+
+    def log_equity_at(r: np.ndarray, c: np.ndarray) -> np.ndarray:
+        # Log equity at bar c of row r: the value after the row's last
+        # non-zero return at or before c (0 before the first one)
+        i = np.searchsorted(rows * n + cols, r * n + c, side="right") - 1
+        seen = i >= offsets[r]
+        return np.where(seen, log_eq[r, np.where(seen, i - offsets[r], 0)], 0.0)
+
+    trade_ret = np.expm1(log_equity_at(start_rows, end_cols) - log_equity_at(start_rows, start_cols - 1))
+
+    trades = np.bincount(start_rows, minlength=k)
+    wins = np.bincount(start_rows, weights=trade_ret > 0, minlength=k)
+    gross_profit = np.bincount(start_rows, weights=np.where(trade_ret > 0, trade_ret, 0.0), minlength=k)
+    gross_loss = np.bincount(start_rows, weights=np.where(trade_ret < 0, -trade_ret, 0.0), minlength=k)
+    win_rate = np.divide(wins, trades, out=np.zeros(k), where=trades > 0)
+    profit_factor = np.divide(gross_profit, gross_loss, out=np.zeros(k), where=gross_loss > 0)
+
+    return [
+        BacktestResult(
+            net_profit_pct=float(net_profit[i]),
+            max_drawdown_pct=float(max_dd[i]),
+            sharpe_ratio=float(sharpe[i]),
+            total_trades=int(trades[i]),
+            win_rate=float(win_rate[i]),
+            profit_factor=float(profit_factor[i]),
+        )
+        for i in range(k)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Event-driven core
+# ---------------------------------------------------------------------------
+
+#: Log equity of a wiped-out account (a bar that loses everything)
+_MIN_LOG = math.log(np.finfo(np.float64).tiny)
+
+
+def _log1p(x: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        return np.maximum(np.log1p(x), _MIN_LOG)
+
+
+class _PriceTables:
+    """Running sums of a close series' per-bar returns, per side.
+
+    Side 0 holds long and side 1 short: ``log[s, t]`` is the log equity of
+    holding side *s* from the first bar through bar *t*, ``ret``/``sq`` the
+    running sums of its returns and squared returns.  Sparse tables answer
+    the maximum, minimum and largest fall of ``log`` over any bar range in
+    O(1), so a held stretch of any length costs the same.
+    """
+
+    def __init__(self, close: np.ndarray) -> None:
+        close = np.asarray(close, dtype=np.float64)
+        n = len(close)
+        bar_ret = np.zeros(n)
+        if n > 1:
+            np.divide(close[1:], close[:-1], out=bar_ret[1:])
+            bar_ret[1:] -= 1.0
+        self.bar_ret = bar_ret
+        # A position cannot lose more than the whole equity
+        side_ret = np.maximum(np.stack([bar_ret, -bar_ret]), -1.0)
+        self.ret = np.cumsum(side_ret, axis=1)
+        self.sq = np.cumsum(side_ret * side_ret, axis=1)
+        self.log = np.cumsum(_log1p(side_ret), axis=1)
+
+        levels = max(n.bit_length(), 1)
+        self._max = np.empty((2, levels, n))
+        self._min = np.empty((2, levels, n))
+        self._drop = np.zeros((2, levels, n))
+        self._max[:, 0] = self._min[:, 0] = self.log
+        for j in range(1, levels):
+            half, width = 1 << (j - 1), n - (1 << j) + 1
+            lo, hi = slice(0, width), slice(half, half + width)
+            prev_max, prev_min, prev_drop = self._max[:, j - 1], self._min[:, j - 1], self._drop[:, j - 1]
+            np.maximum(prev_max[:, lo], prev_max[:, hi], out=self._max[:, j, lo])
+            np.minimum(prev_min[:, lo], prev_min[:, hi], out=self._min[:, j, lo])
+            np.maximum(np.maximum(prev_drop[:, lo], prev_drop[:, hi]), prev_max[:, lo] - prev_min[:, hi],
+                       out=self._drop[:, j, lo])
+
+    def span(self, side: np.ndarray, a: np.ndarray, b: np.ndarray):
+        """Maximum, minimum and largest fall (``log[u] - log[t]``, ``u <= t``) over bars ``a..b``."""
+        length = b - a + 1
+        j = np.frexp(length)[1] - 1  # floor(log2(length))
+        c = b - (1 << j) + 1
+        top = np.maximum(self._max[side, j, a], self._max[side, j, c])
+        bottom = np.minimum(self._min[side, j, a], self._min[side, j, c])
+        fall = np.maximum(self._drop[side, j, a], self._drop[side, j, c])
+        # A fall from the first block into the bars after it
+        rest = length - (1 << j)
+        tail = rest > 0
+        r = np.frexp(np.maximum(rest, 1))[1] - 1
+        a2 = np.where(tail, a + (1 << j), a)
+        tail_min = np.minimum(self._min[side, r, a2], self._min[side, r, np.where(tail, b - (1 << r) + 1, a)])
+        fall = np.where(tail, np.maximum(fall, self._max[side, j, a] - tail_min), fall)
+        return top, bottom, fall
+
+
+def _padded(rows: np.ndarray, col: np.ndarray, values: np.ndarray, k: int, width: int, fill: float) -> np.ndarray:
+    """Scatter per-segment *values* into a ``(k, width)`` matrix, one row per strategy."""
+    out = np.full((k, max(width, 1)), fill)
+    out[rows, col] = values
+    return out
+
+
+def _event_backtest(
+    tables: _PriceTables,
+    signals: Signals,
+    commission_pct: float,
+    periods_per_year: float,
+) -> List[BacktestResult]:
+    """Back-test *signals* from their events instead of from every bar.
+
+    Positions change only on bars with a signal, so the signal matrix is
+    reduced to its events once; each stretch of constant held position is
+    then valued from the running sums and range tables of *tables*.  The
+    results match :func:`positions_from_signals` →
+    :func:`strategy_returns` → :func:`compute_metrics` up to rounding.
+    """
+    n = len(tables.bar_ret)
+    series = [None if x is None else np.atleast_2d(np.asarray(x, bool))
+              for x in (signals.long_entry, signals.short_entry, signals.long_exit, signals.short_exit)]
+    shape = np.broadcast_shapes(*(x.shape for x in series if x is not None))
+    le, se, lx, sx = (None if x is None else np.broadcast_to(x, shape) for x in series)
+    k = shape[0]
+    if n == 0:
+        return [BacktestResult(0.0, 0.0, 0.0, 0, 0.0, 0.0) for _ in range(k)]
+
+    # Position after each event: the latest entry's side (simultaneous long
+    # and short entries cancel), flat once an exit of that side follows it
+    code = le.astype(np.int8) - se
+    event = code != 0
+    for exits in (lx, sx):
+        if exits is not None:
+            event |= exits
+    rows, cols = np.nonzero(event)
+    codes = code[rows, cols]
+    idx = np.arange(len(rows))
+    offsets = np.zeros(k + 1, dtype=np.intp)
+    np.cumsum(np.bincount(rows, minlength=k), out=offsets[1:])
+    row_first = offsets[rows]
+    last_entry = np.where(codes != 0, idx, -1)
+    np.maximum.accumulate(last_entry, out=last_entry)
+    pos = np.where(last_entry >= row_first, codes[np.maximum(last_entry, 0)], 0).astype(np.int8)
+    for side, exits in ((1, lx), (-1, sx)):
+        if exits is not None:
+            last_exit = np.where(exits[rows, cols], idx, -1)
+            np.maximum.accumulate(last_exit, out=last_exit)
+            pos[(pos == side) & (last_exit > last_entry)] = 0
+
+    # Segments: the held position (the previous bar's) changes one bar
+    # after the position; each lasts until the row's next change
+    prev = np.zeros_like(pos)
+    prev[1:] = pos[:-1]
+    prev[idx == row_first] = 0
+    changed = (pos != prev) & (cols < n - 1)
+    seg_row, start = rows[changed], cols[changed] + 1
+    held, before = pos[changed].astype(np.intp), prev[changed].astype(np.intp)
+    counts = np.bincount(seg_row, minlength=k)
+    seg_offsets = np.zeros(k + 1, dtype=np.intp)
+    np.cumsum(counts, out=seg_offsets[1:])
+    seg_col = np.arange(len(seg_row)) - seg_offsets[seg_row]
+    end = np.full(len(seg_row), n - 1)
+    same_row = seg_row[1:] == seg_row[:-1]
+    end[:-1][same_row] = start[1:][same_row] - 1
+
+    # The first bar of a segment pays commission on the position change
+    first_ret = held * tables.bar_ret[start] - np.abs(held - before) * (commission_pct / 100.0)
+    np.maximum(first_ret, -1.0, out=first_ret)
+    first_log = _log1p(first_ret)
+    in_trade = held != 0
+    side = (held < 0).astype(np.intp)
+    log_gain = np.where(in_trade, tables.log[side, end] - tables.log[side, start], 0.0)
+    ret_sum = np.where(in_trade, tables.ret[side, end] - tables.ret[side, start], 0.0)
+    sq_sum = np.where(in_trade, tables.sq[side, end] - tables.sq[side, start], 0.0)
+
+    width = int(counts.max(initial=0))
+    log_end = _padded(seg_row, seg_col, first_log + log_gain, k, width, 0.0)
+    np.cumsum(log_end, axis=1, out=log_end)
+    log_before = np.zeros_like(log_end)
+    log_before[:, 1:] = log_end[:, :-1]
+    seg_end, seg_before = log_end[seg_row, seg_col], log_before[seg_row, seg_col]
+
+    # Drawdown: the fall within each segment, or from an earlier peak to
+    # the segment's low
+    base = seg_before + first_log
+    top, bottom, fall = tables.span(side, start, end)
+    offset = base - tables.log[side, start]
+    seg_max = np.where(in_trade, offset + top, base)
+    seg_min = np.where(in_trade, offset + bottom, base)
+    fall = np.where(in_trade, fall, 0.0)
+    peak = _padded(seg_row, seg_col, seg_max, k, width, -np.inf)
+    np.maximum.accumulate(peak, axis=1, out=peak)
+    peak_before = np.zeros_like(peak)
+    peak_before[:, 1:] = np.maximum(peak[:, :-1], 0.0)
+    worst = np.maximum(peak_before[seg_row, seg_col] - seg_min, fall)
+    max_dd = -np.expm1(-_padded(seg_row, seg_col, worst, k, width, 0.0).max(axis=1).clip(min=0.0)) * 100.0
+    net_profit = np.expm1(log_end[:, -1]) * 100.0
+
+    if n > 1:
+        total = np.bincount(seg_row, weights=first_ret + ret_sum, minlength=k)
+        total_sq = np.bincount(seg_row, weights=first_ret * first_ret + sq_sum, minlength=k)
+        mean = total / n
+        std = np.sqrt(np.maximum(total_sq - total * mean, 0.0) / (n - 1))
+        sharpe = np.divide(mean, std, out=np.zeros(k), where=std > 0) * math.sqrt(periods_per_year)
+    else:
+        sharpe = np.zeros(k)
+
+    # Every segment with a non-zero held position is one trade
+    trade_row = seg_row[in_trade]
+    trade_ret = np.expm1(seg_end[in_trade] - seg_before[in_trade])
+    trades = np.bincount(trade_row, minlength=k)
+    wins = np.bincount(trade_row, weights=trade_ret > 0, minlength=k)
+    gross_profit = np.bincount(trade_row, weights=np.where(trade_ret > 0, trade_ret, 0.0), minlength=k)
+    gross_loss = np.bincount(trade_row, weights=np.where(trade_ret < 0, -trade_ret, 0.0), minlength=k)
+    win_rate = np.divide(wins, trades, out=np.zeros(k), where=trades > 0)
+    profit_factor = np.divide(gross_profit, gross_loss, out=np.zeros(k), where=gross_loss > 0)
+
+    return [
+        BacktestResult(
+            net_profit_pct=float(net_profit[i]),
+            max_drawdown_pct=float(max_dd[i]),
+            sharpe_ratio=float(sharpe[i]),
+            total_trades=int(trades[i]),
+            win_rate=float(win_rate[i]),
+            profit_factor=float(profit_factor[i]),
+        )
+        for i in range(k)
+    ]
+
+
+def backtest(
+    bars: Bars,
+    signals: Signals,
+    *,
+    commission_pct: float = 0.0,
+    periods_per_year: float = 252.0,
+) -> List[BacktestResult]:
+    """Back-test *signals* over *bars*; returns one result per signal row."""
+    return _event_backtest(_PriceTables(bars.close), signals, commission_pct, periods_per_year)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+class LocalBacktestRunner:
+    """Drop-in replacement for :class:`core.backtest_runner.BacktestRunner`.
+
+    ``signal_fn`` turns Pine Script source into :class:`Signals` over the
+    runner's bars (defaults to :func:`core.pine_compiler.pine_signals`);
+    everything after that is pure array math.
+    """
+
+    def __init__(
+        self,
+        bars: Bars,
+        signal_fn: Optional[SignalFn] = None,
+        *,
+        commission_pct: float = 0.0,
+        periods_per_year: float = 252.0,
+    ) -> None:
+        if signal_fn is None:
+            from core.pine_compiler import pine_signals  # avoid import cycle
+
+            signal_fn = pine_signals
+        self.bars = bars
+        self.signal_fn = signal_fn
+        self.commission_pct = commission_pct
+        self.periods_per_year = periods_per_year
+        self._tables: Optional[_PriceTables] = None
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        state["_tables"] = None  # rebuilt on first use
+        return state
+
+    def run_signals(self, signals: Signals) -> List[BacktestResult]:
+        """Evaluate pre-computed (optionally batched) signals."""
+        if self._tables is None:
+            self._tables = _PriceTables(self.bars.close)
+        return _event_backtest(self._tables, signals, self.commission_pct, self.periods_per_year)
+
+    def run_backtest(self, pine_script: str) -> BacktestResult:
+        """Back-test one Pine Script strategy over the runner's bars."""
+        return self.run_signals(self.signal_fn(pine_script, self.bars))[0]
@@ -0,0 +1,271 @@
+"""core/market_data.py
+====================
+On-disk columnar OHLCV store shared zero-copy between processes.
+
+Every ``(symbol, timeframe)`` series is kept as six contiguous ``.npy``
+files (``time`` as int64 UTC epoch seconds, the OHLCV columns as float64)
+plus one small ``index.json`` describing all series.  Columns are opened
+lazily with ``np.load(mmap_mode="r")``, so reading a series touches only the
+pages actually used, date-range slices are views into the mapping, and every
+process that maps the same file shares the operating system's page cache
+instead of holding its own copy.
+
+A :class:`MarketDataStore` pickles as its root path only; a
+:class:`MarketDataRunner` shipped to a process pool therefore re-maps the
+files in each worker rather than serialising gigabytes of bars.
+
+Layout::
+
+    <root>/index.json
+    <root>/<SYMBOL>/<TIMEFRAME>/{time,open,high,low,close,volume}.npy
+
+Usage example:
+```python
+from core.local_backtest import load_bars
+from core.market_data import MarketDataRunner, MarketDataStore
+
+store = MarketDataStore("data/store")
+store.write("BTCUSDT", "1D", load_bars("data/BTCUSDT_1D.csv"))
+bars = store.bars("BTCUSDT", "1D", start="2021-01-01", end="2023-01-01")  # views
+
+runner = MarketDataRunner(store, "1D", ["BTCUSDT", "ETHUSDT"], start="2021-01-01")
+result = runner.run_backtest(pine_code)
+```
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.local_backtest import Bars, LocalBacktestRunner, SignalFn
+from core.result_extractor import BacktestResult
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["MarketDataStore", "MarketDataRunner", "to_epoch"]
+
+_COLUMNS = ("time", "open", "high", "low", "close", "volume")
+_INDEX = "index.json"
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+TimeLike = Union[int, float, str, date, datetime, np.datetime64, None]
+
+
+def to_epoch(value: TimeLike) -> Optional[int]:
+    """Convert epoch seconds, ISO-8601 strings, dates or datetimes to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(np.datetime64(value, "s").astype(np.int64))
+
+
+def _key(symbol: str, timeframe: str) -> str:
+    return f"{symbol}/{timeframe}"
+
+
+class MarketDataStore:
+    """Directory of memory-mapped per-symbol/per-timeframe OHLCV columns.
+
+    Args:
+        root: Store directory (created on first write).
+    """
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._mapped: Dict[str, Bars] = {}
+        self._lock = threading.Lock()
+
+    # Only the path crosses process boundaries; workers re-map the files.
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"root": self.root}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["root"])
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            path = self.root / _INDEX
+            self._index = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        return self._index
+
+    def _write_index(self, index: Dict[str, Dict[str, Any]]) -> None:
+        _atomic_write(self.root / _INDEX, lambda fh: fh.write(json.dumps(index, indent=1).encode("utf-8")))
+        self._index = index
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """All stored ``(symbol, timeframe)`` pairs."""
+        return [(e["symbol"], e["timeframe"]) for e in self._load_index().values()]
+
+    def info(self, symbol: str, timeframe: str) -> Dict[str, Any]:
+        """Index entry of one series: ``rows``, ``start``, ``end`` and ``path``."""
+        try:
+            return dict(self._load_index()[_key(symbol, timeframe)])
+        except KeyError:
+            raise KeyError(f"No bars stored for {symbol} {timeframe}") from None
+
+    def __contains__(self, item: Tuple[str, str]) -> bool:
+        return _key(*item) in self._load_index()
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def write(self, symbol: str, timeframe: str, bars: Bars, *, append: bool = False) -> int:
+        """Store *bars* (sorted by time) for one series; returns the row count.
+
+        With ``append`` the new bars must start after the stored ones and are
+        concatenated to them.  Each column file and the index are replaced
+        atomically, so concurrent readers see either the old or the new data.
+        """
+        if len(bars) and np.any(np.diff(bars.time) <= 0):
+            raise ValueError("bars must be strictly increasing in time")
+        with self._lock:
+            index = dict(self._load_index())
+            key = _key(symbol, timeframe)
+            if append and key in index:
+                old = self._open(key, index[key])
+                if len(old) and len(bars) and bars.time[0] <= old.time[-1]:
+                    raise ValueError("appended bars must start after the stored ones")
+                bars = Bars(*(np.concatenate([getattr(old, c), getattr(bars, c)]) for c in _COLUMNS))
+            rel = Path(_UNSAFE.sub("_", symbol)) / _UNSAFE.sub("_", timeframe)
+            directory = self.root / rel
+            directory.mkdir(parents=True, exist_ok=True)
+            for name in _COLUMNS:
+                dtype = np.int64 if name == "time" else np.float64
+                column = np.ascontiguousarray(getattr(bars, name), dtype=dtype)
+                _atomic_write(directory / f"{name}.npy", lambda fh, col=column: np.save(fh, col))
+            index[key] = {
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "path": rel.as_posix(),
+                "rows": len(bars),
+                "start": int(bars.time[0]) if len(bars) else None,
+                "end": int(bars.time[-1]) if len(bars) else None,
+            }
+            self._write_index(index)
+            self._mapped.pop(key, None)
+        return len(bars)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _open(self, key: str, entry: Dict[str, Any]) -> Bars:
+        bars = self._mapped.get(key)
+        if bars is None:
+            directory = self.root / entry["path"]
+            mode = "r" if entry["rows"] else None  # empty files cannot be mapped
+            bars = Bars(*(np.load(directory / f"{name}.npy", mmap_mode=mode) for name in _COLUMNS))
+            self._mapped[key] = bars
+        return bars
+
+    def bars(self, symbol: str, timeframe: str, start: TimeLike = None, end: TimeLike = None) -> Bars:
+        """Bars with ``start <= time < end`` as read-only views of the mapped files."""
+        key = _key(symbol, timeframe)
+        entry = self.info(symbol, timeframe)
+        with self._lock:
+            bars = self._open(key, entry)
+        return bars.slice(to_epoch(start), to_epoch(end))
+
+
+def _atomic_write(path: Path, write) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+class MarketDataRunner:
+    """Local back-test runner over one or more series of a :class:`MarketDataStore`.
+
+    Picklable without its bars: process-pool workers map the store files
+    themselves, so a population can be evaluated across many symbols
+    without duplicating the data per worker.
+
+    With several symbols, :meth:`run_backtest` combines the per-symbol
+    results: mean net profit, Sharpe ratio, win rate and profit factor, the
+    worst drawdown and the total number of trades.  :meth:`run_backtest_all`
+    returns them individually.
+    """
+
+    def __init__(
+        self,
+        store: MarketDataStore,
+        timeframe: str,
+        symbols: Union[str, Sequence[str]],
+        start: TimeLike = None,
+        end: TimeLike = None,
+        signal_fn: Optional[SignalFn] = None,
+        *,
+        commission_pct: float = 0.0,
+        periods_per_year: float = 252.0,
+    ) -> None:
+        self.store = store
+        self.timeframe = timeframe
+        self.symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.start = to_epoch(start)
+        self.end = to_epoch(end)
+        self.signal_fn = signal_fn
+        self.commission_pct = commission_pct
+        self.periods_per_year = periods_per_year
+        self._runners: Dict[str, LocalBacktestRunner] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state["_runners"] = {}
+        return state
+
+    def cache_slice(self) -> Tuple[str, str, Optional[int], Optional[int]]:
+        """``(symbols, timeframe, start, end)`` for :class:`~core.backtest_cache.CachedBacktestRunner` keys."""
+        return ",".join(self.symbols), self.timeframe, self.start, self.end
+
+    def _runner(self, symbol: str) -> LocalBacktestRunner:
+        runner = self._runners.get(symbol)
+        if runner is None:
+            bars = self.store.bars(symbol, self.timeframe, self.start, self.end)
+            runner = LocalBacktestRunner(bars, self.signal_fn, commission_pct=self.commission_pct,
+                                         periods_per_year=self.periods_per_year)
+            self._runners[symbol] = runner
+        return runner
+
+    def run_backtest_all(self, pine_script: str) -> Dict[str, BacktestResult]:
+        return {symbol: self._runner(symbol).run_backtest(pine_script) for symbol in self.symbols}
+
+    def run_backtest(self, pine_script: str) -> BacktestResult:
+        results = list(self.run_backtest_all(pine_script).values())
+        if len(results) == 1:
+            return results[0]
+        n = len(results)
+        return BacktestResult(
+            net_profit_pct=sum(r.net_profit_pct for r in results) / n,
+            max_drawdown_pct=max(r.max_drawdown_pct for r in results),
+            sharpe_ratio=sum(r.sharpe_ratio for r in results) / n,
+            total_trades=sum(r.total_trades for r in results),
+            win_rate=sum(r.win_rate for r in results) / n,
+            profit_factor=sum(r.profit_factor for r in results) / n,
+        )
@@ -0,0 +1,1483 @@
+"""core/pine_compiler.py
+======================
+Tokenizer, parser and compiler for the Pine Script v5 subset emitted by
+:mod:`core.strategy_generator`.
+
+A script is compiled once into a :class:`CompiledStrategy`: a flat,
+common-subexpression-eliminated list of :class:`Step` objects, each of which
+is a whole-series NumPy operation (``ta.sma``, ``>``, ``ta.crossover`` …).
+Evaluating the plan over :class:`~core.local_backtest.Bars` runs every step
+exactly once over full arrays and folds the ``strategy.entry`` /
+``strategy.close`` calls into :class:`~core.local_backtest.Signals`; there is
+no bar-by-bar interpreter.
+
+Supported subset:
+- ``strategy()`` declaration, ``input`` / ``input.int`` / ``input.float`` /
+  ``input.bool`` / ``input.string`` / ``input.source``
+- assignments (``=``, top-level ``:=`` / ``+=`` rebinding, type keywords and
+  ``[a, b, c] = ...`` destructuring)
+- arithmetic, comparison, ``and``/``or``/``not``, ``?:``, history ``x[n]``
+  with a constant offset, ``na``/``nz`` and ``math.*``
+- ``ta.sma/ema/rma/wma/rsi/stdev/bb/macd/atr/tr/highest/lowest/change/mom/
+  roc/stoch/crossover/crossunder/cross``
+- ``if``/``else`` blocks containing ``strategy.entry``, ``strategy.close`` and
+  ``strategy.close_all`` calls
+- plotting/alert calls are accepted and ignored
+
+Anything else raises :class:`UnsupportedConstructError` with the line and
+column of the offending construct.
+
+Usage example:
+```python
+from core.pine_compiler import compile_pine
+
+plan = compile_pine(pine_code)
+signals = plan.evaluate(bars, {"length": 30})
+```
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "PineSyntaxError",
+    "UnsupportedConstructError",
+    "Token",
+    "tokenize",
+    "parse",
+    "unparse",
+    "InputSpec",
+    "Step",
+    "Order",
+    "CompiledStrategy",
+    "compile_pine",
+    "pine_signals",
+]
+
+
+class PineSyntaxError(ValueError):
+    """Raised when a script cannot be tokenized or parsed."""
+
+    def __init__(self, message: str, line: int = 0, col: int = 0) -> None:
+        self.line = line
+        self.col = col
+        self.message = message
+        super().__init__(f"line {line}, col {col}: {message}" if line else message)
+
+
+class UnsupportedConstructError(PineSyntaxError):
+    """Raised for valid Pine Script that falls outside the compiled subset."""
+
+    def __init__(self, message: str, line: int = 0, col: int = 0) -> None:
+        super().__init__(f"unsupported construct: {message}", line, col)
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Token:
+    kind: str  # NUMBER, STRING, COLOR, NAME, OP, NEWLINE, INDENT, DEDENT, EOF
+    value: str
+    line: int
+    col: int
+
+
+_TOKEN_RE = re.compile(
+    r"""
+     (?P<ws>[ \t]+)
+    |(?P<comment>//.*)
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    |(?P<color>\#[0-9a-fA-F]{6}(?:[0-9a-fA-F]{2})?\b)
+    |(?P<name>[A-Za-z_][A-Za-z_0-9]*)
+    |(?P<op>:=|==|!=|<=|>=|=>|\+=|-=|\*=|/=|%=|[-+*/%<>=?:,.()\[\]])
+    """,
+    re.VERBOSE,
+)
+_VERSION_RE = re.compile(r"//\s*@version\s*=\s*(\d+)")
+_INDENT = 4
+
+
+def _indent_width(line: str) -> int:
+    width = 0
+    for ch in line:
+        if ch == " ":
+            width += 1
+        elif ch == "\t":
+            width += _INDENT
+        else:
+            break
+    return width
+
+
+def tokenize(source: str) -> List[Token]:
+    """Split *source* into tokens with Python-style ``INDENT``/``DEDENT``.
+
+    Newlines inside brackets are ignored and lines indented by a
+    non-multiple of four spaces continue the previous line, as in Pine.
+    """
+    tokens: List[Token] = []
+    indents = [0]
+    depth = 0
+    for lineno, raw in enumerate(source.splitlines(), start=1):
+        line = raw.rstrip()
+        stripped = line.lstrip()
+        if not stripped or stripped.startswith("//"):
+            continue
+
+        if depth == 0:
+            width = _indent_width(line)
+            continuation = width % _INDENT != 0 and tokens and tokens[-1].kind != "NEWLINE"
+            if not continuation:
+                if tokens and tokens[-1].kind not in ("NEWLINE", "INDENT", "DEDENT"):
+                    tokens.append(Token("NEWLINE", "", lineno, 0))
+                level = width // _INDENT
+                if width % _INDENT:
+                    raise PineSyntaxError("indentation must be a multiple of 4 spaces", lineno, 1)
+                if level > indents[-1]:
+                    if level != indents[-1] + 1:
+                        raise PineSyntaxError("unexpected indent", lineno, 1)
+                    indents.append(level)
+                    tokens.append(Token("INDENT", "", lineno, 1))
+                while level < indents[-1]:
+                    indents.pop()
+                    tokens.append(Token("DEDENT", "", lineno, 1))
+                if level != indents[-1]:
+                    raise PineSyntaxError("inconsistent dedent", lineno, 1)
+
+        pos = 0
+        while pos < len(line):
+            m = _TOKEN_RE.match(line, pos)
+            if not m:
+                raise PineSyntaxError(f"unexpected character {line[pos]!r}", lineno, pos + 1)
+            kind = m.lastgroup
+            text = m.group()
+            if kind == "comment":
+                break
+            if kind != "ws":
+                if kind == "op" and text in "([":
+                    depth += 1
+                elif kind == "op" and text in ")]":
+                    depth -= 1
+                    if depth < 0:
+                        raise PineSyntaxError(f"unbalanced {text!r}", lineno, pos + 1)
+                tokens.append(Token(kind.upper(), text, lineno, pos + 1))
+            pos = m.end()
+
+    last = tokens[-1].line if tokens else 0
+    if depth:
+        raise PineSyntaxError("unclosed bracket at end of script", last, 0)
+    if tokens and tokens[-1].kind not in ("NEWLINE", "DEDENT"):
+        tokens.append(Token("NEWLINE", "", last, 0))
+    tokens.extend(Token("DEDENT", "", last, 0) for _ in indents[1:])
+    tokens.append(Token("EOF", "", last, 0))
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# AST
+# ---------------------------------------------------------------------------
+
+class Node:
+    """Base class for AST nodes; every node has a ``pos`` of ``(line, col)``."""
+
+    pos: Tuple[int, int]
+
+
+_POS = field(default=(0, 0), compare=False, repr=False)
+
+
+@dataclass
+class Num(Node):
+    value: float
+    pos: Tuple[int, int] = _POS
+    raw: Optional[str] = field(default=None, compare=False, repr=False)  # source spelling
+
+
+@dataclass
+class Str(Node):
+    value: str
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Bool(Node):
+    value: bool
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Name(Node):
+    id: str  # dotted names such as ``strategy.long`` are a single Name
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Call(Node):
+    func: str
+    args: List[Node]
+    kwargs: List[Tuple[str, Node]]
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Index(Node):
+    value: Node
+    offset: Node
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Unary(Node):
+    op: str
+    operand: Node
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Binary(Node):
+    op: str
+    left: Node
+    right: Node
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Ternary(Node):
+    cond: Node
+    then: Node
+    orelse: Node
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Assign(Node):
+    targets: List[str]
+    op: str  # "=", ":=", "+=", ...
+    value: Node
+    type_hint: Optional[str] = None
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class ExprStmt(Node):
+    expr: Node
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class If(Node):
+    cond: Node
+    body: List[Node]
+    orelse: List[Node]
+    pos: Tuple[int, int] = _POS
+
+
+@dataclass
+class Script(Node):
+    version: Optional[int]
+    body: List[Node]
+    pos: Tuple[int, int] = _POS
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+
+_TYPE_KEYWORDS = {"int", "float", "bool", "string", "color", "series", "simple", "const"}
+_UNSUPPORTED_KEYWORDS = {
+    "for": "for loops",
+    "while": "while loops",
+    "switch": "switch statements",
+    "var": "var declarations",
+    "varip": "varip declarations",
+    "import": "library imports",
+    "export": "library exports",
+    "method": "method declarations",
+    "type": "user-defined types",
+}
+_ASSIGN_OPS = {"=", ":=", "+=", "-=", "*=", "/=", "%="}
+_BINARY_LEVELS: Sequence[Tuple[str, ...]] = (
+    ("or",),
+    ("and",),
+    ("==", "!="),
+    ("<", ">", "<=", ">="),
+    ("+", "-"),
+    ("*", "/", "%"),
+)
+
+
+class _Parser:
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens = tokens
+        self.i = 0
+
+    # -- token helpers --------------------------------------------------
+    def peek(self, ahead: int = 0) -> Token:
+        return self.tokens[min(self.i + ahead, len(self.tokens) - 1)]
+
+    def next(self) -> Token:
+        tok = self.tokens[self.i]
+        self.i += 1
+        return tok
+
+    def at(self, kind: str, value: Optional[str] = None, ahead: int = 0) -> bool:
+        tok = self.peek(ahead)
+        return tok.kind == kind and (value is None or tok.value == value)
+
+    def expect(self, kind: str, value: Optional[str] = None) -> Token:
+        tok = self.peek()
+        if not self.at(kind, value):
+            wanted = value or kind
+            got = tok.value or tok.kind
+            raise PineSyntaxError(f"expected {wanted!r}, got {got!r}", tok.line, tok.col)
+        return self.next()
+
+    # -- statements -----------------------------------------------------
+    def script(self, version: Optional[int]) -> Script:
+        body = []
+        while not self.at("EOF"):
+            body.append(self.statement())
+        return Script(version, body)
+
+    def block(self) -> List[Node]:
+        self.expect("NEWLINE")
+        self.expect("INDENT")
+        body = []
+        while not self.at("DEDENT") and not self.at("EOF"):
+            body.append(self.statement())
+        self.expect("DEDENT")
+        return body
+
+    def end_statement(self) -> None:
+        if self.at("NEWLINE"):
+            self.next()
+        elif not (self.at("DEDENT") or self.at("EOF")):
+            tok = self.peek()
+            raise PineSyntaxError(f"unexpected {tok.value!r}", tok.line, tok.col)
+
+    def statement(self) -> Node:
+        tok = self.peek()
+        pos = (tok.line, tok.col)
+        if tok.kind == "NAME" and tok.value in _UNSUPPORTED_KEYWORDS:
+            raise UnsupportedConstructError(_UNSUPPORTED_KEYWORDS[tok.value], *pos)
+        if tok.kind == "NAME" and tok.value == "if":
+            return self.if_statement()
+        if tok.kind == "OP" and tok.value == "[":
+            return self.tuple_assign()
+
+        type_hint = None
+        if tok.kind == "NAME" and tok.value in _TYPE_KEYWORDS and self.at("NAME", ahead=1):
+            type_hint = self.next().value
+            if self.peek().value in _TYPE_KEYWORDS and self.at("NAME", ahead=1):
+                type_hint += " " + self.next().value
+        if self.at("NAME") and self.peek(1).kind == "OP" and self.peek(1).value in _ASSIGN_OPS:
+            target = self.next().value
+            op = self.next().value
+            value = self.expression()
+            self.end_statement()
+            return Assign([target], op, value, type_hint, pos=pos)
+        if type_hint:
+            raise PineSyntaxError("expected assignment after type keyword", *pos)
+
+        expr = self.expression()
+        if self.at("OP", "=>"):
+            raise UnsupportedConstructError("user-defined functions", *pos)
+        self.end_statement()
+        return ExprStmt(expr, pos=pos)
+
+    def tuple_assign(self) -> Assign:
+        start = self.expect("OP", "[")
+        targets = [self.expect("NAME").value]
+        while self.at("OP", ","):
+            self.next()
+            targets.append(self.expect("NAME").value)
+        self.expect("OP", "]")
+        op = self.expect("OP").value
+        if op not in ("=", ":="):
+            raise PineSyntaxError("expected '=' after tuple", start.line, start.col)
+        value = self.expression()
+        self.end_statement()
+        return Assign(targets, op, value, pos=(start.line, start.col))
+
+    def if_statement(self) -> If:
+        start = self.expect("NAME", "if")
+        cond = self.expression()
+        body = self.block()
+        orelse: List[Node] = []
+        if self.at("NAME", "else"):
+            self.next()
+            orelse = [self.if_statement()] if self.at("NAME", "if") else self.block()
+        return If(cond, body, orelse, pos=(start.line, start.col))
+
+    # -- expressions ----------------------------------------------------
+    def expression(self) -> Node:
+        cond = self.binary(0)
+        if self.at("OP", "?"):
+            tok = self.next()
+            then = self.expression()
+            self.expect("OP", ":")
+            orelse = self.expression()
+            return Ternary(cond, then, orelse, pos=(tok.line, tok.col))
+        return cond
+
+    def binary(self, level: int) -> Node:
+        if level == len(_BINARY_LEVELS):
+            return self.unary()
+        left = self.binary(level + 1)
+        ops = _BINARY_LEVELS[level]
+        while self.peek().value in ops and self.peek().kind in ("OP", "NAME"):
+            tok = self.next()
+            right = self.binary(level + 1)
+            left = Binary(tok.value, left, right, pos=(tok.line, tok.col))
+        return left
+
+    def unary(self) -> Node:
+        tok = self.peek()
+        if (tok.kind == "OP" and tok.value in ("-", "+")) or (tok.kind == "NAME" and tok.value == "not"):
+            self.next()
+            return Unary(tok.value, self.unary(), pos=(tok.line, tok.col))
+        return self.postfix()
+
+    def postfix(self) -> Node:
+        node = self.primary()
+        while self.at("OP", "["):
+            tok = self.next()
+            offset = self.expression()
+            self.expect("OP", "]")
+            node = Index(node, offset, pos=(tok.line, tok.col))
+        return node
+
+    def primary(self) -> Node:
+        tok = self.next()
+        pos = (tok.line, tok.col)
+        if tok.kind == "NUMBER":
+            return Num(float(tok.value), pos=pos, raw=tok.value)
+        if tok.kind == "STRING":
+            return Str(tok.value[1:-1], pos=pos)
+        if tok.kind == "COLOR":
+            return Str(tok.value, pos=pos)
+        if tok.kind == "OP" and tok.value == "(":
+            node = self.expression()
+            self.expect("OP", ")")
+            return node
+        if tok.kind == "NAME":
+            if tok.value in ("true", "false"):
+                return Bool(tok.value == "true", pos=pos)
+            name = tok.value
+            while self.at("OP", ".") and self.at("NAME", ahead=1):
+                self.next()
+                name += "." + self.next().value
+            if self.at("OP", "("):
+                return self.call(name, pos)
+            return Name(name, pos=pos)
+        if tok.kind == "OP" and tok.value == "[":
+            raise UnsupportedConstructError("array literals", *pos)
+        raise PineSyntaxError(f"unexpected {tok.value or tok.kind!r}", *pos)
+
+    def call(self, func: str, pos: Tuple[int, int]) -> Call:
+        self.expect("OP", "(")
+        args: List[Node] = []
+        kwargs: List[Tuple[str, Node]] = []
+        while not self.at("OP", ")"):
+            if self.at("NAME") and self.at("OP", "=", ahead=1):
+                key = self.next().value
+                self.next()
+                kwargs.append((key, self.expression()))
+            else:
+                if kwargs:
+                    tok = self.peek()
+                    raise PineSyntaxError("positional argument after keyword argument", tok.line, tok.col)
+                args.append(self.expression())
+            if not self.at("OP", ","):
+                break
+            self.next()
+        self.expect("OP", ")")
+        return Call(func, args, kwargs, pos=pos)
+
+
+def parse(source: str) -> Script:
+    """Parse Pine Script *source* into a :class:`Script` AST."""
+    m = _VERSION_RE.search(source)
+    version = int(m.group(1)) if m else None
+    return _Parser(tokenize(source)).script(version)
+
+
+# ---------------------------------------------------------------------------
+# Unparser
+# ---------------------------------------------------------------------------
+
+_PRECEDENCE = {op: level for level, ops in enumerate(_BINARY_LEVELS) for op in ops}
+_COLOR_RE = re.compile(r"^#[0-9a-fA-F]{6}(?:[0-9a-fA-F]{2})?$")
+
+
+def _number(node: Num) -> str:
+    if node.raw is not None and float(node.raw) == node.value:
+        return node.raw
+    if float(node.value).is_integer():
+        return str(int(node.value))
+    return repr(float(node.value))
+
+
+def _unparse_expr(node: Node, parent: int = -1) -> str:
+    """Render an expression; *parent* is the precedence level it appears under."""
+    if isinstance(node, Num):
+        return _number(node)
+    if isinstance(node, Str):
+        if _COLOR_RE.match(node.value):
+            return node.value
+        return '"' + node.value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    if isinstance(node, Bool):
+        return "true" if node.value else "false"
+    if isinstance(node, Name):
+        return node.id
+    if isinstance(node, Call):
+        parts = [_unparse_expr(a) for a in node.args] + [f"{k}={_unparse_expr(v)}" for k, v in node.kwargs]
+        return f"{node.func}({', '.join(parts)})"
+    if isinstance(node, Index):
+        return f"{_unparse_expr(node.value, len(_BINARY_LEVELS))}[{_unparse_expr(node.offset)}]"
+    if isinstance(node, Unary):
+        operand = _unparse_expr(node.operand, len(_BINARY_LEVELS))
+        return f"not {operand}" if node.op == "not" else f"{node.op}{operand}"
+    if isinstance(node, Binary):
+        level = _PRECEDENCE[node.op]
+        text = f"{_unparse_expr(node.left, level)} {node.op} {_unparse_expr(node.right, level + 1)}"
+        return f"({text})" if level < parent else text
+    if isinstance(node, Ternary):
+        text = f"{_unparse_expr(node.cond, 0)} ? {_unparse_expr(node.then)} : {_unparse_expr(node.orelse)}"
+        return f"({text})" if parent >= 0 else text
+    raise TypeError(f"cannot unparse {type(node).__name__}")
+
+
+def _unparse_stmt(node: Node, depth: int, lines: List[str], prefix: str = "if") -> None:
+    pad = " " * (_INDENT * depth)
+    if isinstance(node, Assign):
+        target = node.targets[0] if len(node.targets) == 1 else f"[{', '.join(node.targets)}]"
+        hint = f"{node.type_hint} " if node.type_hint else ""
+        lines.append(f"{pad}{hint}{target} {node.op} {_unparse_expr(node.value)}")
+    elif isinstance(node, ExprStmt):
+        lines.append(f"{pad}{_unparse_expr(node.expr)}")
+    elif isinstance(node, If):
+        lines.append(f"{pad}{prefix} {_unparse_expr(node.cond)}")
+        for child in node.body:
+            _unparse_stmt(child, depth + 1, lines)
+        if len(node.orelse) == 1 and isinstance(node.orelse[0], If):
+            _unparse_stmt(node.orelse[0], depth, lines, "else if")
+        elif node.orelse:
+            lines.append(f"{pad}else")
+            for child in node.orelse:
+                _unparse_stmt(child, depth + 1, lines)
+    else:
+        raise TypeError(f"cannot unparse {type(node).__name__}")
+
+
+def unparse(node: Node) -> str:
+    """Render a :class:`Script` (or a single statement/expression) as Pine source.
+
+    Comments and original layout are not preserved; ``parse(unparse(tree))``
+    equals ``tree`` up to node positions.
+    """
+    if isinstance(node, Script):
+        lines = [f"//@version={node.version}"] if node.version is not None else []
+        for child in node.body:
+            _unparse_stmt(child, 0, lines)
+        return "\n".join(lines) + "\n"
+    if isinstance(node, (Assign, ExprStmt, If)):
+        lines: List[str] = []
+        _unparse_stmt(node, 0, lines)
+        return "\n".join(lines)
+    return _unparse_expr(node)
+
+
+# ---------------------------------------------------------------------------
+# Series kernels (operate on the last axis)
+# ---------------------------------------------------------------------------
+
+def _shift(x: np.ndarray, n: int) -> np.ndarray:
+    x = np.asarray(x)
+    if n <= 0:
+        return x
+    fill = False if x.dtype == bool else np.nan
+    out = np.full(x.shape, fill, dtype=x.dtype if x.dtype == bool else np.float64)
+    if n < x.shape[-1]:
+        out[..., n:] = x[..., :-n]
+    return out
+
+
+def _rolling_sums(x: np.ndarray, length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Window sums of ``x``/``x**2`` and whether each window is fully valid."""
+    valid = ~np.isnan(x)
+    ref = np.nanmean(x, axis=-1, keepdims=True) if valid.any() else 0.0
+    centred = np.where(valid, x - ref, 0.0)
+    shape = x.shape[:-1] + (x.shape[-1] + 1,)
+    c1, c2, cv = np.zeros(shape), np.zeros(shape), np.zeros(shape, dtype=np.intp)
+    np.cumsum(centred, axis=-1, out=c1[..., 1:])
+    np.cumsum(centred * centred, axis=-1, out=c2[..., 1:])
+    np.cumsum(valid, axis=-1, out=cv[..., 1:])
+    s1 = c1[..., length:] - c1[..., :-length]
+    s2 = c2[..., length:] - c2[..., :-length]
+    full = (cv[..., length:] - cv[..., :-length]) == length
+    return s1 + ref * length, s2, full
+
+
+def _sma(src: np.ndarray, length: int) -> np.ndarray:
+    out = np.full(src.shape, np.nan)
+    if length <= src.shape[-1]:
+        s1, _, full = _rolling_sums(src, length)
+        out[..., length - 1:] = np.where(full, s1 / length, np.nan)
+    return out
+
+
+def _stdev(src: np.ndarray, length: int) -> np.ndarray:
+    out = np.full(src.shape, np.nan)
+    if length <= src.shape[-1]:
+        valid = ~np.isnan(src)
+        ref = np.nanmean(src, axis=-1, keepdims=True) if valid.any() else 0.0
+        s1, s2, full = _rolling_sums(src - ref, length)
+        var = np.maximum(s2 / length - (s1 / length) ** 2, 0.0)
+        out[..., length - 1:] = np.where(full, np.sqrt(var), np.nan)
+    return out
+
+
+def _window(src: np.ndarray, length: int, reduce: Callable[..., np.ndarray]) -> np.ndarray:
+    out = np.full(src.shape, np.nan)
+    if length <= src.shape[-1]:
+        out[..., length - 1:] = reduce(sliding_window_view(src, length, axis=-1), axis=-1)
+    return out
+
+
+def _wma(src: np.ndarray, length: int) -> np.ndarray:
+    weights = np.arange(1, length + 1, dtype=np.float64)
+    weights /= weights.sum()
+    return _window(src, length, lambda w, axis: w @ weights)
+
+
+def _ewm_1d(x: np.ndarray, alpha: float, length: int) -> np.ndarray:
+    """Pine's recursive average, seeded with the first full-window SMA."""
+    seed = _sma(x, length)
+    out = np.full(x.shape, np.nan)
+    starts = np.flatnonzero(~np.isnan(seed))
+    if not len(starts):
+        return out
+    s = starts[0]
+    out[s] = seed[s]
+    decay = 1.0 - alpha
+    rest = x[s + 1:]
+    if decay == 0.0:
+        out[s + 1:] = rest
+        return out
+    # Closed form y_i = d^i*y0 + a*d^i*cumsum(x_j*d^-j), evaluated in blocks
+    # small enough that d^-j stays well inside float64 range.
+    block = max(1, int(300.0 / -math.log(decay)))
+    y0 = seed[s]
+    for lo in range(0, len(rest), block):
+        chunk = rest[lo:lo + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        ys = powers * (y0 + alpha * np.cumsum(chunk / powers))
+        out[s + 1 + lo:s + 1 + lo + len(chunk)] = ys
+        y0 = ys[-1]
+    return out
+
+
+def _ewm(src: np.ndarray, alpha: float, length: int) -> np.ndarray:
+    if src.ndim == 1:
+        return _ewm_1d(src, alpha, length)
+    flat = src.reshape(-1, src.shape[-1])
+    return np.stack([_ewm_1d(row, alpha, length) for row in flat]).reshape(src.shape)
+
+
+def _ema(src: np.ndarray, length: int) -> np.ndarray:
+    return _ewm(src, 2.0 / (length + 1), length)
+
+
+def _rma(src: np.ndarray, length: int) -> np.ndarray:
+    return _ewm(src, 1.0 / length, length)
+
+
+def _change(src: np.ndarray, length: int = 1) -> np.ndarray:
+    return src - _shift(src, length)
+
+
+def _rsi(src: np.ndarray, length: int) -> np.ndarray:
+    ch = _change(src, 1)
+    up = _rma(np.maximum(ch, 0.0), length)
+    down = _rma(np.maximum(-ch, 0.0), length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + up / down)
+    rsi = np.where(down == 0, 100.0, np.where(up == 0, 0.0, rsi))
+    return np.where(np.isnan(up) | np.isnan(down), np.nan, rsi)
+
+
+def _bb(src: np.ndarray, length: int, mult: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    basis = _sma(src, length)
+    dev = mult * _stdev(src, length)
+    return basis, basis + dev, basis - dev
+
+
+def _macd(src: np.ndarray, fast: int, slow: int, signal: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    line = _ema(src, fast) - _ema(src, slow)
+    sig = _ema(line, signal)
+    return line, sig, line - sig
+
+
+def _tr(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev = _shift(close, 1)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+
+
+def _atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, length: int) -> np.ndarray:
+    return _rma(_tr(high, low, close), length)
+
+
+def _highest(src: np.ndarray, length: int) -> np.ndarray:
+    return _window(src, length, np.max)
+
+
+def _lowest(src: np.ndarray, length: int) -> np.ndarray:
+    return _window(src, length, np.min)
+
+
+def _roc(src: np.ndarray, length: int) -> np.ndarray:
+    prev = _shift(src, length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (src - prev) / prev
+
+
+def _stoch(src: np.ndarray, high: np.ndarray, low: np.ndarray, length: int) -> np.ndarray:
+    lo = _lowest(low, length)
+    hi = _highest(high, length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100.0 * (src - lo) / (hi - lo)
+
+
+def _crossover(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a > b) & (_shift(a, 1) <= _shift(b, 1))
+
+
+def _crossunder(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a < b) & (_shift(a, 1) >= _shift(b, 1))
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return _crossover(a, b) | _crossunder(a, b)
+
+
+@dataclass(frozen=True)
+class _FuncSpec:
+    impl: Callable[..., Any]
+    params: Tuple[str, ...]  # "s" = series argument, "i" = simple int, "f" = simple float
+    defaults: Tuple[Any, ...] = ()
+    implicit: Tuple[str, ...] = ()  # builtin series prepended to the arguments
+    outputs: int = 1
+    uses: Tuple[Tuple[int, ...], ...] = ()  # arguments each output depends on (default: all)
+
+
+_TA_FUNCS: Dict[str, _FuncSpec] = {
+    "ta.sma": _FuncSpec(_sma, ("s", "i")),
+    "ta.ema": _FuncSpec(_ema, ("s", "i")),
+    "ta.rma": _FuncSpec(_rma, ("s", "i")),
+    "ta.wma": _FuncSpec(_wma, ("s", "i")),
+    "ta.rsi": _FuncSpec(_rsi, ("s", "i")),
+    "ta.stdev": _FuncSpec(_stdev, ("s", "i")),
+    "ta.highest": _FuncSpec(_highest, ("s", "i")),
+    "ta.lowest": _FuncSpec(_lowest, ("s", "i")),
+    "ta.change": _FuncSpec(_change, ("s", "i"), defaults=(1,)),
+    "ta.mom": _FuncSpec(_change, ("s", "i")),
+    "ta.roc": _FuncSpec(_roc, ("s", "i")),
+    "ta.bb": _FuncSpec(_bb, ("s", "i", "f"), outputs=3, uses=((0, 1), (0, 1, 2), (0, 1, 2))),
+    "ta.macd": _FuncSpec(_macd, ("s", "i", "i", "i"), outputs=3, uses=((0, 1, 2), (0, 1, 2, 3), (0, 1, 2, 3))),
+    "ta.atr": _FuncSpec(_atr, ("i",), implicit=("high", "low", "close")),
+    "ta.tr": _FuncSpec(lambda h, l, c, _handle_na=True: _tr(h, l, c), ("f",), defaults=(True,),
+                       implicit=("high", "low", "close")),
+    "ta.stoch": _FuncSpec(_stoch, ("s", "s", "s", "i")),
+    "ta.crossover": _FuncSpec(_crossover, ("s", "s")),
+    "ta.crossunder": _FuncSpec(_crossunder, ("s", "s")),
+    "ta.cross": _FuncSpec(_cross, ("s", "s")),
+    "nz": _FuncSpec(lambda x, r=0.0: np.where(np.isnan(x), r, x), ("s", "f"), defaults=(0.0,)),
+    "na": _FuncSpec(np.isnan, ("s",)),
+    "math.abs": _FuncSpec(np.abs, ("s",)),
+    "math.sqrt": _FuncSpec(np.sqrt, ("s",)),
+    "math.log": _FuncSpec(np.log, ("s",)),
+    "math.exp": _FuncSpec(np.exp, ("s",)),
+    "math.sign": _FuncSpec(np.sign, ("s",)),
+    "math.round": _FuncSpec(np.round, ("s",)),
+    "math.floor": _FuncSpec(np.floor, ("s",)),
+    "math.ceil": _FuncSpec(np.ceil, ("s",)),
+    "math.pow": _FuncSpec(np.power, ("s", "s")),
+    "math.max": _FuncSpec(np.fmax, ("s", "s")),
+    "math.min": _FuncSpec(np.fmin, ("s", "s")),
+}
+
+_BUILTIN_SERIES = {
+    "open", "high", "low", "close", "volume", "hl2", "hlc3", "ohlc4", "bar_index", "ta.tr",
+}
+_CONSTANTS: Dict[str, Any] = {
+    "na": math.nan,
+    "strategy.long": "long",
+    "strategy.short": "short",
+}
+_IGNORED_CALLS = {
+    "plot", "plotshape", "plotchar", "plotarrow", "plotcandle", "plotbar", "hline", "fill",
+    "bgcolor", "barcolor", "alert", "alertcondition", "label.new", "line.new", "box.new",
+    "table.new", "log.info", "log.warning", "log.error",
+}
+_INPUT_KINDS = {
+    "input": None,
+    "input.int": "int",
+    "input.float": "float",
+    "input.bool": "bool",
+    "input.string": "string",
+    "input.source": "source",
+}
+_BINARY_UFUNCS: Dict[str, Callable[[Any, Any], Any]] = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.true_divide,
+    "%": np.fmod,
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    ">": np.greater,
+    "<=": np.less_equal,
+    ">=": np.greater_equal,
+    "and": np.logical_and,
+    "or": np.logical_or,
+}
+
+
+def _series_value(name: str, bars: Any) -> np.ndarray:
+    if name in ("open", "high", "low", "close", "volume"):
+        return np.asarray(getattr(bars, name), dtype=np.float64)
+    if name == "hl2":
+        return (bars.high + bars.low) / 2.0
+    if name == "hlc3":
+        return (bars.high + bars.low + bars.close) / 3.0
+    if name == "ohlc4":
+        return (bars.open + bars.high + bars.low + bars.close) / 4.0
+    if name == "bar_index":
+        return np.arange(len(bars.close), dtype=np.float64)
+    if name == "ta.tr":
+        return _tr(bars.high, bars.low, bars.close)
+    raise KeyError(name)
+
+
+def _canonical(value: Any) -> str:
+    """Literal as it appears in a resolved key; ``20`` and ``20.0`` compare equal."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(float(value))
+    return repr(value)
+
+
+def _as_bool(value: Any) -> Any:
+    arr = np.asarray(value)
+    if arr.dtype == bool:
+        return arr
+    if arr.dtype.kind == "f":
+        return np.nan_to_num(arr) != 0
+    return arr.astype(bool)
+
+
+# ---------------------------------------------------------------------------
+# Compiled plan
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class InputSpec:
+    """A tunable ``input.*`` declaration."""
+
+    name: str
+    kind: str  # "int", "float", "bool", "string" or "source"
+    default: Any
+    title: Optional[str] = None
+    minval: Optional[float] = None
+    maxval: Optional[float] = None
+    step: Optional[float] = None
+    options: Tuple[Any, ...] = ()
+
+
+@dataclass(frozen=True)
+class Step:
+    """One whole-series operation of a compiled plan.
+
+    ``op`` is one of ``const``, ``series``, ``input``, ``unary``, ``binary``,
+    ``where``, ``shift``, ``item`` or a function name such as ``ta.sma``;
+    ``args`` are indices of earlier steps and ``params`` literal operands.
+    """
+
+    op: str
+    args: Tuple[int, ...] = ()
+    params: Tuple[Any, ...] = ()
+    key: str = ""
+
+
+@dataclass(frozen=True)
+class Order:
+    """A ``strategy.*`` order guarded by the step ``cond`` (``None`` = always)."""
+
+    action: str  # "entry", "close" or "close_all"
+    cond: Optional[int]
+    id: Optional[str] = None
+    direction: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CompiledStrategy:
+    """Vectorised evaluation plan produced by :func:`compile_pine`."""
+
+    title: str
+    inputs: Mapping[str, InputSpec]
+    steps: Tuple[Step, ...]
+    orders: Tuple[Order, ...]
+    options: Mapping[str, Any] = field(default_factory=dict)
+
+    def _run_step(self, step: Step, values: List[Any], bars: Any, inputs: Mapping[str, Any]) -> Any:
+        op = step.op
+        args = [values[a] for a in step.args]
+        if op == "const":
+            return step.params[0]
+        if op == "series":
+            return _series_value(step.params[0], bars)
+        if op == "input":
+            spec = self.inputs[step.params[0]]
+            value = inputs.get(spec.name, spec.default)
+            return _series_value(value, bars) if spec.kind == "source" else value
+        if op == "unary":
+            if step.params[0] == "not":
+                return np.logical_not(_as_bool(args[0]))
+            return np.negative(args[0]) if step.params[0] == "-" else args[0]
+        if op == "binary":
+            symbol = step.params[0]
+            if symbol in ("and", "or"):
+                args = [_as_bool(a) for a in args]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return _BINARY_UFUNCS[symbol](args[0], args[1])
+        if op == "where":
+            return np.where(_as_bool(args[0]), args[1], args[2])
+        if op == "shift":
+            value = args[0] if np.ndim(args[0]) else np.full(len(bars.close), args[0])
+            return _shift(value, step.params[0])
+        if op == "item":
+            return args[0][step.params[0]]
+
+        spec = _TA_FUNCS[op]
+        n = len(bars.close)
+        call_args = [_series_value(name, bars) for name in spec.implicit]
+        for kind, value in zip(spec.params, args):
+            if kind == "s":
+                value = np.asarray(value, dtype=np.float64) if np.ndim(value) else np.full(n, float(value))
+            elif kind == "i":
+                value = int(round(float(value)))
+                if value < 1:
+                    raise ValueError(f"{op}: length must be >= 1, got {value}")
+            call_args.append(value)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return spec.impl(*call_args)
+
+    def _resolved_key(self, step: Step, keys: List[str], inputs: Mapping[str, Any]) -> str:
+        """Canonical expression of *step* with ``input.*`` values substituted."""
+        if step.op == "input":
+            spec = self.inputs[step.params[0]]
+            value = inputs.get(spec.name, spec.default)
+            return value if spec.kind == "source" else _canonical(value)
+        if step.op == "series":
+            return step.params[0]
+        if step.op == "const":
+            return _canonical(step.params[0])
+        return f"{step.op}{step.params!r}({','.join(keys[a] for a in step.args)})"
+
+    def evaluate(self, bars: Any, inputs: Optional[Mapping[str, Any]] = None, cache=None):
+        """Evaluate the plan over *bars* and return :class:`~core.local_backtest.Signals`.
+
+        *inputs* overrides declared ``input.*`` defaults by variable name.
+        With an :class:`~core.indicator_cache.IndicatorCache` as *cache*,
+        ``ta.*`` series are shared with every other plan evaluated over the
+        same bars.
+        """
+        inputs = dict(inputs or {})
+        unknown = set(inputs) - set(self.inputs)
+        if unknown:
+            raise KeyError(f"Unknown inputs: {sorted(unknown)}")
+
+        values: List[Any] = [None] * len(self.steps)
+        if cache is None:
+            for i, step in enumerate(self.steps):
+                values[i] = self._run_step(step, values, bars, inputs)
+        else:
+            from core.indicator_cache import slice_token
+
+            token = slice_token(bars)
+            keys: List[str] = [""] * len(self.steps)
+            for i, step in enumerate(self.steps):
+                keys[i] = self._resolved_key(step, keys, inputs)
+                if step.op.startswith("ta."):
+                    values[i] = cache.get_or_compute(
+                        token, keys[i], functools.partial(self._run_step, step, values, bars, inputs))
+                else:
+                    values[i] = self._run_step(step, values, bars, inputs)
+
+        return self._signals(values, (len(bars.close),))
+
+    def input_dependencies(self) -> List[FrozenSet[str]]:
+        """Names of the ``input.*`` declarations each step depends on, per step."""
+        deps: List[FrozenSet[str]] = []
+        for step in self.steps:
+            args = step.args
+            if step.op == "item":
+                call = self.steps[step.args[0]]
+                uses = _TA_FUNCS[call.op].uses if call.op in _TA_FUNCS else ()
+                if uses:  # e.g. the ``ta.bb`` basis does not depend on the multiplier
+                    args = tuple(call.args[p] for p in uses[step.params[0]] if p < len(call.args))
+            if step.op == "input":
+                deps.append(frozenset((step.params[0],)))
+            else:
+                deps.append(frozenset().union(*(deps[a] for a in args)))
+        return deps
+
+    def signal_inputs(self) -> FrozenSet[str]:
+        """Names of the inputs the ``strategy.*`` orders depend on."""
+        deps = self.input_dependencies()
+        return frozenset().union(*(deps[o.cond] for o in self.orders if o.cond is not None))
+
+    def evaluate_batch(self, bars: Any, inputs: Sequence[Mapping[str, Any]], cache=None):
+        """Evaluate the plan for every input set of *inputs* in one pass.
+
+        Returns :class:`~core.local_backtest.Signals` of shape ``(k, n_bars)``
+        for ``k = len(inputs)``.  Each step runs once over the lattice of
+        distinct value tuples of the varying inputs it depends on, not once
+        per row: steps without varying inputs run once for all rows, a
+        ``ta.bb(close, length, mult)`` once per distinct ``(length, mult)``
+        (grouped by ``length``, see :meth:`_run_batched`), and only the order
+        conditions are finally spread to the ``k`` rows.
+        """
+        rows = [dict(row) for row in inputs]
+        k, n = len(rows), len(bars.close)
+        if not k:
+            raise ValueError("evaluate_batch needs at least one input set")
+        unknown = set().union(*rows) - set(self.inputs)
+        if unknown:
+            raise KeyError(f"Unknown inputs: {sorted(unknown)}")
+
+        token = None
+        if cache is not None:
+            from core.indicator_cache import slice_token
+
+            token = slice_token(bars)
+        # Per varying input: the id of each row's value and the distinct values
+        codes: Dict[str, np.ndarray] = {}
+        distinct: Dict[str, List[Any]] = {}
+        for name, spec in self.inputs.items():
+            ids: Dict[Any, int] = {}
+            column = np.fromiter((ids.setdefault(row.get(name, spec.default), len(ids)) for row in rows),
+                                 np.intp, k)
+            if len(ids) > 1:
+                codes[name], distinct[name] = column, list(ids)
+        lattices: Dict[Tuple[str, ...], Tuple[np.ndarray, np.ndarray]] = {}
+
+        def lattice(names: Tuple[str, ...]) -> Tuple[np.ndarray, np.ndarray]:
+            # (lattice point of each row, first row of each point) of the
+            # distinct value tuples of *names*
+            if names not in lattices:
+                _, first, index = np.unique(np.stack([codes[name] for name in names], axis=1), axis=0,
+                                            return_index=True, return_inverse=True)
+                lattices[names] = index.reshape(-1), first
+            return lattices[names]
+
+        def take(value: Any, index: np.ndarray) -> Any:
+            if len(index) == len(value[0] if isinstance(value, tuple) else value) and \
+                    (index == np.arange(len(index))).all():
+                return value  # points already in row order
+            return tuple(v[index] for v in value) if isinstance(value, tuple) else value[index]
+
+        # Varying inputs of each step; its value has one row per lattice point
+        deps = [tuple(sorted(d & codes.keys())) for d in self.input_dependencies()]
+        values: List[Any] = [None] * len(self.steps)
+        # Resolved (cache) key of each step, ``None`` when its value varies.
+        keys: List[Optional[str]] = [None] * len(self.steps)
+        if cache is not None:
+            for i, step in enumerate(self.steps):
+                keys[i] = self._resolved_key(step, keys, rows[0])
+            keys = [None if d else key for d, key in zip(deps, keys)]
+        for i, step in enumerate(self.steps):
+            names = deps[i]
+            if step.op == "item" and deps[step.args[0]] != names:
+                # An output depending on fewer inputs than its call
+                parent = step.args[0]
+                part = values[parent][step.params[0]]
+                values[i] = part[lattice(deps[parent])[0][lattice(names)[1]]] if names else part[0]
+            elif not names:
+                if cache is not None and step.op.startswith("ta."):
+                    values[i] = cache.get_or_compute(
+                        token, keys[i], functools.partial(self._run_step, step, values, bars, rows[0]))
+                else:
+                    values[i] = self._run_step(step, values, bars, rows[0])
+            elif step.op == "input":
+                if self.inputs[names[0]].kind == "source":
+                    values[i] = np.stack([_series_value(v, bars) for v in distinct[names[0]]])
+                else:
+                    values[i] = np.asarray(distinct[names[0]])[:, None]
+            else:
+                first = lattice(names)[1]
+                args = list(values)
+                for a in step.args:
+                    if deps[a] and deps[a] != names:
+                        args[a] = take(values[a], lattice(deps[a])[0][first])
+                if step.op in _TA_FUNCS:
+                    values[i] = self._run_batched(step, args, keys, [bool(d) for d in deps], bars, len(first),
+                                                  cache, token)
+                else:
+                    if step.op == "shift":  # shift along the bar axis, not a (points, 1) column
+                        args[step.args[0]] = np.broadcast_to(args[step.args[0]], (len(first), n))
+                    values[i] = self._run_step(step, args, bars, {})
+
+        for cond in {order.cond for order in self.orders if order.cond is not None}:
+            if deps[cond]:
+                values[cond] = take(values[cond], lattice(deps[cond])[0])
+        return self._signals(values, (k, n))
+
+    def _run_batched(self, step: Step, values: List[Any], keys: List[Optional[str]], varying: Sequence[bool],
+                     bars: Any, k: int, cache, token) -> Any:
+        """Run a ``ta.*`` step whose operands vary over the *k* lattice points.
+
+        Points are grouped by their integer (window length) parameters; float
+        parameters such as the ``ta.bb`` multiplier broadcast as ``(points, 1)``
+        columns within a group.  ``varying[a]`` tells whether step *a* has one
+        value per point.
+        """
+        spec = _TA_FUNCS[step.op]
+        n = len(bars.close)
+        vary = any(varying[a] and kind != "i" for kind, a in zip(spec.params, step.args))
+        groups: Dict[Tuple[Any, ...], List[int]] = {}
+        for r in range(k):
+            params = tuple(
+                values[a][r, 0].item() if varying[a] else None
+                for kind, a in zip(spec.params, step.args) if kind == "i"
+            )
+            groups.setdefault(params, []).append(r)
+
+        out: Optional[List[np.ndarray]] = None
+        for params, members in groups.items():
+            if members[-1] - members[0] + 1 == len(members):
+                members = slice(members[0], members[-1] + 1)  # a view instead of a copy
+            sub = list(values)
+            sub_keys = list(keys)
+            it = iter(params)
+            for kind, a in zip(spec.params, step.args):
+                if kind == "i":
+                    value = next(it)
+                    if value is not None:
+                        sub[a], sub_keys[a] = value, _canonical(value)
+                elif varying[a]:
+                    sub[a] = np.broadcast_to(values[a], (k, n) if kind == "s" else (k, 1))[members]
+            if vary or cache is None:
+                result = self._run_step(step, sub, bars, {})
+            else:
+                key = self._resolved_key(step, sub_keys, {})
+                result = cache.get_or_compute(token, key, functools.partial(self._run_step, step, sub, bars, {}))
+            parts = list(result) if isinstance(result, tuple) else [result]
+            if len(groups) == 1 and all(np.shape(p) == (k, n) for p in parts):
+                return result
+            if out is None:
+                out = [np.empty((k, n), dtype=np.asarray(p).dtype) for p in parts]
+            for target, part in zip(out, parts):
+                target[members] = part
+        return tuple(out) if spec.outputs > 1 else out[0]
+
+    def _signals(self, values: List[Any], shape: Tuple[int, ...]):
+        """Fold the ``strategy.*`` orders into :class:`~core.local_backtest.Signals` of *shape*."""
+        from core.local_backtest import Signals
+
+        long_entry = np.zeros(shape, bool)
+        short_entry = np.zeros(shape, bool)
+        long_exit = np.zeros(shape, bool)
+        short_exit = np.zeros(shape, bool)
+        entry_sides: Dict[str, set] = {}
+        for order in self.orders:
+            if order.action == "entry":
+                entry_sides.setdefault(order.id, set()).add(order.direction)
+        for order in self.orders:
+            cond = np.broadcast_to(_as_bool(True if order.cond is None else values[order.cond]), shape)
+            if order.action == "entry":
+                target = long_entry if order.direction == "long" else short_entry
+                target |= cond
+            else:
+                sides = {"long", "short"} if order.action == "close_all" else entry_sides.get(order.id, set())
+                if "long" in sides:
+                    long_exit |= cond
+                if "short" in sides:
+                    short_exit |= cond
+        return Signals(long_entry, short_entry, long_exit, short_exit)
+
+
+# ---------------------------------------------------------------------------
+# Compiler
+# ---------------------------------------------------------------------------
+
+def _literal(node: Node) -> Any:
+    if isinstance(node, (Num, Str, Bool)):
+        return node.value
+    if isinstance(node, Unary) and node.op == "-" and isinstance(node.operand, Num):
+        return -node.operand.value
+    if isinstance(node, Name) and node.id in _CONSTANTS:
+        return _CONSTANTS[node.id]
+    if isinstance(node, Name) and node.id in _BUILTIN_SERIES:
+        return node.id
+    return None
+
+
+class _Compiler:
+    def __init__(self) -> None:
+        self.steps: List[Step] = []
+        self.by_key: Dict[str, int] = {}
+        self.simple: List[bool] = []
+        self.env: Dict[str, int] = {}
+        self.tuples: Dict[int, int] = {}
+        self.inputs: Dict[str, InputSpec] = {}
+        self.orders: List[Order] = []
+        self.title: Optional[str] = None
+        self.options: Dict[str, Any] = {}
+
+    def emit(self, op: str, args: Tuple[int, ...] = (), params: Tuple[Any, ...] = (),
+             key: str = "", simple: bool = False) -> int:
+        if key in self.by_key:
+            return self.by_key[key]
+        self.steps.append(Step(op, args, params, key))
+        self.simple.append(simple)
+        self.by_key[key] = len(self.steps) - 1
+        return len(self.steps) - 1
+
+    def const(self, value: Any) -> int:
+        return self.emit("const", params=(value,), key=repr(value), simple=True)
+
+    def key(self, slot: int) -> str:
+        return self.steps[slot].key
+
+    # -- statements -----------------------------------------------------
+    def compile(self, script: Script) -> CompiledStrategy:
+        if script.version is not None and script.version != 5:
+            raise UnsupportedConstructError(f"Pine Script version {script.version} (only v5)")
+        for node in script.body:
+            self.statement(node, None)
+        if self.title is None:
+            raise PineSyntaxError("script has no strategy() declaration")
+        return CompiledStrategy(self.title, dict(self.inputs), tuple(self.steps), tuple(self.orders),
+                                dict(self.options))
+
+    def statement(self, node: Node, cond: Optional[int]) -> None:
+        if isinstance(node, Assign):
+            if cond is not None:
+                raise UnsupportedConstructError("assignment inside an if block", *node.pos)
+            self.assign(node)
+        elif isinstance(node, If):
+            test = self.expr(node.cond)
+            here = test if cond is None else self.binary("and", cond, test)
+            for child in node.body:
+                self.statement(child, here)
+            if node.orelse:
+                negated = self.emit("unary", (test,), ("not",), f"not({self.key(test)})")
+                other = negated if cond is None else self.binary("and", cond, negated)
+                for child in node.orelse:
+                    self.statement(child, other)
+        elif isinstance(node, ExprStmt) and isinstance(node.expr, Call):
+            self.call_statement(node.expr, cond)
+        else:
+            raise UnsupportedConstructError("expression statement without a call", *node.pos)
+
+    def assign(self, node: Assign) -> None:
+        if len(node.targets) > 1:
+            value = node.value
+            spec = _TA_FUNCS.get(value.func) if isinstance(value, Call) else None
+            if spec is None or spec.outputs != len(node.targets):
+                raise UnsupportedConstructError("tuple assignment from this expression", *node.pos)
+            slot = self.expr(value)
+            for i, target in enumerate(node.targets):
+                if target != "_":
+                    self.env[target] = self.emit("item", (slot,), (i,), f"{self.key(slot)}[#{i}]")
+            return
+
+        target = node.targets[0]
+        if node.op != "=" and target not in self.env:
+            raise PineSyntaxError(f"undeclared identifier {target!r}", *node.pos)
+        if isinstance(node.value, Call) and node.value.func in _INPUT_KINDS:
+            slot = self.input(node.value, target)
+        else:
+            slot = self.expr(node.value)
+        if node.op not in ("=", ":="):
+            slot = self.binary(node.op[0], self.env[target], slot)
+        self.env[target] = slot
+
+    def call_statement(self, node: Call, cond: Optional[int]) -> None:
+        func = node.func
+        if func in _IGNORED_CALLS:
+            return
+        if func == "strategy":
+            if self.title is not None:
+                raise PineSyntaxError("duplicate strategy() declaration", *node.pos)
+            title = node.args[0] if node.args else dict(node.kwargs).get("title")
+            self.title = str(_literal(title)) if title is not None else ""
+            self.options = {k: _literal(v) for k, v in node.kwargs if k != "title"}
+            return
+        if func in ("indicator", "study", "library"):
+            raise PineSyntaxError(f"script declares {func}(), expected strategy()", *node.pos)
+        if self.title is None and func.startswith("strategy."):
+            raise PineSyntaxError(f"{func} before strategy() declaration", *node.pos)
+
+        kwargs = dict(node.kwargs)
+        when = kwargs.pop("when", None)
+        if when is not None:
+            test = self.expr(when)
+            cond = test if cond is None else self.binary("and", cond, test)
+
+        if func == "strategy.entry":
+            for banned in ("limit", "stop", "oca_name"):
+                if banned in kwargs:
+                    raise UnsupportedConstructError(f"strategy.entry({banned}=...) orders", *node.pos)
+            order_id = _literal(node.args[0]) if node.args else _literal(kwargs.get("id"))
+            direction = _literal(node.args[1]) if len(node.args) > 1 else _literal(kwargs.get("direction"))
+            if direction not in ("long", "short"):
+                raise UnsupportedConstructError("strategy.entry direction must be strategy.long/short", *node.pos)
+            self.orders.append(Order("entry", cond, str(order_id), direction))
+        elif func == "strategy.close":
+            order_id = _literal(node.args[0]) if node.args else _literal(kwargs.get("id"))
+            self.orders.append(Order("close", cond, str(order_id)))
+        elif func == "strategy.close_all":
+            self.orders.append(Order("close_all", cond))
+        else:
+            raise UnsupportedConstructError(f"call to {func}()", *node.pos)
+
+    # -- expressions ----------------------------------------------------
+    def binary(self, op: str, left: int, right: int) -> int:
+        simple = self.simple[left] and self.simple[right]
+        return self.emit("binary", (left, right), (op,), f"({self.key(left)}{op}{self.key(right)})", simple)
+
+    def input(self, node: Call, name: Optional[str]) -> int:
+        kwargs = dict(node.kwargs)
+        args = list(node.args)
+        defval_node = args[0] if args else kwargs.get("defval")
+        default = _literal(defval_node) if defval_node is not None else None
+        if default is None:
+            raise UnsupportedConstructError(f"{node.func}() without a literal default", *node.pos)
+        kind = _INPUT_KINDS[node.func]
+        if kind is None:
+            kind = "bool" if isinstance(default, bool) else "source" if default in _BUILTIN_SERIES \
+                else "string" if isinstance(default, str) else "float"
+        if kind == "int":
+            default = int(default)
+        title_node = args[1] if len(args) > 1 else kwargs.get("title")
+        title = _literal(title_node) if title_node is not None else None
+        name = name or title or f"input{len(self.inputs)}"
+        opts = kwargs.get("options")
+        spec = InputSpec(
+            name=name,
+            kind=kind,
+            default=default,
+            title=title,
+            minval=_literal(kwargs["minval"]) if "minval" in kwargs else None,
+            maxval=_literal(kwargs["maxval"]) if "maxval" in kwargs else None,
+            step=_literal(kwargs["step"]) if "step" in kwargs else None,
+            options=tuple(opts.args) if isinstance(opts, Call) else (),
+        )
+        self.inputs[name] = spec
+        return self.emit("input", params=(name,), key=f"input:{name}", simple=kind != "source")
+
+    def expr(self, node: Node) -> int:
+        if isinstance(node, (Num, Str, Bool)):
+            return self.const(node.value)
+        if isinstance(node, Name):
+            if node.id in self.env:
+                return self.env[node.id]
+            if node.id in _BUILTIN_SERIES:
+                return self.emit("series", params=(node.id,), key=node.id)
+            if node.id in _CONSTANTS:
+                return self.const(_CONSTANTS[node.id])
+            raise PineSyntaxError(f"undeclared identifier {node.id!r}", *node.pos)
+        if isinstance(node, Unary):
+            operand = self.expr(node.operand)
+            if node.op == "+":
+                return operand
+            return self.emit("unary", (operand,), (node.op,), f"{node.op}({self.key(operand)})",
+                             self.simple[operand])
+        if isinstance(node, Binary):
+            if node.op not in _BINARY_UFUNCS:
+                raise UnsupportedConstructError(f"operator {node.op!r}", *node.pos)
+            return self.binary(node.op, self.expr(node.left), self.expr(node.right))
+        if isinstance(node, Ternary):
+            c, a, b = self.expr(node.cond), self.expr(node.then), self.expr(node.orelse)
+            simple = self.simple[c] and self.simple[a] and self.simple[b]
+            key = f"({self.key(c)}?{self.key(a)}:{self.key(b)})"
+            return self.emit("where", (c, a, b), key=key, simple=simple)
+        if isinstance(node, Index):
+            offset = _literal(node.offset)
+            if not isinstance(offset, float) or offset < 0 or offset != int(offset):
+                raise UnsupportedConstructError("history reference with a non-constant offset", *node.pos)
+            value = self.expr(node.value)
+            if int(offset) == 0:
+                return value
+            return self.emit("shift", (value,), (int(offset),), f"{self.key(value)}[{int(offset)}]")
+        if isinstance(node, Call):
+            return self.call(node)
+        raise UnsupportedConstructError(type(node).__name__, *node.pos)
+
+    def call(self, node: Call) -> int:
+        if node.func in _INPUT_KINDS:
+            return self.input(node, None)
+        spec = _TA_FUNCS.get(node.func)
+        if spec is None:
+            if node.func.startswith(("strategy.", "request.", "array.", "matrix.", "map.", "str.")):
+                raise UnsupportedConstructError(f"{node.func}() in an expression", *node.pos)
+            raise UnsupportedConstructError(f"function {node.func}()", *node.pos)
+
+        args = list(node.args)
+        if node.func in ("ta.highest", "ta.lowest") and len(args) == 1 and not node.kwargs:
+            args.insert(0, Name("high" if node.func == "ta.highest" else "low", pos=node.pos))
+        if node.kwargs:
+            raise UnsupportedConstructError(f"keyword arguments to {node.func}()", *node.pos)
+        missing = len(spec.params) - len(args)
+        if missing < 0 or missing > len(spec.defaults):
+            raise PineSyntaxError(f"{node.func}() takes {len(spec.params)} arguments, got {len(args)}", *node.pos)
+        slots = [self.expr(a) for a in args]
+        slots += [self.const(d) for d in spec.defaults[len(spec.defaults) - missing:]]
+        for kind, slot, arg in zip(spec.params, slots, args + [node] * missing):
+            if kind in ("i", "f") and not self.simple[slot]:
+                raise UnsupportedConstructError(f"series value for a simple parameter of {node.func}()", *arg.pos)
+        key = f"{node.func}({','.join(self.key(s) for s in slots)})"
+        simple = all(self.simple[s] for s in slots) and not spec.implicit
+        return self.emit(node.func, tuple(slots), key=key, simple=simple)
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_pine(source: str) -> CompiledStrategy:
+    """Compile Pine Script *source* into a :class:`CompiledStrategy`.
+
+    Results are memoised on the exact source text.
+
+    Raises:
+        PineSyntaxError: If the script is malformed.
+        UnsupportedConstructError: If it uses Pine outside the supported subset.
+    """
+    plan = _Compiler().compile(parse(source))
+    logger.debug("Compiled %r into %d steps and %d orders", plan.title, len(plan.steps), len(plan.orders))
+    return plan
+
+
+def pine_signals(source: str, bars: Any):
+    """Signal function for :class:`~core.local_backtest.LocalBacktestRunner`.
+
+    Indicators are memoised in the process-wide
+    :func:`core.indicator_cache.shared` cache.
+    """
+    from core import indicator_cache
+
+    return compile_pine(source).evaluate(bars, cache=indicator_cache.shared())
@@ -0,0 +1,298 @@
+"""core/pipeline.py
+=================
+Pipelined execution of the generate → back-test → score → persist stages.
+
+A :class:`Pipeline` runs each :class:`Stage` on its own pool of worker
+threads and joins consecutive stages with bounded :class:`queue.Queue`\\ s.
+A stage blocks when its output queue is full, so a fast producer (e.g. the
+LLM stage) can never run more than ``queue_size`` items ahead of a slow
+consumer (e.g. browser back-tests).  Slow stages therefore overlap instead
+of adding up, and throughput is bounded by the slowest stage.
+
+Item-level failures never stop the pipeline: an exception turns the item
+into a :class:`StageError` that skips the remaining stages and is returned
+in place of the result.  Results come back in input order.
+
+Usage example:
+```python
+from core.pipeline import Pipeline, Stage
+
+pipe = Pipeline([
+    Stage("generate", generate_strategy, workers=8),
+    Stage("backtest", runner.run_backtest, workers=4),
+], queue_size=16)
+results = pipe.run(prompts)
+```
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core import instrumentation
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "Stage",
+    "StageError",
+    "Pipeline",
+    "generation_stage",
+    "validate_stage",
+    "backtest_stage",
+    "score_stage",
+    "persist_stage",
+]
+
+_STOP = object()
+
+
+@dataclass
+class Stage:
+    """One pipeline stage.
+
+    Args:
+        name: Used in logs, :class:`StageError` and instrumentation.
+        fn: Called with one item (or, when ``batch_size > 1``, with a list of
+            up to ``batch_size`` items, returning a list of the same length).
+        workers: Number of threads running this stage.
+        batch_size: Items handed to *fn* at once; a partial batch is flushed
+            once no further item arrives within ``batch_wait`` seconds.
+        batch_wait: See ``batch_size``.
+    """
+
+    name: str
+    fn: Callable[[Any], Any]
+    workers: int = 1
+    batch_size: int = 1
+    batch_wait: float = 0.05
+
+
+@dataclass
+class StageError:
+    """Placeholder result of an item whose processing raised."""
+
+    stage: str
+    error: BaseException
+
+    def __str__(self) -> str:
+        return f"{self.stage}: {type(self.error).__name__}: {self.error}"
+
+
+class Pipeline:
+    """Run items through *stages* concurrently with bounded hand-off queues.
+
+    Args:
+        stages: Stages in processing order.
+        queue_size: Capacity of every inter-stage queue (backpressure bound).
+    """
+
+    def __init__(self, stages: Sequence[Stage], queue_size: int = 32) -> None:
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = list(stages)
+        self.queue_size = max(1, queue_size)
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Process *items* and return the results (or :class:`StageError`) in order."""
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        results: Dict[int, Any] = {}
+        errors: List[BaseException] = []
+        threads: List[threading.Thread] = []
+
+        for i, stage in enumerate(self.stages):
+            remaining = [max(1, stage.workers)]  # workers still running, guarded by lock
+            lock = threading.Lock()
+            next_workers = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            for w in range(max(1, stage.workers)):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(stage, queues[i], queues[i + 1], remaining, lock, next_workers, errors),
+                    name=f"pipeline-{stage.name}-{w}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        feeder = threading.Thread(
+            target=self._feed, args=(items, queues[0], self.stages[0].workers, errors),
+            name="pipeline-feed", daemon=True,
+        )
+        feeder.start()
+
+        out = queues[-1]
+        while True:
+            entry = out.get()
+            if entry is _STOP:
+                break
+            index, value = entry
+            results[index] = value
+        feeder.join()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return [results[i] for i in range(len(results))]
+
+    # ------------------------------------------------------------------
+
+    def _feed(self, items: Iterable[Any], out: "queue.Queue", consumers: int,
+              errors: List[BaseException]) -> None:
+        try:
+            for index, item in enumerate(items):
+                self._put(out, (index, item), "source")
+        except BaseException as exc:  # a failing source aborts the run
+            errors.append(exc)
+        finally:
+            for _ in range(max(1, consumers)):
+                out.put(_STOP)
+
+    @staticmethod
+    def _put(out: "queue.Queue", entry: Any, stage: str) -> None:
+        try:
+            out.put_nowait(entry)
+        except queue.Full:
+            start = time.perf_counter()
+            out.put(entry)
+            instrumentation.observe(f"pipeline.{stage}.blocked", time.perf_counter() - start)
+
+    def _take(self, stage: Stage, inbox: "queue.Queue") -> Tuple[List[Tuple[int, Any]], bool]:
+        """Next batch for *stage* and whether the stop marker was reached."""
+        entry = inbox.get()
+        if entry is _STOP:
+            return [], True
+        batch = [entry]
+        while len(batch) < stage.batch_size:
+            try:
+                entry = inbox.get(timeout=stage.batch_wait)
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _worker(self, stage: Stage, inbox: "queue.Queue", outbox: "queue.Queue",
+                remaining: List[int], lock: threading.Lock, next_workers: int,
+                errors: List[BaseException]) -> None:
+        try:
+            stopped = False
+            while not stopped:
+                batch, stopped = self._take(stage, inbox)
+                live = [(i, v) for i, v in batch if not isinstance(v, StageError)]
+                outputs: Dict[int, Any] = {i: v for i, v in batch if isinstance(v, StageError)}
+                if live:
+                    outputs.update(self._apply(stage, live))
+                for index, _ in batch:
+                    self._put(outbox, (index, outputs[index]), stage.name)
+        except BaseException as exc:  # pragma: no cover - defensive
+            errors.append(exc)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                for _ in range(max(1, next_workers)):
+                    outbox.put(_STOP)
+
+    @staticmethod
+    def _apply(stage: Stage, live: List[Tuple[int, Any]]) -> Dict[int, Any]:
+        start = time.perf_counter()
+        try:
+            if stage.batch_size > 1:
+                values = stage.fn([v for _, v in live])
+                if len(values) != len(live):
+                    raise ValueError(f"stage {stage.name!r} returned {len(values)} results for {len(live)} items")
+                return {i: v for (i, _), v in zip(live, values)}
+            index, value = live[0]
+            return {index: stage.fn(value)}
+        except Exception as exc:
+            logger.debug("Stage %s failed: %s", stage.name, exc)
+            instrumentation.incr(f"pipeline.{stage.name}.failures", len(live))
+            return {i: StageError(stage.name, exc) for i, _ in live}
+        finally:
+            instrumentation.observe(f"pipeline.{stage.name}", time.perf_counter() - start)
+
+
+# ---------------------------------------------------------------------------
+# Stages of the strategy pipeline.  Items are genome dicts
+# (``{"code", "score", "meta"}``) from the back-test stage onwards.
+# ---------------------------------------------------------------------------
+
+def generation_stage(generate: Callable[[str], str], workers: int = 8) -> Stage:
+    """Prompt → genome via *generate* (e.g. :func:`core.strategy_generator.generate_strategy`)."""
+    def run(prompt: str) -> Dict[str, Any]:
+        return {"code": generate(prompt), "score": 0.0, "meta": {}}
+    return Stage("generate", run, workers=workers)
+
+
+def validate_stage(validator, workers: int = 1) -> Stage:
+    """Check (and repair) ``genome["code"]`` with a :class:`~core.pine_validator.PineValidator`.
+
+    Rejected genomes get ``genome["error"]``, so the back-test stage skips
+    them and they score 0.
+    """
+    def run(genome: Dict[str, Any]) -> Dict[str, Any]:
+        report = validator.check(genome["code"])
+        if not report.ok:
+            return {**genome, "error": f"invalid Pine: {report.summary()}"}
+        return {**genome, "code": report.code}
+    return Stage("validate", run, workers=workers)
+
+
+def backtest_stage(runner, workers: int = 4) -> Stage:
+    """Attach ``runner.run_backtest(code)`` as ``genome["result"]``.
+
+    A failing back-test is kept (as ``genome["error"]``) so that, as with
+    :class:`~core.evaluator.PopulationEvaluator`, the strategy scores 0
+    instead of disappearing.  Genomes that already carry an error (e.g. from
+    :func:`validate_stage`) are not back-tested.
+    """
+    def run(genome: Dict[str, Any]) -> Dict[str, Any]:
+        if genome.get("error"):
+            return {**genome, "result": None}
+        try:
+            return {**genome, "result": runner.run_backtest(genome["code"])}
+        except Exception as exc:
+            return {**genome, "result": None, "error": f"{type(exc).__name__}: {exc}"}
+    return Stage("backtest", run, workers=workers)
+
+
+def score_stage(scorer, workers: int = 1) -> Stage:
+    """Score ``genome["result"]`` and record its metrics in ``meta``."""
+    from core.evaluator import Evaluation
+
+    def run(genome: Dict[str, Any]) -> Dict[str, Any]:
+        genome = dict(genome)
+        result, error = genome.pop("result"), genome.pop("error", None)
+        meta = dict(genome.get("meta") or {})
+        if result is None:
+            evaluation = Evaluation(0.0, None, error, meta)
+        else:
+            try:
+                evaluation = Evaluation(float(scorer.score(result)), result, meta=meta)
+            except Exception as exc:
+                evaluation = Evaluation(0.0, None, f"{type(exc).__name__}: {exc}", meta)
+        return {**genome, "score": evaluation.score, "meta": evaluation.meta}
+    return Stage("score", run, workers=workers)
+
+
+def persist_stage(generation: int, batch_size: int = 64, save: Optional[Callable] = None,
+                  run_id: Optional[str] = None) -> Stage:
+    """Write genomes in batches with :func:`database.strategy_db.save_strategies`.
+
+    The default *save* tags the rows with *run_id*.
+    """
+    if save is None:
+        from database.strategy_db import save_strategies
+        save = functools.partial(save_strategies, run_id=run_id)
+
+    def run(genomes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        save(genomes, generation=generation)
+        return genomes
+    return Stage("persist", run, workers=1, batch_size=batch_size)
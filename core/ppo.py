@@ -0,0 +1,365 @@
+"""core/ppo.py
+===========
+NumPy Proximal Policy Optimisation over structured strategy edits.
+
+The agent edits strategies instead of writing them: every editable value of
+a script (an ``input.*`` default, an indicator length, a comparison
+threshold or an interchangeable indicator, see
+:func:`core.genetic_ops.edit_slots`) is one *slot*, and an action picks one
+of :data:`N_ACTIONS` edits for every slot at once:
+
+- numeric slots: keep, or scale by ``1 + c`` for ``c`` in :data:`CHANGES`
+  (within the slot's ``minval``/``maxval``);
+- indicator slots: keep, or move 1–4 places along its family
+  (``ta.sma`` → ``ta.ema`` → ``ta.rma`` → ``ta.wma``).
+
+The actor is a small tanh MLP shared by all slots (slot features → edit
+logits), so one policy handles scripts of any shape; the critic sees the
+mean slot features of a script.  Both are trained with the clipped PPO
+objective, GAE advantages and Adam, all in plain NumPy so training runs on
+CPU-only machines.  Rewards, computed by the trainer, are score
+improvements.
+
+:class:`PPOConfig` defaults match ``reinforcement.ppo`` in ``config.yaml``,
+which :meth:`PPOConfig.from_yaml` reads when PyYAML is installed.
+
+Usage example:
+```python
+from core.ppo import Policy, PPOConfig, apply_actions, featurize
+
+policy = Policy(PPOConfig.from_yaml(), seed=0)
+features = featurize(code, score=0.4)
+actions, logp, value = policy.act([features])
+child = apply_actions(code, actions[0])    # None when nothing changed
+```
+"""
+from __future__ import annotations
+
+import logging
+import pathlib
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import yaml  # type: ignore
+except ModuleNotFoundError:  # pragma: no cover
+    yaml = None
+
+from core import genetic_ops
+from core.pine_compiler import PineSyntaxError, parse, unparse
+
+logger = logging.getLogger(__name__)
+
+__all__ = [
+    "PPOConfig",
+    "CHANGES",
+    "N_ACTIONS",
+    "N_FEATURES",
+    "featurize",
+    "apply_actions",
+    "gae",
+    "Policy",
+]
+
+_CONFIG_PATH = pathlib.Path(__file__).resolve().parent.parent / "config.yaml"
+
+#: Relative change of a numeric slot for actions 1..4 (action 0 keeps it)
+CHANGES = (-0.25, -0.1, 0.1, 0.25)
+N_ACTIONS = len(CHANGES) + 1
+_FAMILY_INDEX = {f: i for i, family in enumerate(genetic_ops.INDICATOR_FAMILIES) for f in family}
+N_FEATURES = len(genetic_ops.SLOT_KINDS) + len(genetic_ops.INDICATOR_FAMILIES) + 6
+
+
+@dataclass
+class PPOConfig:
+    """Hyper-parameters of :class:`Policy` and the PPO trainer."""
+
+    learning_rate: float = 3e-4
+    n_steps: int = 2048  #: transitions collected per epoch
+    batch_size: int = 64  #: transitions per minibatch
+    n_epochs: int = 4  #: optimisation passes over each rollout
+    gamma: float = 0.99
+    gae_lambda: float = 0.95
+    clip_range: float = 0.2
+    ent_coef: float = 0.01
+    episode_length: int = 8  #: edits before an environment restarts from the population
+    hidden: int = 32
+
+    @classmethod
+    def from_yaml(cls, path: pathlib.Path = _CONFIG_PATH) -> "PPOConfig":
+        """Defaults overridden by ``reinforcement.ppo`` of *path* (if readable)."""
+        if yaml is None or not path.exists():
+            return cls()
+        try:
+            with path.open("r", encoding="utf-8") as fh:
+                data = ((yaml.safe_load(fh) or {}).get("reinforcement") or {}).get("ppo") or {}
+        except Exception as exc:  # pragma: no cover
+            logger.warning("Failed to load PPO config: %s", exc)
+            return cls()
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+# ---------------------------------------------------------------------------
+# Observations and actions
+# ---------------------------------------------------------------------------
+
+def _slot_features(slot: genetic_ops.Slot, score: float) -> List[float]:
+    row = [0.0] * N_FEATURES
+    row[genetic_ops.SLOT_KINDS.index(slot.kind)] = 1.0
+    base = len(genetic_ops.SLOT_KINDS)
+    if slot.kind == "indicator":
+        family = _FAMILY_INDEX[slot.node.func]
+        members = genetic_ops.INDICATOR_FAMILIES[family]
+        row[base + family] = 1.0
+        row[base + len(genetic_ops.INDICATOR_FAMILIES)] = members.index(slot.node.func) / len(members)
+    else:
+        value = slot.node.value
+        i = base + len(genetic_ops.INDICATOR_FAMILIES)
+        row[i + 1] = float(np.sign(value) * np.log1p(abs(value)) / 5.0)
+        if slot.low is not None and slot.high is not None and slot.high > slot.low:
+            row[i + 2] = (value - slot.low) / (slot.high - slot.low)
+            row[i + 3] = 1.0
+        row[i + 4] = float(slot.integer)
+    row[-1] = score
+    return row
+
+
+def featurize(code: str, score: float = 0.0) -> np.ndarray:
+    """``(n_slots, N_FEATURES)`` observation of *code* (empty outside the compiler subset)."""
+    try:
+        script = parse(code)
+    except PineSyntaxError:
+        return np.zeros((0, N_FEATURES))
+    return np.array([_slot_features(s, score) for s in genetic_ops.edit_slots(script)]).reshape(-1, N_FEATURES)
+
+
+def apply_actions(code: str, actions: Sequence[int]) -> Optional[str]:
+    """Apply one edit per slot of *code*; ``None`` if nothing changed or the result is invalid."""
+    script = parse(code)
+    slots = genetic_ops.edit_slots(script)
+    changed = False
+    for slot, action in zip(slots, actions):
+        if action == 0:
+            continue
+        if slot.kind == "indicator":
+            changed |= genetic_ops.swap(slot, int(action))
+        else:
+            changed |= genetic_ops.adjust(slot, CHANGES[action - 1])
+    if not changed:
+        return None
+    child = unparse(script)
+    return child if genetic_ops.is_valid(child) else None
+
+
+def gae(rewards: np.ndarray, values: np.ndarray, dones: np.ndarray, last_values: np.ndarray,
+        gamma: float, lam: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Generalised advantage estimates and returns for ``(T, n_envs)`` rollouts.
+
+    ``dones[t]`` marks that the episode ended after step *t*.
+    """
+    advantages = np.zeros_like(rewards)
+    running = np.zeros(rewards.shape[1])
+    for t in range(len(rewards) - 1, -1, -1):
+        next_values = last_values if t == len(rewards) - 1 else values[t + 1]
+        live = 1.0 - dones[t]
+        delta = rewards[t] + gamma * next_values * live - values[t]
+        running = delta + gamma * lam * live * running
+        advantages[t] = running
+    return advantages, advantages + values
+
+
+# ---------------------------------------------------------------------------
+# Networks
+# ---------------------------------------------------------------------------
+
+class _MLP:
+    """``x → tanh(x W1 + b1) W2 + b2`` with manual back-propagation."""
+
+    def __init__(self, n_in: int, hidden: int, n_out: int, rng: np.random.Generator, out_scale: float) -> None:
+        self.params = {
+            "w1": rng.normal(0.0, np.sqrt(1.0 / n_in), (n_in, hidden)),
+            "b1": np.zeros(hidden),
+            "w2": rng.normal(0.0, out_scale / np.sqrt(hidden), (hidden, n_out)),
+            "b2": np.zeros(n_out),
+        }
+
+    def forward(self, x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        h = np.tanh(x @ self.params["w1"] + self.params["b1"])
+        return h @ self.params["w2"] + self.params["b2"], h
+
+    def backward(self, x: np.ndarray, h: np.ndarray, grad_out: np.ndarray) -> Dict[str, np.ndarray]:
+        grad_h = (grad_out @ self.params["w2"].T) * (1.0 - h * h)
+        return {"w1": x.T @ grad_h, "b1": grad_h.sum(axis=0), "w2": h.T @ grad_out, "b2": grad_out.sum(axis=0)}
+
+
+class _Adam:
+    def __init__(self, params: Dict[str, np.ndarray], lr: float, betas=(0.9, 0.999), eps: float = 1e-8) -> None:
+        self.params, self.lr, self.betas, self.eps = params, lr, betas, eps
+        self.m = {k: np.zeros_like(v) for k, v in params.items()}
+        self.v = {k: np.zeros_like(v) for k, v in params.items()}
+        self.t = 0
+
+    def step(self, grads: Dict[str, np.ndarray], max_norm: float = 0.5) -> None:
+        norm = np.sqrt(sum(float((g * g).sum()) for g in grads.values()))
+        scale = min(1.0, max_norm / (norm + 1e-12))
+        self.t += 1
+        b1, b2 = self.betas
+        for k, g in grads.items():
+            g = g * scale
+            self.m[k] = b1 * self.m[k] + (1 - b1) * g
+            self.v[k] = b2 * self.v[k] + (1 - b2) * g * g
+            m_hat = self.m[k] / (1 - b1 ** self.t)
+            v_hat = self.v[k] / (1 - b2 ** self.t)
+            self.params[k] -= self.lr * m_hat / (np.sqrt(v_hat) + self.eps)
+
+
+def _log_softmax(logits: np.ndarray) -> np.ndarray:
+    z = logits - logits.max(axis=-1, keepdims=True)
+    return z - np.log(np.exp(z).sum(axis=-1, keepdims=True))
+
+
+def _pool(features: Sequence[np.ndarray]) -> np.ndarray:
+    """Critic input: mean slot features plus the slot count."""
+    return np.array([
+        np.append(f.mean(axis=0) if len(f) else np.zeros(N_FEATURES), len(f) / 10.0) for f in features
+    ])
+
+
+class Policy:
+    """Actor-critic over per-slot edit actions.
+
+    Args:
+        config: Hyper-parameters (``learning_rate``, ``hidden`` …).
+        seed: Seed of the weight initialisation and of action sampling.
+    """
+
+    def __init__(self, config: Optional[PPOConfig] = None, seed: Optional[int] = None) -> None:
+        self.config = config or PPOConfig()
+        self.rng = np.random.default_rng(seed)
+        self.actor = _MLP(N_FEATURES, self.config.hidden, N_ACTIONS, self.rng, out_scale=0.01)
+        # Start by keeping most slots: p(keep) ≈ 0.65 per slot
+        self.actor.params["b2"][0] = 2.0
+        self.critic = _MLP(N_FEATURES + 1, self.config.hidden, 1, self.rng, out_scale=1.0)
+        self._actor_opt = _Adam(self.actor.params, self.config.learning_rate)
+        self._critic_opt = _Adam(self.critic.params, self.config.learning_rate)
+
+    # ------------------------------------------------------------------
+    # Acting
+    # ------------------------------------------------------------------
+
+    def values(self, features: Sequence[np.ndarray]) -> np.ndarray:
+        return self.critic.forward(_pool(features))[0][:, 0]
+
+    def act(self, features: Sequence[np.ndarray]) -> Tuple[List[np.ndarray], np.ndarray, np.ndarray]:
+        """Sample edits for a batch of observations.
+
+        Returns per-observation action arrays, the joint log-probabilities
+        and the critic's value estimates.
+        """
+        sizes = [len(f) for f in features]
+        rows = np.concatenate([f for f in features]) if sum(sizes) else np.zeros((0, N_FEATURES))
+        logp_all = _log_softmax(self.actor.forward(rows)[0]) if len(rows) else np.zeros((0, N_ACTIONS))
+        # Gumbel-max sampling of every slot at once
+        gumbel = -np.log(-np.log(self.rng.uniform(1e-12, 1.0, logp_all.shape)))
+        actions = np.argmax(logp_all + gumbel, axis=1)
+        owner = np.repeat(np.arange(len(features)), sizes)
+        logp = np.bincount(owner, logp_all[np.arange(len(rows)), actions], minlength=len(features))
+        return np.split(actions, np.cumsum(sizes)[:-1]), logp, self.values(features)
+
+    # ------------------------------------------------------------------
+    # Learning
+    # ------------------------------------------------------------------
+
+    def update(self, features: Sequence[np.ndarray], actions: Sequence[np.ndarray], old_logp: np.ndarray,
+               advantages: np.ndarray, returns: np.ndarray) -> Dict[str, float]:
+        """Run ``n_epochs`` of minibatch PPO updates; returns mean losses."""
+        cfg = self.config
+        n = len(features)
+        sizes = np.array([len(f) for f in features])
+        starts = np.concatenate([[0], np.cumsum(sizes)])
+        all_rows = np.concatenate(list(features)) if sizes.sum() else np.zeros((0, N_FEATURES))
+        all_actions = np.concatenate(list(actions)).astype(int) if sizes.sum() else np.zeros(0, int)
+        pooled = _pool(features)
+        stats = {"policy_loss": 0.0, "value_loss": 0.0, "entropy": 0.0, "clip_fraction": 0.0}
+        updates = 0
+        for _ in range(cfg.n_epochs):
+            order = self.rng.permutation(n)
+            for lo in range(0, n, cfg.batch_size):
+                batch = order[lo:lo + cfg.batch_size]
+                row_index = np.concatenate([np.arange(starts[i], starts[i + 1]) for i in batch]).astype(int)
+                owner = np.repeat(np.arange(len(batch)), sizes[batch])
+                adv = advantages[batch]
+                if len(batch) > 1:
+                    adv = (adv - adv.mean()) / (adv.std() + 1e-8)
+                stats_batch = self._update_actor(all_rows[row_index], all_actions[row_index], owner,
+                                                 old_logp[batch], adv)
+                stats_batch["value_loss"] = self._update_critic(pooled[batch], returns[batch])
+                for k, v in stats_batch.items():
+                    stats[k] += v
+                updates += 1
+        return {k: v / max(1, updates) for k, v in stats.items()}
+
+    def _update_actor(self, x: np.ndarray, actions: np.ndarray, owner: np.ndarray, old_logp: np.ndarray,
+                      adv: np.ndarray) -> Dict[str, float]:
+        cfg = self.config
+        b = len(old_logp)
+        if not len(x):
+            return {"policy_loss": 0.0, "entropy": 0.0, "clip_fraction": 0.0}
+        logits, h = self.actor.forward(x)
+        logp_all = _log_softmax(logits)
+        p = np.exp(logp_all)
+        logp = np.bincount(owner, logp_all[np.arange(len(x)), actions], minlength=b)
+        ratio = np.exp(logp - old_logp)
+        clipped = np.clip(ratio, 1.0 - cfg.clip_range, 1.0 + cfg.clip_range)
+        loss = -np.minimum(ratio * adv, clipped * adv).mean()
+        # The gradient flows only where the unclipped term is the minimum
+        active = ratio * adv <= clipped * adv
+        g = -(adv * ratio * active) / b
+        onehot = np.zeros_like(p)
+        onehot[np.arange(len(x)), actions] = 1.0
+        grad = g[owner][:, None] * (onehot - p)
+        entropy = -(p * logp_all).sum(axis=1)
+        grad += cfg.ent_coef / len(x) * p * (logp_all + entropy[:, None])
+        self._actor_opt.step(self.actor.backward(x, h, grad))
+        return {"policy_loss": float(loss), "entropy": float(entropy.mean()),
+                "clip_fraction": float((np.abs(ratio - 1.0) > cfg.clip_range).mean())}
+
+    def _update_critic(self, x: np.ndarray, returns: np.ndarray) -> float:
+        values, h = self.critic.forward(x)
+        error = values[:, 0] - returns
+        self._critic_opt.step(self.critic.backward(x, h, (error / len(x))[:, None]))
+        return float(0.5 * (error ** 2).mean())
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serialisable weights, optimiser moments and RNG state."""
+        def dump(net: _MLP, opt: _Adam) -> Dict[str, Any]:
+            return {
+                "params": {k: v.tolist() for k, v in net.params.items()},
+                "m": {k: v.tolist() for k, v in opt.m.items()},
+                "v": {k: v.tolist() for k, v in opt.v.items()},
+                "t": opt.t,
+            }
+        return {
+            "actor": dump(self.actor, self._actor_opt),
+            "critic": dump(self.critic, self._critic_opt),
+            "rng_state": self.rng.bit_generator.state,
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        for net, opt, name in ((self.actor, self._actor_opt, "actor"), (self.critic, self._critic_opt, "critic")):
+            if name not in state:
+                continue
+            for k, v in state[name]["params"].items():
+                net.params[k][...] = np.asarray(v)
+            opt.m = {k: np.asarray(v, dtype=float) for k, v in state[name]["m"].items()}
+            opt.v = {k: np.asarray(v, dtype=float) for k, v in state[name]["v"].items()}
+            opt.t = state[name]["t"]
+        if "rng_state" in state:
+            self.rng.bit_generator.state = state["rng_state"]
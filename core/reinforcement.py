@@ -5,14 +5,22 @@ Evolutionary and reinforcement‑learning training loops that iteratively
 
 Provides:
 - Genetic Algorithm (GA) trainer
-- Scaffolding for Proximal Policy Optimization (PPO) trainer
+- Proximal Policy Optimization (PPO) trainer over structured strategy edits
 """
 import logging
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 
+import numpy as np
+
+from core import genetic_ops, instrumentation
+from core.backtest_cache import backtest_key, normalize_pine
 from core.backtest_runner import BacktestRunner
-from core.scorer import BaseScorer, scorer_factory
+from core.evaluator import Evaluation, PopulationEvaluator
+from core.local_backtest import stack_signals
+from core.ppo import Policy, PPOConfig, apply_actions, featurize, gae
+from core.scorer import BaseScorer, results_to_columns, scorer_factory
+from core.similarity_index import SimilarityIndex
 
 logger = logging.getLogger(__name__)
 
@@ -23,57 +31,338 @@ class BaseTrainer:
     def train_epoch(self, population: List[StrategyGenome]) -> List[StrategyGenome]:
         raise NotImplementedError
 
+    def close(self) -> None:
+        """Release worker pools or other resources held by the trainer."""
+
+    def get_state(self) -> Dict[str, Any]:
+        """JSON-serialisable trainer parameters and RNG state for checkpoints."""
+        return {}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """Restore what :meth:`get_state` returned."""
+
 class GATrainer(BaseTrainer):
-    """Simple Genetic Algorithm trainer."""
-    def __init__(self, runner: BacktestRunner = None, scorer: BaseScorer = None):
+    """Simple Genetic Algorithm trainer.
+
+    Breeding runs in the calling process with a dedicated RNG (``seed``);
+    the resulting batch of children is then evaluated concurrently by a
+    :class:`~core.evaluator.PopulationEvaluator`.  A fixed seed therefore
+    yields the same generation regardless of ``executor``/``max_workers``.
+    An optional :class:`~core.pine_validator.PineValidator` rejects broken
+    children before they are back-tested.
+
+    With a :class:`~core.similarity_index.SimilarityIndex` of past
+    strategies (``value`` = score), children that are near-clones of a
+    scored strategy with the same numeric literals are not back-tested: they
+    inherit its score multiplied by ``near_clone_weight``, flagged with
+    ``meta["score_estimated"]`` so it is never indexed as a real score.
+    Evaluated children are added to the index.
+    ``min_diversity`` is the share of each generation's children that must
+    not be near-clones of a parent or an earlier sibling.
+    """
+    def __init__(
+        self,
+        runner: BacktestRunner = None,
+        scorer: BaseScorer = None,
+        *,
+        seed: Optional[int] = None,
+        executor: str = "serial",
+        max_workers: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        validator=None,
+        similarity_index: Optional[SimilarityIndex] = None,
+        near_clone_weight: float = 0.5,
+        min_diversity: float = 0.0,
+    ):
         self.runner = runner or BacktestRunner()
         self.scorer = scorer or scorer_factory()
         # default GA params; could be loaded from config
         self.elitism_rate = 0.2
         self.crossover_rate = 0.5
         self.mutation_rate = 0.1
+        self.max_attempts = 8
+        self.similarity_index = similarity_index
+        self.near_clone_weight = near_clone_weight
+        self.min_diversity = min_diversity
+        self.rng = random.Random(seed)
+        self.evaluator = PopulationEvaluator(
+            self.runner, self.scorer,
+            executor=executor, max_workers=max_workers, task_timeout=task_timeout,
+            validator=validator,
+        )
 
-    def train_epoch(self, population: List[StrategyGenome]) -> List[StrategyGenome]:
+    def breed(self, parents: List[StrategyGenome], n_children: int) -> List[str]:
+        """Produce *n_children* child codes from *parents* (no evaluation).
+
+        Crossover and mutation are the structure-aware operators of
+        :mod:`core.genetic_ops`, so children always compile.  A child that
+        duplicates a parent or an earlier child is mutated again (up to
+        ``max_attempts`` times) instead of spending a back-test on it; so is a
+        near-clone while fewer than ``min_diversity`` of the children are
+        distinct.
+        """
+        seen = {normalize_pine(p["code"]) for p in parents}
+        family = None
+        if self.min_diversity > 0:
+            threshold = self.similarity_index.threshold if self.similarity_index is not None else 0.9
+            family = SimilarityIndex(threshold)
+            for i, parent in enumerate(parents):
+                family.add(("parent", i), parent["code"])
+        children = []
+        distinct = 0
+        for n in range(n_children):
+            must_differ = family is not None and distinct < self.min_diversity * (n + 1)
+            for _attempt in range(self.max_attempts):
+                parent1, parent2 = self.rng.sample(parents, 2)
+                child_code = parent1["code"]
+                # Crossover
+                if self.rng.random() < self.crossover_rate:
+                    child_code = genetic_ops.crossover(parent1["code"], parent2["code"], self.rng) or child_code
+                # Mutation; a duplicate (or a near-clone below the diversity floor) is always mutated
+                if (self.rng.random() < self.mutation_rate or normalize_pine(child_code) in seen
+                        or must_differ and family.nearest(child_code) is not None):
+                    child_code = genetic_ops.mutate(child_code, self.rng) or child_code
+                if normalize_pine(child_code) in seen:
+                    continue
+                if must_differ and family.nearest(child_code) is not None:
+                    continue
+                break
+            else:
+                instrumentation.incr("ga.duplicate_children")
+            seen.add(normalize_pine(child_code))
+            if family is not None:
+                distinct += family.add_unique(("child", n), child_code) is None
+            children.append(child_code)
+        return children
+
+    def select_elites(self, population: List[StrategyGenome]) -> List[StrategyGenome]:
+        """Best ``elitism_rate`` share of *population* (at least one), best first."""
         # Sort by score descending
         sorted_pop = sorted(population, key=lambda g: g["score"], reverse=True)
         elite_count = max(1, int(len(sorted_pop) * self.elitism_rate))
-        new_pop = sorted_pop[:elite_count]
-
-        # Generate children
-        while len(new_pop) < len(population):
-            parent1, parent2 = random.sample(sorted_pop[:elite_count], 2)
-            # Crossover
-            if random.random() < self.crossover_rate:
-                cut = len(parent1["code"]) // 2
-                child_code = parent1["code"][ :cut] + parent2["code"][cut: ]
-            else:
-                child_code = parent1["code"]
-            # Mutation
-            if random.random() < self.mutation_rate:
-                child_code += "\n// mutation"
-            # Evaluate
-            result = self.runner.run_backtest(child_code)
-            score = self.scorer.score(result)
-            new_pop.append({"code": child_code, "score": score, "meta": {}})
+        return sorted_pop[:elite_count]
+
+    def train_epoch(self, population: List[StrategyGenome]) -> List[StrategyGenome]:
+        new_pop = self.select_elites(population)
+
+        # Breed the whole batch first, then evaluate it concurrently
+        child_codes = self.breed(new_pop, len(population) - len(new_pop))
+        clones, pending = self.split_near_clones(child_codes)
+        evaluations = iter(self.evaluator.evaluate(pending))
+        evaluated = []
+        for i, code in enumerate(child_codes):
+            if i in clones:
+                new_pop.append(clones[i])
+                continue
+            evaluation = next(evaluations)
+            evaluated.append({"code": code, "score": evaluation.score, "meta": evaluation.meta})
+            new_pop.append(evaluated[-1])
+        self.remember(evaluated)
         return new_pop
 
+    def split_near_clones(self, codes: List[str]) -> Tuple[Dict[int, StrategyGenome], List[str]]:
+        """Near-clone genomes of *codes* by position, and the codes still to back-test."""
+        clones = self._near_clones(codes)
+        return clones, [code for i, code in enumerate(codes) if i not in clones]
+
+    def remember(self, genomes: List[StrategyGenome]) -> None:
+        """Add successfully back-tested *genomes* to the similarity index."""
+        if self.similarity_index is None:
+            return
+        for genome in genomes:
+            meta = genome.get("meta") or {}
+            if "error" not in meta and not meta.get("score_estimated"):
+                self.similarity_index.add(backtest_key(genome["code"]), genome["code"], genome["score"])
+
+    def _near_clones(self, codes: List[str]) -> Dict[int, StrategyGenome]:
+        """Genomes for *codes* that near-clone a scored strategy with the same literals, by position."""
+        clones: Dict[int, StrategyGenome] = {}
+        if self.similarity_index is None:
+            return clones
+        for i, code in enumerate(codes):
+            # A changed input, length or threshold is a new back-test, not a clone
+            match = next((m for m in self.similarity_index.query(code)
+                          if m.value is not None and self.similarity_index.same_literals(m.key, code)), None)
+            if match is not None:
+                clones[i] = {
+                    "code": code,
+                    "score": match.value * self.near_clone_weight,
+                    "meta": {"near_clone_of": match.key, "similarity": round(match.similarity, 4),
+                             "score_estimated": True},
+                }
+        if clones:
+            instrumentation.incr("ga.near_clones_skipped", len(clones))
+            logger.info("Skipped %d near-clone children of %d", len(clones), len(codes))
+        return clones
+
+    def get_state(self) -> Dict[str, Any]:
+        version, internal, gauss_next = self.rng.getstate()
+        return {
+            "elitism_rate": self.elitism_rate,
+            "crossover_rate": self.crossover_rate,
+            "mutation_rate": self.mutation_rate,
+            "min_diversity": self.min_diversity,
+            "rng_state": [version, list(internal), gauss_next],
+        }
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        for name in ("elitism_rate", "crossover_rate", "mutation_rate", "min_diversity"):
+            if name in state:
+                setattr(self, name, state[name])
+        if "rng_state" in state:
+            version, internal, gauss_next = state["rng_state"]
+            self.rng.setstate((version, tuple(internal), gauss_next))
+
+    def close(self) -> None:
+        self.evaluator.close()
+
 class PPOTrainer(BaseTrainer):
-    """Placeholder for PPO trainer."""
-    def __init__(self, runner: BacktestRunner = None, scorer: BaseScorer = None):
+    """Proximal Policy Optimisation over structured strategy edits.
+
+    Every epoch runs ``n_envs`` environments side by side.  An environment
+    starts from a population member and, for ``episode_length`` steps, lets
+    the :class:`~core.ppo.Policy` edit its current strategy (see
+    :mod:`core.ppo`); the reward is the change in :class:`BaseScorer` score.
+    Each step back-tests all environments' candidates as one batch: with a
+    :class:`~core.local_backtest.LocalBacktestRunner` their signals are
+    stacked into a single ``(n_envs, n_bars)`` back-test and scored with
+    :meth:`BaseScorer.score_batch`, with any other runner the batch goes to
+    a :class:`~core.evaluator.PopulationEvaluator`.  After ``n_steps``
+    transitions the policy is updated and the best distinct strategies seen
+    (original members included) form the next population.
+
+    Hyper-parameters come from ``config`` (default:
+    :meth:`~core.ppo.PPOConfig.from_yaml`, i.e. ``config.yaml``).
+    """
+    def __init__(
+        self,
+        runner: BacktestRunner = None,
+        scorer: BaseScorer = None,
+        *,
+        seed: Optional[int] = None,
+        config: Optional[PPOConfig] = None,
+        n_envs: int = 16,
+        executor: str = "serial",
+        max_workers: Optional[int] = None,
+        task_timeout: Optional[float] = None,
+        validator=None,
+    ):
         self.runner = runner or BacktestRunner()
         self.scorer = scorer or scorer_factory()
+        self.config = config or PPOConfig.from_yaml()
+        self.n_envs = n_envs
+        self.policy = Policy(self.config, seed)
+        self.evaluator = PopulationEvaluator(
+            self.runner, self.scorer,
+            executor=executor, max_workers=max_workers, task_timeout=task_timeout,
+            validator=validator,
+        )
+        self.last_stats: Dict[str, float] = {}
+
+    # ------------------------------------------------------------------
+    # Batched evaluation
+    # ------------------------------------------------------------------
+
+    def _evaluate(self, codes: List[str]) -> List[Evaluation]:
+        if not codes:
+            return []
+        if not hasattr(self.runner, "run_signals"):
+            return self.evaluator.evaluate(codes)
+        evaluations: List[Optional[Evaluation]] = [None] * len(codes)
+        signals, rows = [], []
+        for i, code in enumerate(codes):
+            try:
+                signals.append(self.runner.signal_fn(code, self.runner.bars))
+                rows.append(i)
+            except Exception as exc:
+                evaluations[i] = Evaluation(0.0, None, f"{type(exc).__name__}: {exc}")
+        if rows:
+            with instrumentation.span("backtest"):
+                results = self.runner.run_signals(stack_signals(signals))
+            scores = self.scorer.score_batch(results_to_columns(results))
+            for i, result, score in zip(rows, results, scores):
+                evaluations[i] = Evaluation(float(score), result)
+        instrumentation.incr("ppo.backtests", len(rows))
+        return evaluations  # type: ignore[return-value]
+
+    # ------------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------------
 
     def train_epoch(self, population: List[StrategyGenome]) -> List[StrategyGenome]:
-        logger.info("PPOTrainer: not implemented; returning input population.")
-        return population
+        if not population:
+            return population
+        cfg = self.config
+        n_envs = max(1, min(self.n_envs, cfg.n_steps))
+        horizon = max(1, cfg.n_steps // n_envs)
+        rng = self.policy.rng
+        ranked = sorted(population, key=lambda g: g["score"], reverse=True)
+        best: Dict[str, StrategyGenome] = {normalize_pine(g["code"]): g for g in ranked}
+
+        def reset() -> StrategyGenome:
+            # Start episodes from better members more often
+            weights = np.linspace(2.0, 1.0, len(ranked))
+            return ranked[rng.choice(len(ranked), p=weights / weights.sum())]
+
+        current = [reset() for _ in range(n_envs)]
+        age = np.zeros(n_envs, dtype=int)
+        features, actions, logps = [], [], []
+        values = np.zeros((horizon, n_envs))
+        rewards = np.zeros((horizon, n_envs))
+        dones = np.zeros((horizon, n_envs))
+        with instrumentation.span("ppo.rollout"):
+            for t in range(horizon):
+                obs = [featurize(g["code"], g["score"]) for g in current]
+                acts, logp, values[t] = self.policy.act(obs)
+                children = [apply_actions(g["code"], a) if len(a) else None for g, a in zip(current, acts)]
+                pending = [c for c in children if c is not None and normalize_pine(c) not in best]
+                for code, ev in zip(pending, self._evaluate(pending)):
+                    best[normalize_pine(code)] = {"code": code, "score": ev.score, "meta": ev.meta}
+                for e, child in enumerate(children):
+                    if child is not None:
+                        genome = best[normalize_pine(child)]
+                        rewards[t, e] = genome["score"] - current[e]["score"]
+                        current[e] = genome
+                    age[e] += 1
+                    if age[e] >= cfg.episode_length:
+                        dones[t, e] = 1.0
+                        current[e], age[e] = reset(), 0
+                features += obs
+                actions += acts
+                logps.append(logp)
+        last_values = self.policy.values([featurize(g["code"], g["score"]) for g in current])
+        advantages, returns = gae(rewards, values, dones, last_values, cfg.gamma, cfg.gae_lambda)
+        with instrumentation.span("ppo.update"):
+            self.last_stats = self.policy.update(
+                features, actions, np.concatenate(logps), advantages.reshape(-1), returns.reshape(-1))
+        self.last_stats["mean_reward"] = float(rewards.mean())
+        logger.info("PPO epoch: %d transitions, %d strategies evaluated, %s", horizon * n_envs,
+                    len(best) - len(ranked), {k: round(v, 4) for k, v in self.last_stats.items()})
+        return sorted(best.values(), key=lambda g: g["score"], reverse=True)[:len(population)]
+
+    def get_state(self) -> Dict[str, Any]:
+        return {"policy": self.policy.get_state()}
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        if "policy" in state:
+            self.policy.set_state(state["policy"])
+
+    def close(self) -> None:
+        self.evaluator.close()
 
 class TrainerFactory:
     """Factory for creating trainers based on mode."""
     @staticmethod
-    def get_trainer(mode: str) -> BaseTrainer:
+    def get_trainer(
+        mode: str,
+        runner: BacktestRunner = None,
+        scorer: BaseScorer = None,
+        **options: Any,
+    ) -> BaseTrainer:
+        """Create the trainer for *mode*; ``options`` go to its constructor."""
         if mode == "ga":
-            return GATrainer()
+            return GATrainer(runner=runner, scorer=scorer, **options)
         elif mode == "ppo":
-            return PPOTrainer()
+            return PPOTrainer(runner=runner, scorer=scorer, **options)
         else:
             raise ValueError(f"Unknown training mode: {mode}")
@@ -3,12 +3,35 @@
 Utilities for extracting numerical performance metrics from a TradingView
 back‑test HTML report.
 
+The report is scanned once with a single compiled alternation regex that
+recognises metric labels and numeric values at the start of text nodes, and
+table tags.  A small state
+machine on top of the token stream assigns each metric the first value that
+follows its label, and collects the "List of trades" table (the table whose
+header starts with ``Trade #``).  Input may be fed in chunks as it streams
+from the browser, and fields that never appear are reported together instead
+of failing on the first one.
+
 Dependencies:
 - No external HTML parser required; uses regex.
+
+Usage example:
+```python
+from core.result_extractor import ReportParser
+
+parser = ReportParser()
+for chunk in stream:
+    parser.feed(chunk)
+report = parser.close()
+print(report.metrics, report.missing, len(report.trades))
+```
 """
+import html as _html
 import re
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+from core import instrumentation
 
 @dataclass
 class BacktestResult:
@@ -21,27 +44,177 @@ class BacktestResult:
 
 
 def _parse_number(s: str) -> float:
-    s = s.strip().replace(',', '')
+    s = s.strip().replace(',', '').replace('−', '-')
     if s.endswith('%'):
         return float(s.rstrip('%'))
     return float(s)
 
 
+# Label text (lower-cased, single-spaced) -> metric name
+_LABELS = {
+    'net profit': 'net_profit_pct',
+    'max drawdown': 'max_drawdown_pct',
+    'profit factor': 'profit_factor',
+    'sharpe ratio': 'sharpe_ratio',
+    'total closed trades': 'total_trades',
+    'win rate': 'win_rate',
+}
+METRIC_FIELDS = tuple(_LABELS.values())
+_PERCENT_FIELDS = frozenset({'net_profit_pct', 'max_drawdown_pct', 'win_rate'})
+
+# One alternation for every token the state machine cares about.  Labels and
+# values are only recognised at the start of a text node, so every token
+# starts with '<' or '>' and the scan skips the rest of the markup quickly.
+# Tags stop before their closing '>' so that '>' can still start a text token.
+_TOKEN_RE = re.compile(
+    r'>\s*(?:(?P<label>net\s+profit|max\s+drawdown|profit\s+factor|sharpe\s+ratio'
+    r'|total\s+closed\s+trades|win\s+rate)'
+    r'|(?P<value>[-+−]?\d[\d,]{0,24}(?:\.\d{1,12})?)(?P<pct>%)?)'
+    r'|<(?P<close>/?)(?P<tag>table|tr|td|th)\b[^>]*(?=>)',
+    re.IGNORECASE,
+)
+_TAG_RE = re.compile(r'<[^>]*>')
+_SPACE_RE = re.compile(r'\s+')
+_CARRY = 64  # longest label/value token, kept across chunk boundaries
+
+
+@dataclass
+class ReportExtraction:
+    """Everything found in one report."""
+
+    metrics: Dict[str, float] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    trades: List[Dict[str, str]] = field(default_factory=list)
+
+    def to_result(self) -> BacktestResult:
+        """Build a :class:`BacktestResult`; ``profit_factor`` defaults to 0."""
+        required = [name for name in self.missing if name != 'profit_factor']
+        if required:
+            raise ValueError(f"Could not extract {', '.join(required)} from HTML")
+        return BacktestResult(**self.metrics)
+
+
+class ReportParser:
+    """Incremental single-pass report extractor.
+
+    Call :meth:`feed` with successive chunks of the page and :meth:`close`
+    once at the end.  Each byte is scanned once; only a short tail (or the
+    currently open table cell) is carried between chunks.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ''
+        self._metrics: Dict[str, float] = {}
+        self._waiting: List[str] = []
+        self._tables: List[List[List[str]]] = []
+        self._row: Optional[List[str]] = None
+        self._cell: Optional[List[str]] = None
+        self._cell_from = 0
+        self._trades: Optional[List[List[str]]] = None
+
+    def feed(self, chunk: str) -> None:
+        self._buf += chunk
+        self._scan(final=False)
+
+    def close(self) -> ReportExtraction:
+        self._scan(final=True)
+        trades: List[Dict[str, str]] = []
+        if self._trades:
+            header = self._trades[0]
+            trades = [dict(zip(header, row)) for row in self._trades[1:] if row]
+        missing = [name for name in METRIC_FIELDS if name not in self._metrics]
+        return ReportExtraction(dict(self._metrics), missing, trades)
+
+    # ------------------------------------------------------------------
+
+    def _scan(self, final: bool) -> None:
+        buf = self._buf
+        limit = len(buf) if final else len(buf) - _CARRY
+        pos = 0
+        keep = len(buf) if final else max(0, limit)
+        for m in _TOKEN_RE.finditer(buf):
+            if m.end() >= limit and not final:
+                keep = min(keep, m.start())  # may still grow; rescan next time
+                break
+            pos = m.end()
+            if m.group('label'):
+                name = _LABELS[_SPACE_RE.sub(' ', m.group('label').lower())]
+                if name not in self._metrics and name not in self._waiting:
+                    self._waiting.append(name)
+            elif m.group('value'):
+                if self._waiting:
+                    self._on_value(m.group('value'), bool(m.group('pct')))
+            else:
+                self._on_tag(buf, m)
+
+        keep = max(keep, pos)
+        lt = buf.rfind('<', pos)
+        if lt != -1 and lt > buf.rfind('>'):
+            keep = min(keep, lt)  # unfinished tag
+        if self._cell is not None:
+            self._cell.append(buf[self._cell_from:keep])
+            self._cell_from = max(0, self._cell_from - keep)
+        self._buf = buf[keep:]
+
+    def _on_value(self, text: str, percent: bool) -> None:
+        for name in list(self._waiting):
+            if name in _PERCENT_FIELDS and not percent:
+                continue
+            if name == 'total_trades':
+                if '.' in text:
+                    continue
+                self._metrics[name] = int(_parse_number(text))
+            else:
+                self._metrics[name] = _parse_number(text)
+            self._waiting.remove(name)
+
+    def _on_tag(self, buf: str, m: 're.Match[str]') -> None:
+        tag = m.group('tag').lower()
+        closing = bool(m.group('close'))
+        if tag in ('td', 'th'):
+            if closing:
+                if self._cell is not None:
+                    self._cell.append(buf[self._cell_from:m.start()])
+                    text = _TAG_RE.sub(' ', ''.join(self._cell))
+                    if self._row is None:
+                        self._row = []
+                    self._row.append(_SPACE_RE.sub(' ', _html.unescape(text)).strip())
+                    self._cell = None
+            else:
+                self._cell = []
+                self._cell_from = m.end() + 1
+        elif tag == 'tr':
+            if closing:
+                if self._row is not None and self._tables:
+                    self._tables[-1].append(self._row)
+                self._row = None
+            else:
+                self._row = []
+        elif closing:
+            if self._tables:
+                rows = self._tables.pop()
+                if self._trades is None and rows and rows[0] and rows[0][0].lower().startswith('trade #'):
+                    self._trades = rows
+        else:
+            self._tables.append([])
+
+
+def extract_report(source: Union[str, Iterable[str]]) -> ReportExtraction:
+    """Extract metrics, missing fields and trades from a page or chunk stream."""
+    with instrumentation.span("extract"):
+        parser = ReportParser()
+        for chunk in ([source] if isinstance(source, str) else source):
+            parser.feed(chunk)
+        return parser.close()
+
+
 def extract_from_html(html: str) -> Dict[str, float]:
-    """Extract metrics from TradingView backtest HTML string."""
-    fields = {
-        'net_profit_pct': r'Net profit[\s\S]*?>([\d\.]+)%',
-        'max_drawdown_pct': r'Max drawdown[\s\S]*?>([\d\.]+)%',
-        'profit_factor': r'Profit factor[\s\S]*?>([\d\.]+)',
-        'sharpe_ratio': r'Sharpe ratio[\s\S]*?>([\d\.]+)',
-        'total_trades': r'Total closed trades[\s\S]*?>(\d+)',
-        'win_rate': r'Win rate[\s\S]*?>([\d\.]+)%',
-    }
-    results: Dict[str, float] = {}
-    for key, pattern in fields.items():
-        m = re.search(pattern, html, re.IGNORECASE)
-        if not m:
-            raise ValueError(f"Could not extract {key} from HTML")
-        value = m.group(1)
-        results[key] = int(value) if key == 'total_trades' else float(value)
-    return results
+    """Extract metrics from TradingView backtest HTML string.
+
+    Raises:
+        ValueError: naming every metric that could not be found.
+    """
+    report = extract_report(html)
+    if report.missing:
+        raise ValueError(f"Could not extract {', '.join(report.missing)} from HTML")
+    return report.metrics
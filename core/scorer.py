@@ -26,6 +26,9 @@ result = BacktestResult(
 
 scorer = scorer_factory()
 print(scorer.score(result))  # → 0.83 (depends on config)
+
+# Whole population at once (bit-identical to calling ``score`` per result)
+scores = scorer.score_batch(results_to_columns(population_results))
 ```
 """
 
@@ -35,8 +38,10 @@ import logging
 import math
 import pathlib
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Final, Protocol
+from dataclasses import dataclass, fields
+from typing import Final, Iterable, Mapping, Protocol
+
+import numpy as np
 
 try:
     import yaml  # type: ignore
@@ -50,6 +55,7 @@ __all__: Final = [
     "BaseScorer",
     "DefaultScorer",
     "scorer_factory",
+    "results_to_columns",
 ]
 
 logger = logging.getLogger(__name__)
@@ -89,6 +95,20 @@ class ScoreConfig:
         return cls(**{k: v for k, v in data.items() if hasattr(cls, k)})  # type: ignore[arg-type]
 
 
+#: Columnar results: one equally long array per ``BacktestResult`` field.
+#: A NumPy structured array with those field names works as well.
+ResultColumns = Mapping[str, np.ndarray]
+
+_RESULT_FIELDS: Final = tuple(f.name for f in fields(BacktestResult))
+
+
+def results_to_columns(results: Iterable[BacktestResult]) -> dict[str, np.ndarray]:
+    """Convert a sequence of results into ``{field: float64 array}`` columns."""
+    rows = [[getattr(r, name) for name in _RESULT_FIELDS] for r in results]
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), len(_RESULT_FIELDS))
+    return {name: table[:, i] for i, name in enumerate(_RESULT_FIELDS)}
+
+
 class BaseScorer(ABC):
     """Abstract scorer interface for dependency inversion purposes."""
 
@@ -96,6 +116,25 @@ class BaseScorer(ABC):
     def score(self, result: BacktestResult) -> float:  # noqa: D401
         """Return a fitness value in the closed interval ``[0, 1]``."""
 
+    def score_batch(self, columns: ResultColumns) -> np.ndarray:
+        """Score a whole population given as columns; returns a float64 array.
+
+        The default implementation rebuilds each :class:`BacktestResult` and
+        calls :meth:`score`; subclasses override it with a vectorised path
+        that must return exactly the same values.
+        """
+        names = set(_column_names(columns))
+        arrays = {name: np.asarray(columns[name]) for name in _RESULT_FIELDS if name in names}
+        n = len(next(iter(arrays.values()))) if arrays else 0
+        return np.fromiter(
+            (
+                self.score(BacktestResult(**{name: a[i].item() for name, a in arrays.items()}))
+                for i in range(n)
+            ),
+            dtype=np.float64,
+            count=n,
+        )
+
 
 # ---------------------------------------------------------------------------
 # Utility helpers
@@ -111,6 +150,17 @@ def _safe_div(numerator: float, denominator: float, *, default: float = 0.0) ->
     return numerator / denominator if denominator else default
 
 
+def _clamp01_array(values: np.ndarray) -> np.ndarray:
+    """Element-wise :func:`_clamp01`, including its NaN -> 1.0 and -0.0 -> 0.0."""
+    upper = np.where(values < 1.0, values, 1.0)
+    return np.where(upper > 0.0, upper, 0.0)
+
+
+def _column_names(columns: ResultColumns) -> Iterable[str]:
+    names = getattr(getattr(columns, "dtype", None), "names", None)
+    return names if names is not None else columns.keys()
+
+
 # ---------------------------------------------------------------------------
 # Default scorer implementation
 # ---------------------------------------------------------------------------
@@ -165,6 +215,31 @@ class DefaultScorer(BaseScorer):
         logger.debug("Computed fitness score: %.3f", score)
         return score
 
+    def score_batch(self, columns: ResultColumns) -> np.ndarray:
+        """Vectorised :meth:`score` over columnar results.
+
+        Performs the same float64 operations in the same order as the scalar
+        path, so ``score_batch(cols)[i] == score(result_i)`` exactly.
+        """
+        def col(name: str) -> np.ndarray:
+            return np.asarray(columns[name], dtype=np.float64)
+
+        p = _clamp01_array(col("net_profit_pct") / self._MAX_PROFIT)
+        dd = _clamp01_array(1.0 - np.abs(col("max_drawdown_pct")) / abs(self._MIN_DRAWDOWN))
+        s = _clamp01_array(col("sharpe_ratio") / self._MAX_SHARPE)
+        wr = _clamp01_array(col("win_rate"))
+        tc = _clamp01_array(col("total_trades") / self._MAX_TRADECOUNT)
+
+        cfg = self._cfg
+        score = (
+            p * cfg.profit_w
+            + dd * cfg.drawdown_w
+            + s * cfg.sharpe_w
+            + wr * cfg.winrate_w
+            + tc * cfg.tradecount_w
+        )
+        return _clamp01_array(score)
+
 
 # ---------------------------------------------------------------------------
 # Factory helper
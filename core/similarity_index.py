@@ -0,0 +1,290 @@
+"""core/similarity_index.py
+=========================
+Near-duplicate detection for Pine Script strategies (MinHash + LSH).
+
+Exact-hash deduplication (:func:`core.backtest_cache.normalize_pine`) misses
+GPT rewrites that only rename variables, reword labels or re-indent code.
+:class:`SimilarityIndex` compares strategies as sets of token shingles
+instead:
+
+- comments are dropped, string literals become one placeholder token,
+  numbers are written canonically and user identifiers are renamed by order
+  of first appearance, so ``fastMA``/``ema_fast`` or ``"Long"``/``"Buy"``
+  make no difference while built-ins (``close``, ``ta.ema``) are kept;
+- every ``shingle_size`` consecutive tokens form one shingle and each script
+  is summarised by a ``num_perm``-value MinHash signature whose agreement
+  rate estimates the Jaccard similarity of two shingle sets;
+- signatures are split into LSH bands so a query only compares against the
+  few stored strategies that share at least one band, keeping lookups well
+  under a millisecond with hundreds of thousands of entries.
+
+The band layout is chosen from ``threshold`` (the similarity from which two
+strategies count as near-clones) so that near-clones are found with 99%
+probability; queries with a lower threshold may miss some matches.
+
+Usage example:
+```python
+from core.similarity_index import SimilarityIndex
+
+index = SimilarityIndex.from_database(threshold=0.9)   # past strategies, value=score
+match = index.nearest(candidate_code)
+if match is not None:
+    print(f"near-clone of strategy {match.key} ({match.similarity:.0%}), score {match.value}")
+```
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["Match", "SimilarityIndex", "tokens", "population_diversity"]
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64(0xFFFFFFFF)
+_TOKEN_RE = re.compile(
+    r"""
+     (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+    |(?P<comment>//[^\n]*)
+    |(?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+    |(?P<name>[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*)
+    |(?P<op>:=|==|!=|<=|>=|=>|[-+*/%<>=?:(),\[\]{}])
+    """,
+    re.VERBOSE,
+)
+# Names that carry meaning in every script and are therefore not renamed
+_KEEP = {
+    "if", "else", "for", "to", "by", "in", "while", "switch", "and", "or", "not", "true", "false",
+    "var", "varip", "int", "float", "bool", "string", "color", "na", "strategy", "indicator",
+    "open", "high", "low", "close", "volume", "hl2", "hlc3", "ohlc4", "time", "bar_index", "nz",
+}
+
+
+@dataclass(frozen=True)
+class Match:
+    """A stored strategy similar to the query."""
+
+    key: Hashable
+    similarity: float
+    value: Any = None
+
+
+def tokens(code: str) -> List[str]:
+    """Canonical token stream of *code* (see module docstring)."""
+    out: List[str] = []
+    renamed: Dict[str, str] = {}
+    for m in _TOKEN_RE.finditer(code):
+        kind = m.lastgroup
+        if kind == "comment":
+            continue
+        text = m.group()
+        if kind == "string":
+            out.append('"')
+        elif kind == "number":
+            out.append(repr(float(text)))
+        elif kind == "name" and "." not in text and text not in _KEEP:
+            out.append(renamed.setdefault(text, f"${len(renamed)}"))
+        else:
+            out.append(text)
+    return out
+
+
+def _literal_key(toks: Sequence[str]) -> int:
+    """Hash of the numeric literals of a token stream, in order."""
+    return zlib.crc32("\x1f".join(t for t in toks if t[0].isdigit()).encode())
+
+
+def _shingle_hashes(toks: List[str], size: int) -> np.ndarray:
+    if len(toks) < size:
+        toks += [""] * (size - len(toks))
+    hashes = {zlib.crc32("\x1f".join(toks[i:i + size]).encode()) for i in range(len(toks) - size + 1)}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+def _band_layout(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """``(bands, rows)`` with the fewest candidates that still finds 99% of pairs at *threshold*.
+
+    A pair with similarity ``s`` shares a band with probability
+    ``1 - (1 - s**rows)**bands``; more rows per band mean fewer dissimilar
+    candidates to compare.
+    """
+    layout = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if num_perm % rows == 0 and 1.0 - (1.0 - threshold ** rows) ** bands >= 0.99:
+            layout = (bands, rows)
+    return layout
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of strategies for near-duplicate lookups.
+
+    Args:
+        threshold: Estimated Jaccard similarity (of token shingles) from
+            which two strategies count as near-clones.
+        num_perm: MinHash signature length; the similarity estimate has a
+            standard error of about ``0.5 / sqrt(num_perm)``.
+        shingle_size: Tokens per shingle.
+        seed: Seed of the hash permutations; indexes built with different
+            seeds cannot share signatures.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, shingle_size: int = 3,
+                 seed: int = 1) -> None:
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), num_perm, dtype=np.uint64)
+        self.bands, self.rows = _band_layout(threshold, num_perm)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._keys: List[Hashable] = []
+        self._values: List[Any] = []
+        self._literals: List[int] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def signature(self, code: str) -> np.ndarray:
+        """MinHash signature (``num_perm`` uint32 values) of *code*."""
+        hashes = _shingle_hashes(tokens(code), self.shingle_size)
+        with np.errstate(over="ignore"):  # the products wrap modulo 2**64 by design
+            permuted = (hashes[:, None] * self._a + self._b) % _PRIME & _MASK
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _bands(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    # ------------------------------------------------------------------
+    # Updates
+    # ------------------------------------------------------------------
+
+    def add(self, key: Hashable, code: str, value: Any = None,
+            signature: Optional[np.ndarray] = None) -> None:
+        """Index *code* under *key* (ignored if the key is already present).
+
+        *value* (e.g. the strategy's score) is returned with matches.
+        """
+        if signature is None:
+            signature = self.signature(code)
+        literals = _literal_key(tokens(code))
+        with self._lock:
+            if key in self._rows:
+                return
+            row = len(self._keys)
+            if row == len(self._signatures):
+                grown = np.empty((2 * row, self.num_perm), dtype=np.uint32)
+                grown[:row] = self._signatures
+                self._signatures = grown
+            self._signatures[row] = signature
+            self._keys.append(key)
+            self._values.append(value)
+            self._literals.append(literals)
+            self._rows[key] = row
+            for bucket, band in zip(self._buckets, self._bands(signature)):
+                bucket.setdefault(band, []).append(row)
+
+    def add_unique(self, key: Hashable, code: str, value: Any = None) -> Optional[Match]:
+        """Add *code* unless it is a near-clone; returns the blocking match, if any."""
+        signature = self.signature(code)
+        match = self.nearest(code, signature=signature)
+        if match is None:
+            self.add(key, code, value, signature=signature)
+        return match
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, code: str, threshold: Optional[float] = None,
+              signature: Optional[np.ndarray] = None) -> List[Match]:
+        """Stored strategies with estimated similarity ≥ *threshold*, most similar first."""
+        if signature is None:
+            signature = self.signature(code)
+        threshold = self.threshold if threshold is None else threshold
+        with self._lock:
+            candidates = set()
+            for bucket, band in zip(self._buckets, self._bands(signature)):
+                candidates.update(bucket.get(band, ()))
+            if not candidates:
+                return []
+            rows = np.fromiter(candidates, dtype=np.intp, count=len(candidates))
+            similarity = np.count_nonzero(self._signatures[rows] == signature, axis=1) / self.num_perm
+            keep = similarity >= threshold
+            matches = [Match(self._keys[r], float(s), self._values[r])
+                       for r, s in zip(rows[keep], similarity[keep])]
+        matches.sort(key=lambda m: m.similarity, reverse=True)
+        return matches
+
+    def nearest(self, code: str, signature: Optional[np.ndarray] = None) -> Optional[Match]:
+        """Most similar stored strategy at or above ``threshold``, or ``None``."""
+        matches = self.query(code, signature=signature)
+        return matches[0] if matches else None
+
+    def same_literals(self, key: Hashable, code: str) -> bool:
+        """Whether *code* has exactly the numeric literals of the strategy stored under *key*.
+
+        Near-clones that differ in an input default, a length or a threshold
+        usually back-test differently; only those with identical literals
+        differ in naming, labels or layout alone.
+        """
+        with self._lock:
+            row = self._rows.get(key)
+            stored = None if row is None else self._literals[row]
+        return stored is not None and stored == _literal_key(tokens(code))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._rows
+
+    # ------------------------------------------------------------------
+    # Bulk loading
+    # ------------------------------------------------------------------
+
+    def extend(self, entries: Iterable[Tuple[Hashable, str, Any]]) -> int:
+        """Add ``(key, code, value)`` entries; returns how many were read."""
+        count = 0
+        for key, code, value in entries:
+            self.add(key, code, value)
+            count += 1
+        return count
+
+    @classmethod
+    def from_database(cls, generation: Optional[int] = None, chunk_size: int = 1000,
+                      **kwargs) -> "SimilarityIndex":
+        """Index every stored :class:`database.models.Strategy` (key=id, value=score).
+
+        Rows whose score was inherited rather than back-tested
+        (``meta["score_estimated"]``) are indexed with ``value=None``.
+        """
+        from database.strategy_db import iter_strategies
+
+        index = cls(**kwargs)
+        rows = iter_strategies(("id", "code", "score", "meta"), generation=generation, chunk_size=chunk_size)
+        count = index.extend(
+            (row.id, row.code, None if (row.meta or {}).get("score_estimated") else row.score) for row in rows
+        )
+        logger.info("Indexed %d stored strategies (%d bands × %d rows)", count, index.bands, index.rows)
+        return index
+
+
+def population_diversity(codes: Sequence[str], threshold: float = 0.9) -> float:
+    """Share of *codes* that are not near-clones of an earlier one (1.0 = all distinct)."""
+    if not codes:
+        return 1.0
+    index = SimilarityIndex(threshold=threshold)
+    distinct = sum(index.add_unique(i, code) is None for i, code in enumerate(codes))
+    return distinct / len(codes)
@@ -5,9 +5,12 @@ Generates or refines TradingView **Pine Script** strategies via the OpenAI Chat
 
 Usage example:
 ```python
-from core.strategy_generator import generate_strategy
+from core.strategy_generator import generate_strategy, generate_strategies
 ps_code = generate_strategy("產生一個 EMA 交叉策略，短期 10、長期 50")
 print(ps_code)
+
+# Many prompts concurrently (at most 8 requests in flight)
+codes = generate_strategies(["產生一個隨機 Pine Script 策略"] * 50, concurrency=8)
 ```
 
 Follows SOLID principles and includes concise Google-style docstrings with logging.
@@ -19,22 +22,112 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+import asyncio
 import logging
-from typing import Optional
-from openai import OpenAI
+import random
+from typing import Callable, List, Optional, Sequence
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+from core import instrumentation
+from core.llm_cache import LLMResponseCache, llm_cache_key
 
 logger = logging.getLogger(__name__)
 
 # Environment variable key for OpenAI API
 _API_KEY_ENV = "OPENAI_API_KEY"
+_MODEL = "gpt-4o-mini"
 
+# Longest wait between two attempts, whatever the backoff or Retry-After says
+_MAX_BACKOFF = 60.0
 
-def _get_openai_client() -> OpenAI:
-    """Get an OpenAI client using the environment variable."""
+# One pooled client per process (sync).  httpx connection pools cannot be
+# shared across event loops, so each async batch opens its own AsyncOpenAI
+# client and closes it before its loop ends (see _ask_many).
+_client: Optional[OpenAI] = None
+
+# Optional persistent response cache consulted by _ask_gpt/_ask_gpt_async
+_response_cache: Optional[LLMResponseCache] = None
+
+
+def configure_response_cache(cache: Optional[LLMResponseCache]) -> None:
+    """Install (or with ``None`` remove) the GPT response cache."""
+    global _response_cache
+    _response_cache = cache
+
+
+def _cache_lookup(key: Optional[str]) -> Optional[str]:
+    if key is None or _response_cache is None:
+        return None
+    content = _response_cache.get(key)
+    instrumentation.incr("llm.cache_hits" if content is not None else "llm.cache_misses")
+    return content
+
+
+def _cache_key(prompt: str, system: Optional[str], temperature: float, max_tokens: int,
+               sample: int) -> Optional[str]:
+    if _response_cache is None:
+        return None
+    return llm_cache_key(_MODEL, system, prompt, temperature, max_tokens, sample)
+
+
+def _cache_store(key: Optional[str], response) -> str:
+    content = response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    tokens = getattr(usage, "total_tokens", 0) or 0
+    instrumentation.incr("llm.requests")
+    instrumentation.incr("llm.tokens", tokens)
+    if key is not None and _response_cache is not None and content is not None:
+        _response_cache.put(key, content, tokens)
+    return content
+
+
+def _api_key() -> str:
     api_key = os.getenv(_API_KEY_ENV)
     if not api_key:
         raise EnvironmentError(f"{_API_KEY_ENV} environment variable is not set.")
-    return OpenAI(api_key=api_key)
+    return api_key
+
+
+def _get_openai_client() -> OpenAI:
+    """Get the shared OpenAI client, creating it on first use."""
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=_api_key())
+    return _client
+
+
+def _new_async_client() -> AsyncOpenAI:
+    """Create an AsyncOpenAI client; the caller closes it.
+
+    SDK-level retries are disabled; :func:`_ask_gpt_async` applies its own
+    backoff policy.
+    """
+    return AsyncOpenAI(api_key=_api_key(), max_retries=0)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Return True for 429, 5xx, timeouts and connection failures."""
+    if isinstance(exc, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+def _retry_delay(exc: BaseException, attempt: int, backoff: float) -> float:
+    """Exponential backoff with full jitter, honouring ``Retry-After``.
+
+    Both are capped at ``_MAX_BACKOFF`` seconds.
+    """
+    response = getattr(exc, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), _MAX_BACKOFF)
+        except ValueError:
+            pass
+    return random.uniform(0, min(backoff * (2 ** attempt), _MAX_BACKOFF))
 
 
 def _ask_gpt(
@@ -42,38 +135,178 @@ def _ask_gpt(
     system: Optional[str] = None,
     temperature: float = 0.7,
     max_tokens: int = 512,
+    *,
+    sample: int = 0,
+    bypass_cache: bool = False,
 ) -> str:
-    """Call the OpenAI ChatCompletion API and return the assistant content."""
+    """Call the OpenAI ChatCompletion API and return the assistant content.
+
+    When a response cache is configured, *sample* distinguishes repeated
+    requests with identical parameters and ``bypass_cache`` forces a fresh
+    completion (which then replaces the cached one).
+    """
+    key = _cache_key(prompt, system, temperature, max_tokens, sample)
+    cached = None if bypass_cache else _cache_lookup(key)
+    if cached is not None:
+        return cached
     client = _get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": system or ""},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
-    return response.choices[0].message.content
+    with instrumentation.span("llm.request"):
+        response = client.chat.completions.create(
+            model=_MODEL,
+            messages=[
+                {"role": "system", "content": system or ""},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    return _cache_store(key, response)
 
 
-def generate_strategy(prompt: str, system: Optional[str] = None) -> str:
-    """Generate a new Pine Script strategy given a user prompt."""
-    logger.info("Generating new strategy via GPT → Pine Script")
-    full_prompt = (
+async def _ask_gpt_async(
+    get_client: Callable[[], AsyncOpenAI],
+    prompt: str,
+    system: Optional[str] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 512,
+    *,
+    timeout: float = 60.0,
+    max_retries: int = 4,
+    backoff: float = 1.0,
+    sample: int = 0,
+    bypass_cache: bool = False,
+) -> str:
+    """Async :func:`_ask_gpt` with a per-request timeout and retry/backoff.
+
+    *get_client* returns the batch's client; it is only called on a cache miss.
+    """
+    key = _cache_key(prompt, system, temperature, max_tokens, sample)
+    cached = None if bypass_cache else _cache_lookup(key)
+    if cached is not None:
+        return cached
+    client = get_client()
+    for attempt in range(max_retries + 1):
+        try:
+            with instrumentation.span("llm.request"):
+                response = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=_MODEL,
+                        messages=[
+                            {"role": "system", "content": system or ""},
+                            {"role": "user", "content": prompt},
+                        ],
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    ),
+                    timeout,
+                )
+            return _cache_store(key, response)
+        except Exception as exc:
+            if attempt == max_retries or not _is_retryable(exc):
+                instrumentation.incr("llm.failures")
+                raise
+            instrumentation.incr("llm.retries")
+            delay = _retry_delay(exc, attempt, backoff)
+            logger.warning("GPT request failed (%s); retry %d/%d in %.1fs",
+                           type(exc).__name__, attempt + 1, max_retries, delay)
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def _generation_prompt(prompt: str) -> str:
+    return (
         "Please produce a TradingView Pine Script (version 5) strategy that meets the following requirements:"
         f" {prompt}\nMake sure it includes strategy() declaration and basic entry/exit logic."
     )
-    return _ask_gpt(full_prompt, system)
 
 
-def rewrite_strategy(
-    existing_code: str,
+def generate_strategy(
     prompt: str,
     system: Optional[str] = None,
+    bypass_cache: bool = False,
+    sample: int = 0,
 ) -> str:
-    """Rewrite or enhance an existing Pine Script strategy based on a prompt."""
-    logger.info("Rewriting existing Pine Script strategy via GPT")
+    """Generate a new Pine Script strategy given a user prompt.
+
+    *sample* distinguishes repeated calls with the same prompt in the
+    response cache (see :func:`_ask_gpt`).
+    """
+    logger.info("Generating new strategy via GPT → Pine Script")
+    return _ask_gpt(_generation_prompt(prompt), system, sample=sample, bypass_cache=bypass_cache)
+
+
+async def _ask_many(
+    full_prompts: Sequence[str],
+    system: Optional[str],
+    concurrency: int,
+    timeout: float,
+    max_retries: int,
+    return_exceptions: bool,
+    bypass_cache: bool = False,
+) -> List[str]:
+    """Run :func:`_ask_gpt_async` for every prompt, at most *concurrency* at a time.
+
+    Repeated prompts get increasing ``sample`` indices so each one maps to
+    its own cache entry.  The requests share one client, opened on the first
+    cache miss and closed (after cancelling any request still running) before
+    returning, so no connection pool outlives the event loop.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    seen: dict = {}
+    samples = []
+    for p in full_prompts:
+        samples.append(seen.get(p, 0))
+        seen[p] = samples[-1] + 1
+    client: Optional[AsyncOpenAI] = None
+
+    def get_client() -> AsyncOpenAI:
+        nonlocal client
+        if client is None:
+            client = _new_async_client()
+        return client
+
+    async def one(full_prompt: str, sample: int) -> str:
+        async with semaphore:
+            return await _ask_gpt_async(get_client, full_prompt, system, timeout=timeout,
+                                        max_retries=max_retries, sample=sample, bypass_cache=bypass_cache)
+
+    tasks = [asyncio.ensure_future(one(p, i)) for p, i in zip(full_prompts, samples)]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if client is not None:
+            await client.close()
+
+
+async def agenerate_strategies(
+    prompts: Sequence[str],
+    system: Optional[str] = None,
+    *,
+    concurrency: int = 8,
+    timeout: float = 60.0,
+    max_retries: int = 4,
+    return_exceptions: bool = False,
+    bypass_cache: bool = False,
+) -> List[str]:
+    """Generate one strategy per prompt with at most *concurrency* requests in flight.
+
+    Results are returned in prompt order.  With ``return_exceptions=True``
+    failed prompts yield their exception instead of aborting the batch.
+    """
+    logger.info("Generating %d strategies via GPT (concurrency=%d)", len(prompts), concurrency)
+    return await _ask_many([_generation_prompt(p) for p in prompts], system,
+                           concurrency, timeout, max_retries, return_exceptions, bypass_cache)
+
+
+def generate_strategies(prompts: Sequence[str], system: Optional[str] = None, **kwargs) -> List[str]:
+    """Synchronous wrapper around :func:`agenerate_strategies`."""
+    return asyncio.run(agenerate_strategies(prompts, system, **kwargs))
+
+
+def _rewrite_prompt(existing_code: str, prompt: str) -> str:
     # Build the prompt with fenced code block
     full_prompt = (
         "Here is an existing Pine Script strategy. Please modify it to satisfy the following requirements:"
@@ -82,6 +315,47 @@ def rewrite_strategy(
     )
     full_prompt += existing_code
     full_prompt += "\n```"
-    return _ask_gpt(full_prompt, system)
+    return full_prompt
+
+
+def rewrite_strategy(
+    existing_code: str,
+    prompt: str,
+    system: Optional[str] = None,
+    bypass_cache: bool = False,
+) -> str:
+    """Rewrite or enhance an existing Pine Script strategy based on a prompt."""
+    logger.info("Rewriting existing Pine Script strategy via GPT")
+    return _ask_gpt(_rewrite_prompt(existing_code, prompt), system, bypass_cache=bypass_cache)
+
+
+async def arewrite_strategies(
+    codes: Sequence[str],
+    prompt: str,
+    system: Optional[str] = None,
+    *,
+    concurrency: int = 8,
+    timeout: float = 60.0,
+    max_retries: int = 4,
+    return_exceptions: bool = False,
+    bypass_cache: bool = False,
+) -> List[str]:
+    """Rewrite every strategy in *codes* with the same *prompt*, concurrently."""
+    logger.info("Rewriting %d strategies via GPT (concurrency=%d)", len(codes), concurrency)
+    return await _ask_many([_rewrite_prompt(c, prompt) for c in codes], system,
+                           concurrency, timeout, max_retries, return_exceptions, bypass_cache)
+
+
+def rewrite_strategies(codes: Sequence[str], prompt: str, system: Optional[str] = None, **kwargs) -> List[str]:
+    """Synchronous wrapper around :func:`arewrite_strategies`."""
+    return asyncio.run(arewrite_strategies(codes, prompt, system, **kwargs))
 
-__all__ = ["generate_strategy", "rewrite_strategy"]
+__all__ = [
+    "configure_response_cache",
+    "generate_strategy",
+    "rewrite_strategy",
+    "agenerate_strategies",
+    "generate_strategies",
+    "arewrite_strategies",
+    "rewrite_strategies",
+]
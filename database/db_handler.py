@@ -1,15 +1,37 @@
 """database/db_handler.py
 Dynamic database initialization and session management.
 
-Reads DATABASE_URL at runtime to support in-memory testing."""
+Reads DATABASE_URL at runtime to support in-memory testing.  File-backed
+SQLite databases are opened in WAL mode with ``synchronous=NORMAL`` and a
+larger page cache so bulk writes cost one fsync per transaction at most."""
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from database.models import Base
 from sqlalchemy.pool import StaticPool  # for in-memory SQLite pooling
 
 # Cache engines by URL to persist in-memory DB schema across calls
 _engine_cache: dict[str, any] = {}
+# One sessionmaker per engine instead of one per get_session() call
+_session_factories: dict[str, sessionmaker] = {}
+
+# PRAGMAs applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64_000,  # negative = KiB, i.e. ~64 MB
+    "temp_store": "MEMORY",
+}
+
+
+def _apply_sqlite_pragmas(dbapi_conn, _record, in_memory: bool) -> None:
+    cursor = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if name == "journal_mode" and in_memory:
+            continue  # WAL is not available for :memory: databases
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 
 def get_engine() -> any:
     """Create or retrieve a SQLAlchemy Engine based on DATABASE_URL."""
@@ -17,23 +39,53 @@ def get_engine() -> any:
     if db_url in _engine_cache:
         return _engine_cache[db_url]
     connect_args = {"check_same_thread": False} if db_url.startswith("sqlite") else {}
+    in_memory = db_url.startswith("sqlite") and ":memory:" in db_url
     # Use StaticPool for in-memory DB to maintain same connection
-    if db_url.startswith("sqlite") and ":memory:" in db_url:
+    if in_memory:
         engine = create_engine(db_url, connect_args=connect_args, poolclass=StaticPool)
     else:
         engine = create_engine(db_url, connect_args=connect_args)
+    if db_url.startswith("sqlite"):
+        event.listen(
+            engine, "connect",
+            lambda conn, record: _apply_sqlite_pragmas(conn, record, in_memory),
+        )
     _engine_cache[db_url] = engine
     return engine
 
+def _upgrade_schema(engine) -> None:
+    """Add columns and indexes introduced after a table was first created.
+
+    ``create_all`` never alters existing tables, so databases written by an
+    older version get the new nullable columns via ``ALTER TABLE`` here.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        missing = [c for c in table.columns if c.name not in existing and c.nullable]
+        if missing:
+            with engine.begin() as conn:
+                for column in missing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
 def init_db() -> None:
-    """Create all tables in the database."""
+    """Create all tables in the database (and upgrade older schemas)."""
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
+    _upgrade_schema(engine)
 
 def get_session() -> Session:
     """Return a new SQLAlchemy Session for database operations."""
     engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return SessionLocal()
+    factory = _session_factories.get(str(engine.url))
+    if factory is None or factory.kw["bind"] is not engine:
+        factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        _session_factories[str(engine.url)] = factory
+    return factory()
 
 __all__ = ["init_db", "get_session"]
@@ -0,0 +1,297 @@
+"""database/job_queue.py
+Distributed evaluation queue on the ``jobs`` table.
+
+The controller enqueues candidate strategies with :func:`enqueue` and waits
+for their outcomes with :func:`wait_for`; worker processes on any node that
+can reach ``DATABASE_URL`` (see :mod:`core.job_worker`) take jobs with
+:func:`claim`, keep their lease alive with :func:`heartbeat` and report with
+:func:`complete` or :func:`fail`.
+
+Claims are atomic: one ``UPDATE … WHERE id IN (SELECT … LIMIT n)`` marks the
+jobs as running under a fresh lease token.  On PostgreSQL the inner SELECT
+uses ``FOR UPDATE SKIP LOCKED`` so concurrent workers skip each other's rows
+instead of queueing behind them; SQLite serialises writers, so the single
+statement is already atomic there.  A running job whose lease expires (its
+worker died or stopped sending heartbeats) is claimable again until it has
+used ``max_attempts`` attempts, after which it fails.  Reports carry the
+lease token, so a worker that lost its lease cannot overwrite the outcome
+of the worker that took the job over.  Finished jobs stay in the table until
+:func:`purge` deletes them."""
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+from core import instrumentation
+from database.models import Job
+from database.db_handler import get_session
+
+@dataclass
+class ClaimedJob:
+    """A job leased to one worker."""
+
+    id: int
+    code: str
+    token: str
+    attempts: int
+    generation: Optional[int] = None
+
+@dataclass
+class JobOutcome:
+    """Final state of a finished (``done`` or ``failed``) job."""
+
+    id: int
+    status: str
+    score: Optional[float]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+def _now() -> datetime:
+    # Naive UTC, like the ``created_at`` defaults of database.models
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _chunks(ids: Sequence[int], size: int = 500):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def enqueue(
+    codes: Sequence[str],
+    generation: Optional[int] = None,
+    max_attempts: int = 3,
+) -> List[int]:
+    """Add one pending job per code in a single INSERT; returns the job ids in order."""
+    if not codes:
+        return []
+    batch = uuid.uuid4().hex
+    rows = [
+        {"batch": batch, "generation": generation, "code": code, "status": "pending",
+         "attempts": 0, "max_attempts": max_attempts, "created_at": _now()}
+        for code in codes
+    ]
+    session: Session = get_session()
+    try:
+        with instrumentation.span("db.enqueue"):
+            session.execute(insert(Job), rows)
+            session.commit()
+            ids = list(session.execute(select(Job.id).where(Job.batch == batch).order_by(Job.id)).scalars())
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    instrumentation.incr("jobs.enqueued", len(ids))
+    return ids
+
+def claim(worker: str, limit: int = 1, lease: float = 60.0) -> List[ClaimedJob]:
+    """Atomically lease up to *limit* pending (or lease-expired) jobs for *lease* seconds."""
+    now = _now()
+    token = uuid.uuid4().hex
+    session: Session = get_session()
+    try:
+        with instrumentation.span("db.claim"):
+            # Expired leases that used their last attempt will not be retried
+            session.execute(
+                update(Job)
+                .where(Job.status == "running", Job.lease_expires_at < now, Job.attempts >= Job.max_attempts)
+                .values(status="failed", error="lease expired", lease_token=None, finished_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            claimable = (
+                select(Job.id)
+                .where(or_(Job.status == "pending", and_(Job.status == "running", Job.lease_expires_at < now)))
+                .order_by(Job.id)
+                .limit(limit)
+            )
+            if session.get_bind().dialect.name == "postgresql":
+                claimable = claimable.with_for_update(skip_locked=True)
+            session.execute(
+                update(Job)
+                .where(Job.id.in_(claimable.scalar_subquery()))
+                .values(status="running", worker=worker, lease_token=token, attempts=Job.attempts + 1,
+                        lease_expires_at=now + timedelta(seconds=lease), heartbeat_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            rows = session.execute(
+                select(Job.id, Job.code, Job.attempts, Job.generation)
+                .where(Job.lease_token == token).order_by(Job.id)
+            ).all()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    instrumentation.incr("jobs.claimed", len(rows))
+    return [ClaimedJob(row.id, row.code, token, row.attempts, row.generation) for row in rows]
+
+def _update_leased(job_ids: Optional[Sequence[int]], token: str, **values: Any) -> int:
+    stmt = update(Job).where(Job.lease_token == token, Job.status == "running")
+    if job_ids is not None:
+        stmt = stmt.where(Job.id.in_(list(job_ids)))
+    session: Session = get_session()
+    try:
+        count = session.execute(stmt.values(**values).execution_options(synchronize_session=False)).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return count
+
+def heartbeat(token: str, lease: float = 60.0) -> int:
+    """Extend every running job of lease *token*; returns how many are still held."""
+    now = _now()
+    return _update_leased(None, token, lease_expires_at=now + timedelta(seconds=lease), heartbeat_at=now)
+
+def complete(
+    job_id: int,
+    token: str,
+    score: float,
+    result: Optional[Dict[str, Any]] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """Record the outcome of a job; ``False`` if the lease was lost meanwhile."""
+    done = _update_leased([job_id], token, status="done", score=score, result=result, error=error,
+                          lease_token=None, finished_at=_now())
+    instrumentation.incr("jobs.completed", done)
+    return bool(done)
+
+def fail(job_id: int, token: str, error: str) -> bool:
+    """Give a job back after a worker-side failure.
+
+    It becomes pending again until ``max_attempts`` is used up, then fails.
+    Returns ``False`` if the lease was lost meanwhile.
+    """
+    now = _now()
+    session: Session = get_session()
+    try:
+        job = session.get(Job, job_id)
+        if job is None or job.lease_token != token or job.status != "running":
+            return False
+        retry = job.attempts < job.max_attempts
+        job.status = "pending" if retry else "failed"
+        job.error = error
+        job.lease_token = None
+        job.lease_expires_at = None
+        job.finished_at = None if retry else now
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    instrumentation.incr("jobs.retried" if retry else "jobs.failed")
+    return True
+
+def cancel(job_ids: Sequence[int], error: str = "cancelled") -> int:
+    """Fail every unfinished job in *job_ids*; returns how many were cancelled.
+
+    A worker still running one of them loses its lease, so its late report
+    is discarded.
+    """
+    now = _now()
+    count = 0
+    session: Session = get_session()
+    try:
+        for chunk in _chunks(list(job_ids)):
+            count += session.execute(
+                update(Job)
+                .where(Job.id.in_(chunk), Job.status.in_(("pending", "running")))
+                .values(status="failed", error=error, lease_token=None, finished_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    instrumentation.incr("jobs.cancelled", count)
+    return count
+
+def purge(older_than: float = 86400.0, statuses: Sequence[str] = ("done", "failed")) -> int:
+    """Delete jobs in *statuses* that finished more than *older_than* seconds ago.
+
+    Their outcomes live on in the strategies table; keeping the queue short
+    keeps claims and heartbeats cheap.  Returns the number of rows deleted.
+    """
+    cutoff = _now() - timedelta(seconds=older_than)
+    session: Session = get_session()
+    try:
+        count = session.execute(
+            delete(Job).where(Job.status.in_(list(statuses)), Job.finished_at < cutoff)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    instrumentation.incr("jobs.purged", count)
+    return count
+
+def get_outcomes(job_ids: Sequence[int]) -> Dict[int, JobOutcome]:
+    """Outcomes of the finished jobs among *job_ids*, by id."""
+    outcomes: Dict[int, JobOutcome] = {}
+    session: Session = get_session()
+    try:
+        for chunk in _chunks(list(job_ids)):
+            rows = session.execute(
+                select(Job.id, Job.status, Job.score, Job.result, Job.error)
+                .where(Job.id.in_(chunk), Job.status.in_(("done", "failed")))
+            ).all()
+            for row in rows:
+                outcomes[row.id] = JobOutcome(row.id, row.status, row.score, row.result, row.error)
+    finally:
+        session.close()
+    return outcomes
+
+def wait_for(
+    job_ids: Sequence[int],
+    poll_interval: float = 1.0,
+    timeout: Optional[float] = None,
+) -> Dict[int, JobOutcome]:
+    """Block until every job in *job_ids* is finished and return their outcomes.
+
+    Raises:
+        TimeoutError: *timeout* seconds passed first.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    outcomes: Dict[int, JobOutcome] = {}
+    remaining = list(job_ids)
+    with instrumentation.span("jobs.wait"):
+        while True:
+            outcomes.update(get_outcomes(remaining))
+            remaining = [job_id for job_id in remaining if job_id not in outcomes]
+            if not remaining:
+                return outcomes
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"{len(remaining)} of {len(job_ids)} jobs unfinished after {timeout}s")
+            time.sleep(poll_interval)
+
+def count_jobs() -> Dict[str, int]:
+    """Number of jobs per status."""
+    session: Session = get_session()
+    try:
+        return dict(session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+    finally:
+        session.close()
+
+__all__ = [
+    "ClaimedJob",
+    "JobOutcome",
+    "enqueue",
+    "claim",
+    "heartbeat",
+    "complete",
+    "fail",
+    "cancel",
+    "purge",
+    "get_outcomes",
+    "wait_for",
+    "count_jobs",
+]
@@ -1,21 +1,89 @@
 """database/models.py
 =====================
-SQLAlchemy ORM models for persisting backtest strategies and results."""
-from sqlalchemy import Column, Integer, Float, Text, JSON, DateTime
+SQLAlchemy ORM models for persisting backtest strategies and results.
+
+The ``BacktestResult`` fields are stored as typed, indexed columns next to
+the opaque ``meta`` JSON so leaderboard and filter queries run on indexes
+instead of parsing JSON in Python.
+
+``Job`` rows form the distributed evaluation queue of
+:mod:`database.job_queue`."""
+from sqlalchemy import Column, Integer, Float, String, Text, JSON, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
 Base = declarative_base()
 
+#: Columns mirroring :class:`core.result_extractor.BacktestResult`
+METRIC_COLUMNS = (
+    "net_profit_pct",
+    "max_drawdown_pct",
+    "sharpe_ratio",
+    "total_trades",
+    "win_rate",
+    "profit_factor",
+)
+
 class Strategy(Base):  # type: ignore[name-defined]
     __tablename__ = 'strategies'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     generation = Column(Integer, nullable=False, index=True)
-    score = Column(Float, nullable=False, index=True)
+    score = Column(Float, nullable=False)
     code = Column(Text, nullable=False)#Pine Script
     meta = Column(JSON, nullable=False, default={})
     created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    run_id = Column(String(64), nullable=True)  # controller run (checkpoint namespace) that wrote the row
+
+    # Back-test metrics (NULL when the run produced no result)
+    net_profit_pct = Column(Float, nullable=True)
+    max_drawdown_pct = Column(Float, nullable=True, index=True)
+    sharpe_ratio = Column(Float, nullable=True, index=True)
+    total_trades = Column(Integer, nullable=True, index=True)
+    win_rate = Column(Float, nullable=True)
+    profit_factor = Column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_strategies_generation_score", "generation", score.desc()),
+        Index("ix_strategies_score_desc", score.desc()),
+        Index("ix_strategies_run_generation", "run_id", "generation"),
+    )
 
     def __repr__(self) -> str:
         return f"<Strategy id={self.id} gen={self.generation} score={self.score:.4f}>"
+
+
+#: Life cycle of a :class:`Job`: pending → running → done | failed
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+class Job(Base):  # type: ignore[name-defined]
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch = Column(String(32), nullable=True, index=True)
+    generation = Column(Integer, nullable=True)
+    code = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Lease of the worker currently running the job
+    worker = Column(String(128), nullable=True)
+    lease_token = Column(String(32), nullable=True, index=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    # Outcome
+    score = Column(Float, nullable=True)
+    result = Column(JSON, nullable=True)  # BacktestResult fields
+    error = Column(Text, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+        Index("ix_jobs_status_lease", "status", "lease_expires_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job id={self.id} status={self.status} attempts={self.attempts}>"
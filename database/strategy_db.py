@@ -1,27 +1,127 @@
 """database/strategy_db.py
 Provides functions to persist and query TradingView strategy backtest runs."""
-from typing import Any, Dict, List, Optional
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import and_, delete, func, insert, or_, select, update
 from sqlalchemy.orm import Session
-from database.models import Strategy as StrategyModel
+from core import instrumentation
+from database.models import METRIC_COLUMNS, Strategy as StrategyModel
 from database.db_handler import get_session
 
+def _metric_values(meta: Optional[Mapping[str, Any]], result: Any = None) -> Dict[str, Any]:
+    """Typed metric column values from *result* or ``meta["metrics"]``.
+
+    Missing or malformed metrics map to ``None`` (SQL NULL).  Drawdowns are
+    stored as non-positive percentages whatever sign the source reports.
+    """
+    if result is not None:
+        metrics = asdict(result) if is_dataclass(result) else dict(result)
+    else:
+        metrics = (meta or {}).get("metrics") or {}
+    values: Dict[str, Any] = {}
+    for name in METRIC_COLUMNS:
+        value = metrics.get(name)
+        try:
+            values[name] = None if value is None else (int(value) if name == "total_trades" else float(value))
+        except (TypeError, ValueError):
+            values[name] = None
+    if values["max_drawdown_pct"] is not None:
+        values["max_drawdown_pct"] = -abs(values["max_drawdown_pct"])
+    return values
+
 def save_strategy(
     generation: int,
     score: float,
     code: str,
-    meta: Optional[Dict[str, Any]] = None
+    meta: Optional[Dict[str, Any]] = None,
+    result: Any = None,
 ) -> None:
-    """Save a backtest strategy run into the database."""
+    """Save a backtest strategy run into the database.
+
+    Metric columns are filled from *result* (a ``BacktestResult``) or, when
+    omitted, from ``meta["metrics"]``.
+    """
     session: Session = get_session()
     record = StrategyModel(
         generation=generation,
         score=score,
         code=code,
         meta=meta or {},
+        **_metric_values(meta, result),
     )
-    session.add(record)
-    session.commit()
-    session.close()
+    with instrumentation.span("db.save"):
+        session.add(record)
+        session.commit()
+        session.close()
+    instrumentation.incr("db.rows_written")
+
+def save_strategies(
+    records: Iterable[Mapping[str, Any]],
+    generation: Optional[int] = None,
+    run_id: Optional[str] = None,
+) -> int:
+    """Save many strategy runs in a single transaction.
+
+    Each record is a genome-like mapping with ``code``, ``score`` and
+    optional ``meta``/``generation``/``result`` keys; *generation*, when
+    given, applies to every record.  Metric columns are filled as in
+    :func:`save_strategy`.  Rows are written with one executemany-style
+    INSERT and tagged with *run_id* (see :func:`delete_strategies`).
+
+    Returns:
+        Number of rows written.
+    """
+    rows = [
+        {
+            "generation": generation if generation is not None else rec["generation"],
+            "score": rec.get("score", 0.0),
+            "code": rec.get("code", ""),
+            "meta": rec.get("meta") or {},
+            "run_id": run_id,
+            **_metric_values(rec.get("meta"), rec.get("result")),
+        }
+        for rec in records
+    ]
+    if not rows:
+        return 0
+    session: Session = get_session()
+    try:
+        with instrumentation.span("db.save"):
+            session.execute(insert(StrategyModel), rows)
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    instrumentation.incr("db.rows_written", len(rows))
+    return len(rows)
+
+def delete_strategies(run_id: str, from_generation: int = 0) -> int:
+    """Delete the rows of run *run_id* from generation *from_generation* on.
+
+    A resumed run calls this before redoing a generation, so rows written
+    before a crash are not stored twice.
+
+    Returns:
+        Number of rows deleted.
+    """
+    session: Session = get_session()
+    try:
+        deleted = session.execute(
+            delete(StrategyModel).where(
+                StrategyModel.run_id == run_id,
+                StrategyModel.generation >= from_generation,
+            )
+        ).rowcount
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return deleted
 
 def get_strategies(
     generation: Optional[int] = None,
@@ -49,4 +149,233 @@ def get_strategies(
     session.close()
     return results
 
-__all__ = ["save_strategy", "get_strategies"]
+def _select(columns: Optional[Sequence[str]], generation: Optional[int]):
+    """SELECT of whole ORM rows, or of the named *columns* only."""
+    if columns is None:
+        stmt = select(StrategyModel)
+    else:
+        table = StrategyModel.__table__.c
+        unknown = [name for name in columns if name not in table]
+        if unknown:
+            raise ValueError(f"Unknown strategy columns: {unknown}")
+        stmt = select(*(table[name] for name in columns))
+    if generation is None:
+        return stmt.where(StrategyModel.generation >= 1)
+    return stmt.where(StrategyModel.generation == generation)
+
+def iter_strategies(
+    columns: Optional[Sequence[str]] = None,
+    generation: Optional[int] = None,
+    chunk_size: int = 1000,
+) -> Iterator[Any]:
+    """
+    Stream strategies in id order without materialising the whole table.
+
+    Rows are fetched *chunk_size* at a time (``yield_per``, which uses a
+    server-side cursor where the driver supports one).  With *columns*, e.g.
+    ``("id", "generation", "score")``, only those columns are read and plain
+    named rows are yielded; otherwise ORM objects are.  The same
+    ``generation`` filter as :func:`get_strategies` applies.
+
+    The session stays open until the iterator is exhausted or closed.
+    """
+    stmt = _select(columns, generation).order_by(StrategyModel.id)
+    session: Session = get_session()
+    try:
+        result = session.execute(stmt.execution_options(yield_per=chunk_size))
+        rows = result.scalars() if columns is None else result
+        for row in rows:
+            yield row
+    finally:
+        session.close()
+
+def get_strategy_page(
+    after: Optional[Tuple[Any, ...]] = None,
+    limit: int = 100,
+    columns: Optional[Sequence[str]] = None,
+    generation: Optional[int] = None,
+    order_by: str = "id",
+) -> Tuple[List[Any], Optional[Tuple[Any, ...]]]:
+    """
+    Fetch one page of strategies using keyset (seek) pagination.
+
+    Pages are ordered by ``"id"`` or by ``"score"`` (descending, ties by
+    id).  Pass the cursor returned with a page as *after* to get the next
+    one; each page is an index seek, so late pages cost the same as the
+    first, unlike ``OFFSET``.  Projected rows always include the sort-key
+    columns (``id``, plus ``score`` when ordering by score).
+
+    Returns:
+        ``(rows, cursor)``; *cursor* is ``None`` after the last page.
+    """
+    if order_by not in ("id", "score"):
+        raise ValueError(f"order_by must be 'id' or 'score', not {order_by!r}")
+    stmt = _select(columns, generation)
+    if order_by == "id":
+        if after is not None:
+            stmt = stmt.where(StrategyModel.id > after[0])
+        stmt = stmt.order_by(StrategyModel.id)
+    else:
+        if after is not None:
+            last_score, last_id = after
+            stmt = stmt.where(or_(
+                StrategyModel.score < last_score,
+                and_(StrategyModel.score == last_score, StrategyModel.id > last_id),
+            ))
+        stmt = stmt.order_by(StrategyModel.score.desc(), StrategyModel.id)
+    if columns is not None:
+        # the cursor is built from the sort keys, so always project them
+        keys = ["id"] if order_by == "id" else ["score", "id"]
+        missing = [StrategyModel.__table__.c[k] for k in keys if k not in columns]
+        if missing:
+            stmt = stmt.add_columns(*missing)
+    stmt = stmt.limit(limit)
+
+    session: Session = get_session()
+    try:
+        rows = list(session.scalars(stmt)) if columns is None else session.execute(stmt).all()
+    finally:
+        session.close()
+    if len(rows) < limit:
+        return rows, None
+    last = rows[-1]
+    return rows, (last.id,) if order_by == "id" else (last.score, last.id)
+
+def get_leaderboard(
+    limit: int = 10,
+    generation: Optional[int] = None,
+    min_sharpe: Optional[float] = None,
+    max_drawdown: Optional[float] = None,
+    min_trades: Optional[int] = None,
+    min_win_rate: Optional[float] = None,
+) -> List[StrategyModel]:
+    """
+    Return the *limit* best strategies by score, optionally filtered on metrics.
+
+    Ordering walks the ``(score DESC)`` index, or ``(generation, score)`` when
+    *generation* is given, so the database stops after *limit* matching rows.
+    ``max_drawdown`` bounds the absolute drawdown percentage; it is a plain
+    range on the indexed column, which also matches rows stored with a
+    positive sign before drawdowns were normalised.
+    """
+    stmt = select(StrategyModel)
+    if generation is None:
+        stmt = stmt.where(StrategyModel.generation >= 1)
+    else:
+        stmt = stmt.where(StrategyModel.generation == generation)
+    if min_sharpe is not None:
+        stmt = stmt.where(StrategyModel.sharpe_ratio >= min_sharpe)
+    if max_drawdown is not None:
+        stmt = stmt.where(StrategyModel.max_drawdown_pct.between(-max_drawdown, max_drawdown))
+    if min_trades is not None:
+        stmt = stmt.where(StrategyModel.total_trades >= min_trades)
+    if min_win_rate is not None:
+        stmt = stmt.where(StrategyModel.win_rate >= min_win_rate)
+    stmt = stmt.order_by(StrategyModel.score.desc(), StrategyModel.id).limit(limit)
+
+    session: Session = get_session()
+    try:
+        return list(session.scalars(stmt))
+    finally:
+        session.close()
+
+def get_top_k_per_generation(
+    k: int = 5,
+    generations: Optional[Sequence[int]] = None,
+) -> Dict[int, List[StrategyModel]]:
+    """
+    Return the *k* highest-scoring strategies of every generation.
+
+    One query ranks rows with ``ROW_NUMBER() OVER (PARTITION BY generation
+    ORDER BY score DESC)``, which the ``(generation, score)`` index serves
+    without a sort.  Ties are broken by insertion order.
+
+    Returns:
+        ``{generation: [best, second, ...]}`` in ascending generation order.
+    """
+    rank = func.row_number().over(
+        partition_by=StrategyModel.generation,
+        order_by=(StrategyModel.score.desc(), StrategyModel.id),
+    ).label("rank")
+    ranked = select(StrategyModel.id, rank)
+    if generations is None:
+        ranked = ranked.where(StrategyModel.generation >= 1)
+    else:
+        ranked = ranked.where(StrategyModel.generation.in_(list(generations)))
+    ranked = ranked.subquery()
+    stmt = (
+        select(StrategyModel)
+        .join(ranked, ranked.c.id == StrategyModel.id)
+        .where(ranked.c.rank <= k)
+        .order_by(StrategyModel.generation, ranked.c.rank)
+    )
+
+    session: Session = get_session()
+    try:
+        board: Dict[int, List[StrategyModel]] = {}
+        for row in session.scalars(stmt):
+            board.setdefault(row.generation, []).append(row)
+        return board
+    finally:
+        session.close()
+
+def rescore_strategies(
+    scorer: Any,
+    generation: Optional[int] = None,
+    chunk_size: int = 10_000,
+) -> int:
+    """
+    Recompute every stored score with *scorer* after its weights changed.
+
+    Rows are read *chunk_size* at a time as NumPy metric columns, scored
+    with ``scorer.score_batch`` (see :class:`core.scorer.BaseScorer`) and
+    written back with one bulk UPDATE per chunk, all in a single
+    transaction.  Rows without stored metrics (failed evaluations) keep
+    their score.
+
+    Returns:
+        Number of rows re-scored.
+    """
+    metric_cols = [StrategyModel.__table__.c[name] for name in METRIC_COLUMNS]
+    base = select(StrategyModel.id, *metric_cols).where(*(c.is_not(None) for c in metric_cols))
+    if generation is None:
+        base = base.where(StrategyModel.generation >= 1)
+    else:
+        base = base.where(StrategyModel.generation == generation)
+
+    session: Session = get_session()
+    updated, last_id = 0, None
+    try:
+        while True:
+            stmt = base if last_id is None else base.where(StrategyModel.id > last_id)
+            rows = session.execute(stmt.order_by(StrategyModel.id).limit(chunk_size)).all()
+            if not rows:
+                break
+            table = np.array(rows, dtype=np.float64)
+            ids = table[:, 0].astype(np.int64)
+            scores = scorer.score_batch({name: table[:, i + 1] for i, name in enumerate(METRIC_COLUMNS)})
+            session.execute(
+                update(StrategyModel),
+                [{"id": i, "score": s} for i, s in zip(ids.tolist(), scores.tolist())],
+            )
+            updated += len(rows)
+            last_id = int(ids[-1])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return updated
+
+__all__ = [
+    "save_strategy",
+    "save_strategies",
+    "delete_strategies",
+    "get_strategies",
+    "iter_strategies",
+    "get_strategy_page",
+    "get_leaderboard",
+    "get_top_k_per_generation",
+    "rescore_strategies",
+]
@@ -0,0 +1,224 @@
+"""
+scripts/benchmark.py
+====================
+Performance benchmarks for the hot paths of the pipeline:
+
+- ``extract_report`` on the large saved TradingView pages
+- ``DefaultScorer.score`` / ``score_batch`` at population scale
+- ``GATrainer.train_epoch`` with a stub runner of configurable latency
+- ``save_strategy`` / ``save_strategies`` / ``get_strategies`` on SQLite
+
+Results are written as JSON and compared with a stored baseline
+(``benchmarks/baseline.json`` is committed); the run exits with status 1
+when any benchmark is slower than the baseline by more than ``--threshold``
+(a fraction, 0.25 = 25 %) and with status 2 when there is nothing to compare
+against: no baseline file, or none of the benchmarks run appear in it.
+Baseline timings are machine specific, so re-record them with
+``--save-baseline`` on the machine that runs the gate.
+
+Usage:
+    python scripts/benchmark.py --output bench.json
+    python scripts/benchmark.py --save-baseline          # record a new baseline
+    python scripts/benchmark.py --threshold 0.1 --only score ga
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from core.result_extractor import BacktestResult, extract_report  # noqa: E402
+from core.scorer import DefaultScorer, results_to_columns  # noqa: E402
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baseline.json"
+HTML_PAGES = ("phase1.html", "phase3_preeditor.html")
+
+
+class SleepRunner:
+    """Stub runner: sleeps *latency* seconds and returns a code-derived result."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    def run_backtest(self, code: str) -> BacktestResult:
+        if self.latency:
+            time.sleep(self.latency)
+        rng = random.Random(code)
+        return BacktestResult(rng.uniform(-50, 150), rng.uniform(0, 60), rng.uniform(-1, 4),
+                              rng.randint(0, 800), rng.random(), rng.uniform(0, 3))
+
+
+def _time(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "repeat": repeat}
+
+
+def _record(results: Dict[str, dict], name: str, timing: Dict[str, float], ops: int) -> None:
+    timing["ops"] = ops
+    timing["ops_per_s"] = ops / timing["median_s"] if timing["median_s"] else float("inf")
+    results[name] = timing
+    print(f"{name:<40} {timing['median_s'] * 1e3:10.3f} ms  {timing['ops_per_s']:14.1f} ops/s")
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def bench_extract(results: Dict[str, dict], args) -> None:
+    for page in HTML_PAGES:
+        path = ROOT / page
+        if not path.exists():
+            continue
+        html = path.read_text(encoding="utf-8", errors="replace")
+        _record(results, f"extract_report[{page}]", _time(lambda: extract_report(html), args.repeat), 1)
+
+
+def bench_score(results: Dict[str, dict], args) -> None:
+    runner = SleepRunner()
+    population = [runner.run_backtest(f"strategy {i}") for i in range(args.score_size)]
+    scorer = DefaultScorer()
+    columns = results_to_columns(population)
+    _record(results, "score_scalar",
+            _time(lambda: [scorer.score(r) for r in population], args.repeat), len(population))
+    _record(results, "score_batch", _time(lambda: scorer.score_batch(columns), args.repeat), len(population))
+
+
+def bench_ga(results: Dict[str, dict], args) -> None:
+    from core.reinforcement import GATrainer
+
+    population = [{"code": f"//@version=5\nstrategy('s{i}')\n", "score": i / args.pop_size}
+                  for i in range(args.pop_size)]
+    trainer = GATrainer(SleepRunner(args.runner_latency), DefaultScorer(), seed=0,
+                        executor=args.executor, max_workers=args.workers)
+    try:
+        name = f"ga_train_epoch[{args.executor},latency={args.runner_latency}]"
+        _record(results, name, _time(lambda: trainer.train_epoch(population), args.repeat), args.pop_size)
+    finally:
+        trainer.close()
+
+
+def bench_db(results: Dict[str, dict], args) -> None:
+    from database import db_handler
+    from database.strategy_db import get_strategies, iter_strategies, save_strategies, save_strategy
+
+    code = "//@version=5\nstrategy('bench')\n" + "x = ta.sma(close, 14)\n" * 40
+    rows = [{"code": code, "score": i / args.db_rows, "meta": {"i": i}} for i in range(args.db_rows)]
+    single = max(1, args.db_rows // 10)
+    previous_url = os.environ.get("DATABASE_URL")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        try:
+            db_handler.init_db()
+            _record(results, "db_save_strategy",
+                    _time(lambda: [save_strategy(1, r["score"], r["code"], r["meta"]) for r in rows[:single]],
+                          args.repeat), single)
+            _record(results, "db_save_strategies",
+                    _time(lambda: save_strategies(rows, generation=2), args.repeat), len(rows))
+            _record(results, "db_get_strategies",
+                    _time(lambda: get_strategies(generation=2), args.repeat), len(rows))
+            _record(results, "db_iter_strategies[id,score]",
+                    _time(lambda: sum(1 for _ in iter_strategies(("id", "score"), generation=2)), args.repeat),
+                    len(rows))
+        finally:
+            engine = db_handler._engine_cache.pop(os.environ["DATABASE_URL"], None)
+            db_handler._session_factories.pop(os.environ["DATABASE_URL"], None)
+            if engine is not None:
+                engine.dispose()
+            if previous_url is None:
+                os.environ.pop("DATABASE_URL", None)
+            else:
+                os.environ["DATABASE_URL"] = previous_url
+
+
+BENCHMARKS = {"extract": bench_extract, "score": bench_score, "ga": bench_ga, "db": bench_db}
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Return the names of benchmarks whose median regressed beyond *threshold*."""
+    regressions = []
+    for name, timing in sorted(current.items()):
+        base = baseline.get(name)
+        if not base or not base.get("median_s"):
+            print(f"{name:<40} no baseline")
+            continue
+        ratio = timing["median_s"] / base["median_s"]
+        flag = "REGRESSION" if ratio > 1.0 + threshold else ""
+        print(f"{name:<40} {ratio:6.2f}x baseline {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run performance benchmarks")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Benchmark groups to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per benchmark")
+    parser.add_argument("--output", type=Path, default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown vs. baseline as a fraction (default 0.25)")
+    parser.add_argument("--score-size", type=int, default=10_000, help="Results scored per run")
+    parser.add_argument("--pop-size", type=int, default=50, help="GA population size")
+    parser.add_argument("--runner-latency", type=float, default=0.005, help="Stub back-test latency (s)")
+    parser.add_argument("--executor", choices=["serial", "thread", "process"], default="thread")
+    parser.add_argument("--workers", type=int, default=None, help="GA evaluation pool size")
+    parser.add_argument("--db-rows", type=int, default=2000, help="Rows written per DB benchmark")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    results: Dict[str, dict] = {}
+    for name in args.only or BENCHMARKS:
+        BENCHMARKS[name](results, args)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 2
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8")).get("results", {})
+    if not any(baseline.get(name, {}).get("median_s") for name in results):
+        print(f"None of the benchmarks run have a baseline in {args.baseline}")
+        return 2
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+from core.backtest_cache import BacktestCache, CachedBacktestRunner, backtest_key, normalize_pine
+from core.result_extractor import BacktestResult
+
+CODE = '//@version=5\nstrategy("t")  // title\n\nx = "a // b"\n'
+
+
+class CountingRunner:
+    def __init__(self):
+        self.calls = 0
+
+    def run_backtest(self, code):
+        self.calls += 1
+        return BacktestResult(1.0, 2.0, 0.5, 10, 0.6, 1.2)
+
+
+def test_normalize_ignores_comments_and_blank_lines():
+    assert normalize_pine(CODE) == 'strategy("t")\nx = "a // b"'
+    assert backtest_key(CODE, "BTC") == backtest_key(CODE + "\n// tweak\n", "BTC")
+    assert backtest_key(CODE, "BTC") != backtest_key(CODE, "ETH")
+
+
+def test_cached_runner_hits_memory_then_disk(tmp_path):
+    path = tmp_path / "cache.db"
+    runner = CountingRunner()
+    cache = BacktestCache(path)
+    cached = CachedBacktestRunner(runner, cache, symbol="BTC", timeframe="1D")
+    first = cached.run_backtest(CODE)
+    assert cached.run_backtest(CODE + "\n") == first
+    assert runner.calls == 1
+    assert (cache.stats.memory_hits, cache.stats.misses) == (1, 1)
+    cache.close()
+
+    reopened = BacktestCache(path)
+    cached = CachedBacktestRunner(runner, reopened, symbol="BTC", timeframe="1D")
+    assert cached.run_backtest(CODE) == first
+    assert reopened.stats.disk_hits == 1 and runner.calls == 1
+
+
+def test_size_and_age_eviction(tmp_path):
+    cache = BacktestCache(tmp_path / "c.db", memory_size=2, max_entries=3)
+    result = BacktestResult(0, 0, 0, 0, 0)
+    for i in range(5):
+        cache.put(f"k{i}", result)
+    assert cache.evict() == 2
+    assert len(cache) == 3
+    assert cache.get("k0") is None
+
+    cache.max_age = -1
+    assert cache.get("k4") is None  # expired in memory
+    cache.evict()
+    assert len(cache) == 0
+
+
+def test_key_covers_the_runners_data_slice(tmp_path):
+    class SliceRunner(CountingRunner):
+        def __init__(self, symbol):
+            super().__init__()
+            self.symbol = symbol
+
+        def cache_slice(self):
+            return self.symbol, "1D", 0, 100
+
+    cache = BacktestCache(tmp_path / "cache.db")
+    btc, eth = CachedBacktestRunner(SliceRunner("BTC"), cache), CachedBacktestRunner(SliceRunner("ETH"), cache)
+    assert btc.key(CODE) == backtest_key(CODE, "BTC", "1D", 0, 100) != eth.key(CODE)
+    assert CachedBacktestRunner(SliceRunner("BTC"), cache, timeframe="4H").key(CODE) == \
+        backtest_key(CODE, "BTC", "4H", 0, 100)
+    btc.run_backtest(CODE)
+    eth.run_backtest(CODE)
+    assert btc.runner.calls == eth.runner.calls == 1
+    cache.close()
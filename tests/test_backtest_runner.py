@@ -1,4 +1,5 @@
 import pytest
+from playwright.sync_api import TimeoutError as PWTimeoutError
 from core.backtest_runner import run_backtest, BacktestResult
 
 def test_run_backtest_with_dummy_runner(monkeypatch):
@@ -31,3 +32,130 @@ def test_run_backtest_with_dummy_runner(monkeypatch):
     assert result.sharpe_ratio == 2.0
     assert result.total_trades == 10
     assert result.win_rate == pytest.approx(0.6)
+
+
+class FakeElement:
+    def __init__(self, text):
+        self.text = text
+
+    def inner_html(self):
+        return self.text
+
+    def inner_text(self):
+        return self.text
+
+
+class FakeKeyboard:
+    def __init__(self, page):
+        self.page = page
+
+    def press(self, keys):
+        pass
+
+    def insert_text(self, text):
+        self.page.script = text
+
+
+class FakePage:
+    REPORT = open("tests/fixtures/sample_tv_report.html", encoding="utf-8").read()
+
+    def __init__(self, pw):
+        self.pw, self.url, self.script, self.report = pw, "", "", ""
+        self.keyboard = FakeKeyboard(self)
+
+    def goto(self, url, timeout=None):
+        self.pw.navigations += 1
+        self.url = "https://www.tradingview.com/accounts/signin/" if self.pw.expired else url
+
+    def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    def click(self, selector, timeout=None):
+        if selector == 'button[title="Add to chart"]' and "error" not in self.script:
+            self.report = self.REPORT.replace("12.34", str(len(self.script)))
+
+    def query_selector(self, selector):
+        if "pine-console" in selector:
+            return FakeElement("line 1: syntax error") if "error" in self.script else None
+        return FakeElement(self.report) if "backtesting" in selector and self.report else None
+
+    def wait_for_timeout(self, ms):
+        pass
+
+    def close(self):
+        self.pw.pages_closed += 1
+
+
+class FakePlaywright:
+    def __init__(self, expired=False):
+        self.expired, self.launches, self.navigations, self.pages_closed = expired, 0, 0, 0
+        self.storage_state = None
+        self.chromium = self
+
+    def start(self):
+        return self
+
+    def launch(self, **kwargs):
+        self.launches += 1
+        return self
+
+    def new_context(self, **kwargs):
+        self.storage_state = kwargs.get("storage_state")
+        return self
+
+    def add_init_script(self, script):
+        pass
+
+    def new_page(self):
+        return FakePage(self)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def test_session_runner_logs_in_once_and_reuses_the_editor(monkeypatch, tmp_path):
+    from core.backtest_runner import SessionBacktestRunner
+    state = tmp_path / "tv_state.json"
+    state.write_text("{}")
+    pw = FakePlaywright()
+    monkeypatch.setattr("core.backtest_runner.sync_playwright", lambda: pw)
+    monkeypatch.setattr("core.backtest_runner._dump", lambda page, tag: None)
+    with SessionBacktestRunner(state, timeout=10) as runner:
+        results = [runner.run_backtest("x" * n) for n in (3, 5, 7)]
+        assert [r.net_profit_pct for r in results] == [3.0, 5.0, 7.0]
+        assert results[0].total_trades == 100
+        assert (pw.launches, pw.navigations, pw.storage_state) == (1, 1, str(state))
+
+        with pytest.raises(ValueError, match="compile error"):
+            runner.run_backtest("error")
+        assert runner.run_backtest("x" * 9).net_profit_pct == 9.0  # fresh page, same browser
+        assert (pw.launches, pw.navigations, pw.pages_closed) == (1, 2, 1)
+
+        runner.timeout = 1  # ms
+        with pytest.raises(PWTimeoutError, match="did not change"):
+            runner.run_backtest("y" * 9)  # report identical to the previous one: never reused
+
+
+def test_session_runner_reports_missing_or_expired_login(monkeypatch, tmp_path):
+    from core.backtest_runner import SessionBacktestRunner
+    monkeypatch.setattr("core.backtest_runner.sync_playwright", lambda: FakePlaywright(expired=True))
+    with pytest.raises(FileNotFoundError, match="gen_tv_state"):
+        SessionBacktestRunner(tmp_path / "missing.json").run_backtest("x")
+    state = tmp_path / "tv_state.json"
+    state.write_text("{}")
+    with pytest.raises(RuntimeError, match="expired"):
+        SessionBacktestRunner(state).run_backtest("x")
+
+
+@pytest.mark.parametrize("options", [{"pipelined": True}, {"executor": "thread"}])
+def test_controller_refuses_tv_session_on_threads(monkeypatch, options):
+    from core import controller
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    with pytest.raises(ValueError, match="threads"):
+        controller.run_pipeline("ga", 1, 2, False, tv_session="tv_state.json", checkpoint_dir=None, **options)
@@ -0,0 +1,30 @@
+import importlib.util
+import json
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parents[1] / "scripts" / "benchmark.py"
+spec = importlib.util.spec_from_file_location("benchmark", SCRIPT)
+benchmark = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(benchmark)
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    current = {"a": {"median_s": 1.3}, "b": {"median_s": 1.1}, "new": {"median_s": 9.0}}
+    baseline = {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}}
+    assert benchmark.compare(current, baseline, threshold=0.2) == ["a"]
+
+
+def test_main_writes_json_and_fails_on_regression(tmp_path):
+    out, base = tmp_path / "out.json", tmp_path / "base.json"
+    args = ["--only", "score", "--repeat", "1", "--score-size", "100", "--baseline", str(base)]
+    assert benchmark.main(args) == 2  # no baseline: the gate must not pass
+    assert benchmark.main(args + ["--save-baseline"]) == 0
+    assert benchmark.main(["--only", "extract", "--repeat", "1", "--baseline", str(base)]) == 2
+    report = json.loads(base.read_text())
+    assert {"score_scalar", "score_batch"} <= set(report["results"])
+
+    for timing in report["results"].values():
+        timing["median_s"] /= 1000  # pretend the baseline was much faster
+    base.write_text(json.dumps(report))
+    assert benchmark.main(args + ["--output", str(out)]) == 1
+    assert json.loads(out.read_text())["results"]["score_batch"]["ops"] == 100
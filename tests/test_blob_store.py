@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from core.blob_store import BlobStore
+
+
+def test_memory_layer_decodes_once_and_tables_share_a_file(tmp_path):
+    decoded = []
+
+    def decode(text):
+        decoded.append(text)
+        return json.loads(text)
+
+    path = tmp_path / "cache.db"
+    a = BlobStore(path, "a", memory_size=1, encode=json.dumps, decode=decode)
+    b = BlobStore(path, "b")
+    a.put("k", {"x": 1})
+    b.put("k", "other")
+    a.close()
+
+    a = BlobStore(path, "a", memory_size=1, encode=json.dumps, decode=decode)
+    assert a.get("k") == a.get("k") == {"x": 1} and b.get("k") == "other"
+    assert len(decoded) == 1
+    assert (a.stats.disk_hits, a.stats.memory_hits, a.stats.misses) == (1, 1, 0)
+
+
+def test_put_reports_periodic_evictions(tmp_path):
+    store = BlobStore(tmp_path / "c.db", "c", max_entries=2, evict_every=3)
+    assert [store.put(f"k{i}", "v") for i in range(3)] == [0, 0, 1]
+    assert len(store) == 2 and store.get("k0") is None and store.stats.evictions == 1
+    with pytest.raises(ValueError):
+        BlobStore(None, "bad name")
@@ -0,0 +1,106 @@
+import pytest
+
+from core import controller
+from core.checkpoint import CheckpointStore, latest_run
+from core.reinforcement import GATrainer
+from core.result_extractor import BacktestResult
+from core.scorer import BaseScorer
+
+POP = [{"code": f"code {i}", "score": i / 10, "meta": {"i": i}} for i in range(10)]
+
+
+class LenRunner:
+    def run_backtest(self, code):
+        return BacktestResult(float(len(code)), 0.0, 0.0, 1, 0.5)
+
+
+class LenScorer(BaseScorer):
+    def score(self, result):
+        return result.net_profit_pct
+
+
+def test_save_load_prune_and_skip_corrupt(tmp_path):
+    store = CheckpointStore(tmp_path, keep=2, run_id="a")
+    for gen in range(4):
+        store.save(gen, POP, {"x": gen}, mode="ga", config={"pop_size": 10})
+    assert store.generations() == [2, 3]
+    assert not list(store.directory.glob("*.tmp"))
+    latest = store.load_latest()
+    assert (latest.generation, latest.population, latest.trainer_state) == (3, POP, {"x": 3})
+    assert (latest.run_id, latest.config) == ("a", {"pop_size": 10})
+
+    (store.directory / "generation_00003.json").write_text('{"generation": 3, "popul')
+    assert store.load_latest().generation == 2
+
+
+def test_runs_do_not_prune_each_other(tmp_path):
+    old = CheckpointStore(tmp_path, keep=2, run_id="old")
+    for gen in range(8, 11):
+        old.save(gen, POP)
+    new = CheckpointStore(tmp_path, keep=2)
+    new.save(1, POP)
+    assert old.generations() == [9, 10]
+    assert new.generations() == [1]
+    assert latest_run(tmp_path) == new.run_id
+    assert CheckpointStore(tmp_path, run_id=new.run_id).load_latest().generation == 1
+
+
+def test_trainer_state_round_trip_reproduces_breeding():
+    a = GATrainer(LenRunner(), LenScorer(), seed=7)
+    a.mutation_rate = 0.9
+    a.breed(POP, 5)
+    state = a.get_state()
+    b = GATrainer(LenRunner(), LenScorer(), seed=123)
+    b.set_state(state)
+    assert b.mutation_rate == 0.9
+    assert b.breed(POP, 10) == a.breed(POP, 10)
+
+
+def test_run_pipeline_resumes_from_last_generation(monkeypatch, tmp_path):
+    from database.db_handler import get_engine
+    from database.models import Base
+    from database.strategy_db import get_strategies
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    Base.metadata.drop_all(bind=get_engine())
+    monkeypatch.setattr(controller, "BacktestRunner", LenRunner)
+    monkeypatch.setattr(controller, "scorer_factory", LenScorer)
+    calls = []
+    monkeypatch.setattr(controller, "create_initial_population",
+                        lambda *a: calls.append(a) or [dict(g) for g in POP])
+    monkeypatch.setattr("core.reinforcement.scorer_factory", LenScorer)
+
+    def crash_in_generation_3(population, generation, run_id):
+        save_strategies(population, generation=generation, run_id=run_id)
+        if generation == 3:
+            raise KeyboardInterrupt  # after the rows, before the checkpoint
+
+    ckpt = str(tmp_path / "ckpt")
+    try:
+        save_strategies = controller.save_strategies
+        monkeypatch.setattr(controller, "save_strategies", crash_in_generation_3)
+        with pytest.raises(KeyboardInterrupt):
+            controller.run_pipeline("ga", 4, len(POP), False, seed=1, checkpoint_dir=ckpt)
+        monkeypatch.setattr(controller, "save_strategies", save_strategies)
+        with pytest.raises(ValueError, match="pop_size"):
+            controller.run_pipeline("ga", 4, 5, False, seed=1, checkpoint_dir=ckpt, resume=True)
+
+        controller.run_pipeline("ga", 4, len(POP), False, seed=1, checkpoint_dir=ckpt, resume=True)
+        assert len(calls) == 1
+        store = CheckpointStore(ckpt, run_id=latest_run(ckpt))
+        assert store.generations() == [2, 3, 4]
+        assert sorted({s.generation for s in get_strategies()}) == [1, 2, 3, 4]
+
+        assert len(get_strategies(generation=3)) == len(POP)
+
+        # the pipelined generation streams its rows; redoing it replaces them
+        (store.directory / "generation_00004.json").unlink()
+        controller.run_pipeline("ga", 4, len(POP), False, seed=1, checkpoint_dir=ckpt, resume=True,
+                                pipelined=True)
+        assert len(get_strategies(generation=4)) == len(POP)
+
+        # a new run in the same directory leaves the old one alone
+        controller.run_pipeline("ga", 1, len(POP), False, seed=1, checkpoint_dir=ckpt)
+        assert store.generations() == [2, 3, 4]
+        assert latest_run(ckpt) != store.run_id
+    finally:
+        Base.metadata.drop_all(bind=get_engine())  # the in-memory engine is shared
@@ -27,3 +27,14 @@ def test_get_session_returns_session():
     sess.commit()
     assert sess.query(Strategy).count() == 1
     sess.close()
+
+def test_sqlite_file_uses_wal_and_cached_sessionmaker(monkeypatch, tmp_path):
+    from sqlalchemy import text
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'wal.db'}")
+    init_db()
+    with get_engine().connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    s1, s2 = get_session(), get_session()
+    assert s1 is not s2 and s1.bind is s2.bind
+    s1.close(); s2.close()
@@ -0,0 +1,70 @@
+import time
+from core.evaluator import PopulationEvaluator
+from core.reinforcement import GATrainer
+from core.result_extractor import BacktestResult
+from core.scorer import BaseScorer
+
+
+class LengthRunner:
+    """Deterministic runner: result depends only on the code."""
+
+    def run_backtest(self, code):
+        if "boom" in code:
+            raise RuntimeError("compile error")
+        if "slow" in code:
+            time.sleep(2)
+        return BacktestResult(float(len(code)), 0.0, 0.0, len(code), 0.5)
+
+
+class ProfitScorer(BaseScorer):
+    def score(self, result):
+        return result.net_profit_pct / 100.0
+
+
+def test_failures_are_isolated_and_order_is_kept():
+    codes = ["aa", "boom", "aaaa", "aa"]
+    for executor in ("serial", "thread", "process"):
+        with PopulationEvaluator(LengthRunner(), ProfitScorer(), executor=executor, max_workers=2) as ev:
+            out = ev.evaluate(codes)
+        assert [e.score for e in out] == [0.02, 0.0, 0.04, 0.02]
+        assert "RuntimeError" in out[1].error
+        assert out[0].meta["metrics"]["total_trades"] == 2
+
+
+def test_task_timeout_scores_zero():
+    with PopulationEvaluator(LengthRunner(), ProfitScorer(), executor="thread",
+                             max_workers=2, task_timeout=0.2) as ev:
+        out = ev.evaluate(["slow", "ok"])
+    assert out[0].score == 0.0 and "timeout" in out[0].error
+    assert out[1].score == 0.02
+
+
+def test_serial_executor_warns_that_it_ignores_task_timeout(caplog):
+    with PopulationEvaluator(LengthRunner(), ProfitScorer(), task_timeout=0.2) as ev:
+        assert ev.task_timeout is None
+    assert "ignored by the serial executor" in caplog.text
+
+
+def test_ga_generation_is_deterministic_across_worker_counts():
+    pop = [{"code": "x" * (i + 2), "score": i / 10, "meta": {}} for i in range(10)]
+    runs = []
+    for executor, workers in (("serial", 1), ("thread", 4), ("process", 3)):
+        trainer = GATrainer(runner=LengthRunner(), scorer=ProfitScorer(), seed=42,
+                            executor=executor, max_workers=workers)
+        runs.append([(g["code"], g["score"]) for g in trainer.train_epoch(pop)])
+        trainer.close()
+    assert runs[0] == runs[1] == runs[2]
+
+
+def test_hung_tasks_do_not_time_out_tasks_queued_behind_them():
+    codes = ["slow1", "slow2", "aa", "aaaa"]
+    for executor in ("thread", "process"):
+        start = time.monotonic()
+        with PopulationEvaluator(LengthRunner(), ProfitScorer(), executor=executor,
+                                 max_workers=2, task_timeout=0.5) as ev:
+            out = ev.evaluate(codes)
+            assert [e.score for e in out] == [0.0, 0.0, 0.02, 0.04]
+            assert all("timeout" in e.error for e in out[:2])
+            assert ev.evaluate(["aaa"])[0].score == 0.03  # fresh pool after the hung one
+        if executor == "process":
+            assert time.monotonic() - start < 1.8  # hung workers were killed, not awaited
@@ -0,0 +1,63 @@
+import random
+from core.genetic_ops import crossover, is_valid, mutate
+from core.pine_compiler import compile_pine, parse
+from core.reinforcement import GATrainer
+from core.scorer import BaseScorer
+
+BB = """//@version=5
+strategy("BB")
+length = input.int(20, "BB Length", minval=5, maxval=22)
+mult = input.float(2.0, "BB Std Dev")
+[middle, upper, lower] = ta.bb(close, length, mult)
+if close < lower
+    strategy.entry("L", strategy.long)
+if close > upper
+    strategy.close("L")
+"""
+
+RSI = """//@version=5
+strategy("RSI")
+r = ta.rsi(close, 14)
+trend = ta.sma(close, 50)
+if r < 30 and close > trend
+    strategy.entry("L", strategy.long)
+else if r > 70
+    strategy.close("L")
+"""
+
+
+class NullRunner:
+    def run_backtest(self, code):
+        return None
+
+
+class ZeroScorer(BaseScorer):
+    def score(self, result):
+        return 0.0
+
+
+def test_crossover_children_compile_and_carry_dependencies():
+    rng = random.Random(0)
+    children = {crossover(BB, RSI, rng) for _ in range(30)}
+    assert None not in children and len(children) > 3
+    assert all(is_valid(c) for c in children)
+    assert any("ta.rsi" in c and "ta.bb" in c for c in children)
+    assert crossover("not pine", RSI, rng) is None
+
+
+def test_mutation_stays_in_bounds_and_changes_code():
+    rng = random.Random(1)
+    for _ in range(50):
+        child = mutate(BB, rng)
+        assert child is not None and parse(child) != parse(BB)
+        length = compile_pine(child).inputs["length"].default
+        assert 5 <= length <= 22 and isinstance(length, int)
+
+
+def test_breed_avoids_duplicates():
+    trainer = GATrainer(NullRunner(), ZeroScorer(), seed=3)
+    trainer.crossover_rate = trainer.mutation_rate = 0.0
+    parents = [{"code": BB, "score": 1.0}, {"code": RSI, "score": 0.5}]
+    children = trainer.breed(parents, 12)
+    assert len(set(children)) == 12
+    assert all(is_valid(c) for c in children)
@@ -0,0 +1,57 @@
+import gc
+import numpy as np
+from core.indicator_cache import IndicatorCache, slice_token
+from core.local_backtest import Bars
+from core.pine_compiler import compile_pine
+
+EMA_INPUT = """//@version=5
+strategy("EMA input")
+len = input.int(20)
+if ta.crossover(close, ta.ema(close, len))
+    strategy.entry("L", strategy.long)
+"""
+
+EMA_RSI = """//@version=5
+strategy("EMA RSI")
+e = ta.ema(close, 20)
+if close > e and ta.rsi(close, 14) < 30
+    strategy.entry("L", strategy.long)
+"""
+
+
+def _bars(n=500, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    return Bars(np.arange(n) * 60, close, close * 1.01, close * 0.99, close, np.ones(n))
+
+
+def test_indicators_shared_across_strategies_and_inputs():
+    bars, cache = _bars(), IndicatorCache()
+    for source in (EMA_INPUT, EMA_RSI):
+        cached = compile_pine(source).evaluate(bars, cache=cache)
+        plain = compile_pine(source).evaluate(bars)
+        np.testing.assert_array_equal(cached.long_entry, plain.long_entry)
+    # ta.ema(close, 20) is computed once; the input resolves to the same key.
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 3  # ema, crossover and rsi
+
+    compile_pine(EMA_INPUT).evaluate(bars, {"len": 30}, cache=cache)
+    assert cache.stats.misses == 5
+    compile_pine(EMA_INPUT).evaluate(bars.slice(0, 200 * 60), cache=cache)
+    assert cache.stats.misses == 7  # a different data slice
+
+
+def test_memory_bound_and_dead_slices():
+    bars = _bars()
+    cache = IndicatorCache(max_bytes=bars.close.nbytes * 3 // 2)
+    compile_pine(EMA_RSI).evaluate(bars, cache=cache)
+    assert cache.stats.bytes <= cache.max_bytes and cache.stats.evictions >= 1
+
+    cache = IndicatorCache()
+    token = slice_token(bars)
+    value = cache.get_or_compute(token, "x", lambda: np.ones(3))
+    assert not value.flags.writeable
+    del bars, value
+    gc.collect()
+    assert cache.get_or_compute(token, "x", lambda: np.zeros(3))[0] == 0.0
+    assert cache.stats.hits == 0
@@ -0,0 +1,71 @@
+import json
+import pytest
+from core import instrumentation
+from core.evaluator import PopulationEvaluator
+from core.result_extractor import BacktestResult
+from core.scorer import BaseScorer
+
+
+class FlakyRunner:
+    def run_backtest(self, code):
+        if code == "bad":
+            raise RuntimeError("no")
+        return BacktestResult(1.0, 0.0, 0.0, 1, 0.5)
+
+
+class ConstScorer(BaseScorer):
+    def score(self, result):
+        return 0.5
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    reg = instrumentation.get()
+    reg.reset()
+    yield reg
+    instrumentation.disable()
+    reg.reset()
+
+
+def test_disabled_records_nothing(registry):
+    with instrumentation.span("x"):
+        instrumentation.incr("rows", 3)
+    assert registry.snapshot()["generations"] == {}
+
+
+def test_spans_and_counters_per_generation(registry, tmp_path):
+    instrumentation.enable()
+    for gen in (1, 2):
+        instrumentation.set_generation(gen)
+        with instrumentation.span("stage"):
+            pass
+        instrumentation.incr("rows", gen * 10)
+    snap = registry.snapshot()
+    assert snap["generations"]["2"]["counters"] == {"rows": 20}
+    assert snap["totals"]["spans"]["stage"]["count"] == 2
+    assert snap["totals"]["counters"]["rows"] == 30
+
+    registry.write_json(tmp_path / "m.json")
+    assert json.loads((tmp_path / "m.json").read_text()) == snap
+    prom = registry.to_prometheus()
+    assert "# TYPE strategist_stage_seconds_total counter" in prom
+    assert 'strategist_events_total{name="rows",generation="1"} 10' in prom
+
+
+def test_evaluator_reports_stages_and_failures(registry):
+    instrumentation.enable()
+    with PopulationEvaluator(FlakyRunner(), ConstScorer(), executor="process", max_workers=2) as ev:
+        ev.evaluate(["ok", "bad", "ok"])
+    snap = registry.snapshot()["totals"]
+    assert snap["counters"] == {"evaluation.backtests": 2, "evaluation.failures": 1,
+                                "evaluation.requested": 3}
+    assert snap["spans"]["backtest"]["count"] == 2
+    assert snap["spans"]["score"]["count"] == 1
+
+
+def test_profile_dumps_cprofile_and_tracemalloc(tmp_path):
+    with instrumentation.profile(tmp_path / "gen_1"):
+        sum(i * i for i in range(1000))
+    assert (tmp_path / "gen_1.prof").exists()
+    assert "cumulative" in (tmp_path / "gen_1.txt").read_text()
+    assert "peak traced memory" in (tmp_path / "gen_1_memory.txt").read_text()
@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from core import instrumentation
+from core.islands import (
+    FileExchange,
+    IslandConfig,
+    IslandModel,
+    SQLiteExchange,
+    _integrate,
+    destinations,
+    exchange_from_url,
+)
+from core.pine_validator import PineValidator
+from tests.test_genetic_ops import BB, RSI
+
+
+class EchoRunner:
+    def run_backtest(self, code):
+        return code
+
+
+class LenScorer:
+    def score(self, result):
+        return float(len(result))
+
+
+def test_topologies():
+    rng = random.Random(0)
+    assert destinations("ring", 3, 4, rng) == [0]
+    assert destinations("bidirectional", 0, 4, rng) == [1, 3]
+    assert destinations("full", 1, 3, rng) == [0, 2]
+    assert destinations("random", 2, 4, rng)[0] in (0, 1, 3)
+    assert destinations({0: [1, 0]}, 0, 2, rng) == [1]
+    assert destinations("ring", 0, 1, rng) == []
+    with pytest.raises(ValueError):
+        destinations("star", 0, 4, rng)
+    rates = [c.mutation_rate for c in IslandConfig.spread(4, seed=7)]
+    assert rates == sorted(rates) and len(set(rates)) == 4
+
+
+@pytest.mark.parametrize("kind", ["file", "sqlite"])
+def test_exchange_round_trip(tmp_path, kind):
+    url = f"sqlite:///{tmp_path / 'migrants.db'}" if kind == "sqlite" else str(tmp_path / "migrants")
+    sender, receiver = exchange_from_url(url), exchange_from_url(url)  # as on two nodes
+    assert isinstance(sender, SQLiteExchange if kind == "sqlite" else FileExchange)
+    sender.send(0, 1, 5, [{"code": BB, "score": 2.0, "meta": {}}])
+    sender.send(2, 1, 5, [{"code": RSI, "score": 1.0, "meta": {}}])
+    sender.send(1, 0, 5, [{"code": RSI, "score": 1.0, "meta": {}}])
+    assert [g["code"] for g in receiver.receive(1)] == [BB, RSI]
+    assert receiver.receive(1) == []
+    assert len(receiver.receive(0)) == 1
+
+    old, new = exchange_from_url(url, "run-1"), exchange_from_url(url, "run-2")
+    old.send(0, 1, 5, [{"code": BB, "score": 2.0, "meta": {}}])  # left behind by a crashed run
+    new.send(0, 1, 1, [{"code": RSI, "score": 1.0, "meta": {}}])
+    assert [g["code"] for g in new.receive(1)] == [RSI]
+    assert [g["code"] for g in old.receive(1)] == [BB]
+
+
+def test_integrate_replaces_worst_with_new_better_immigrants():
+    population = [{"code": BB, "score": 3.0}, {"code": "a", "score": 1.0}, {"code": "b", "score": 0.0}]
+    immigrants = [{"code": BB + "\n", "score": 9.0}, {"code": RSI, "score": 2.0}, {"code": "c", "score": -1.0}]
+    assert _integrate(population, immigrants) == 1
+    assert [g["score"] for g in population] == [3.0, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_island_model_migrates_best_strategies(processes):
+    population = [{"code": code, "score": 0.0, "meta": {}} for code in (BB, RSI) * 10]
+    model = IslandModel(EchoRunner(), LenScorer(), IslandConfig.spread(2, seed=0), topology="ring",
+                        migration_interval=1, n_migrants=2, processes=processes)
+    islands = model.run_islands(population, generations=3)
+    assert [r.index for r in islands] == [0, 1]
+    assert all(r.sent == 6 and len(r.best_scores) == 3 for r in islands)
+    assert sum(r.received for r in islands) > 0
+    migrants = [g for r in islands for g in r.population if g["meta"].get("origin_island") not in (None, r.index)]
+    assert migrants and all(g["meta"]["island"] in (0, 1) for r in islands for g in r.population)
+    with pytest.raises(ValueError):
+        model.split(population[:6])
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_island_counters_reach_the_parent(processes):
+    registry = instrumentation.get()
+    registry.reset()
+    instrumentation.enable()
+    validator = PineValidator()
+    population = [{"code": code, "score": 0.0, "meta": {}} for code in (BB, RSI) * 10]
+    model = IslandModel(EchoRunner(), LenScorer(), IslandConfig.spread(2, seed=0), migration_interval=1,
+                        processes=processes, trainer_options={"validator": validator})
+    try:
+        islands = model.run_islands(population, generations=3)
+    finally:
+        instrumentation.disable()
+    totals = registry.snapshot()["totals"]
+    registry.reset()
+    assert totals["spans"]["island.generation"]["count"] == 6
+    assert totals["counters"].get("island.migrants_received", 0) == sum(r.received for r in islands)
+    assert validator.stats.checked == sum(r.validator_stats["checked"] for r in islands) > 0
@@ -0,0 +1,121 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from core.evaluator import PopulationEvaluator
+from core.job_worker import JobWorker
+from core.result_extractor import BacktestResult
+from database import job_queue
+from database.db_handler import get_session, init_db
+from database.models import Job
+
+
+class MetricRunner:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def run_backtest(self, code):
+        if "boom" in code:
+            raise RuntimeError("bad strategy")
+        time.sleep(self.delay)
+        return BacktestResult(float(len(code)), 1.0, 0.5, 10, 50.0)
+
+
+class ProfitScorer:
+    def score(self, result):
+        return result.net_profit_pct
+
+
+@pytest.fixture
+def queue_db(monkeypatch, tmp_path):
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    init_db()
+    return url
+
+
+def test_claim_heartbeat_complete_and_lease_expiry(queue_db):
+    ids = job_queue.enqueue(["a", "bb", "ccc"], generation=1, max_attempts=2)
+    first = job_queue.claim("w1", limit=2, lease=60)
+    assert [job.id for job in first] == ids[:2] and first[0].attempts == 1
+    assert [job.id for job in job_queue.claim("w2", limit=5, lease=0.05)] == ids[2:]
+    assert job_queue.claim("w3") == []
+    assert job_queue.heartbeat(first[0].token) == 2
+    assert job_queue.complete(ids[0], first[0].token, 1.5, {"net_profit_pct": 1.5})
+    assert job_queue.fail(ids[1], first[0].token, "runner crashed")  # retried: 1 of 2 attempts used
+
+    time.sleep(0.1)  # w2's lease on the third job expires
+    retried = job_queue.claim("w3", limit=5, lease=0.05)
+    assert sorted(job.id for job in retried) == ids[1:] and all(job.attempts == 2 for job in retried)
+    assert not job_queue.complete(ids[2], "stale-token", 9.0)
+    time.sleep(0.1)
+    assert job_queue.claim("w4") == []  # both exhausted their attempts
+    outcomes = job_queue.wait_for(ids, poll_interval=0.01, timeout=1)
+    assert [outcomes[i].status for i in ids] == ["done", "failed", "failed"]
+    assert outcomes[ids[0]].score == 1.5 and outcomes[ids[0]].result == {"net_profit_pct": 1.5}
+    assert job_queue.count_jobs() == {"done": 1, "failed": 2}
+
+
+def _work(url, n):
+    import os
+    os.environ["DATABASE_URL"] = url
+    JobWorker(MetricRunner(delay=0.05), ProfitScorer(), worker_id=f"w{n}", poll_interval=0.01,
+              batch_size=2).run(idle_timeout=1.0)
+
+
+def test_several_worker_processes_share_one_sqlite_file(queue_db):
+    codes = [f"strategy {i}" + "x" * i for i in range(40)]
+    ids = job_queue.enqueue(codes)
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_work, args=(queue_db, n)) for n in range(3)]
+    for worker in workers:
+        worker.start()
+    outcomes = job_queue.wait_for(ids, poll_interval=0.05, timeout=60)
+    for worker in workers:
+        worker.join(timeout=30)
+    assert [outcomes[i].score for i in ids] == [float(len(c)) for c in codes]  # each evaluated once
+    assert all(outcomes[i].status == "done" for i in ids)
+    session = get_session()
+    assert len({worker for (worker,) in session.query(Job.worker)}) > 1
+    session.close()
+
+
+def test_queue_executor_evaluates_through_workers(queue_db):
+    worker = JobWorker(MetricRunner(), ProfitScorer(), poll_interval=0.01)
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    try:
+        evaluator = PopulationEvaluator(MetricRunner(), ProfitScorer(), executor="queue")
+        evaluator.poll_interval = 0.01
+        evaluations = evaluator.evaluate(["abc", "boom", "abc", "abcdef"])
+    finally:
+        worker.stop()
+        thread.join()
+    assert [ev.score for ev in evaluations] == [3.0, 0.0, 3.0, 6.0]
+    assert evaluations[0].result == BacktestResult(3.0, 1.0, 0.5, 10, 50.0)
+    assert "bad strategy" in evaluations[1].error
+    assert worker.processed == 3  # the duplicate was never enqueued
+
+
+def test_queue_executor_without_workers_times_out(queue_db):
+    evaluator = PopulationEvaluator(MetricRunner(), ProfitScorer(), executor="queue", task_timeout=0.05)
+    evaluator.poll_interval = 0.01
+    evaluations = evaluator.evaluate(["abc", "abcdef"])
+    assert [ev.score for ev in evaluations] == [0.0, 0.0]
+    assert all("not finished within 0.1s" in ev.error for ev in evaluations)
+    assert job_queue.count_jobs() == {"failed": 2}
+    assert job_queue.claim("late") == []
+
+
+def test_purge_deletes_only_old_finished_jobs(queue_db):
+    ids = job_queue.enqueue(["a", "bb", "ccc"])
+    job = job_queue.claim("w1")[0]
+    job_queue.complete(job.id, job.token, 1.0)
+    job_queue.cancel(ids[1:2])
+    assert job_queue.purge(older_than=60) == 0
+    time.sleep(0.05)
+    assert job_queue.purge(older_than=0.01) == 2
+    assert job_queue.count_jobs() == {"pending": 1}
+    assert [j.id for j in job_queue.claim("w2")] == ids[2:]
@@ -0,0 +1,22 @@
+from core.llm_cache import LLMResponseCache, llm_cache_key
+
+
+def test_key_covers_all_request_fields():
+    base = llm_cache_key("m", "sys", "p", 0.7, 512)
+    assert base == llm_cache_key("m", "sys", "p", 0.7, 512)
+    assert base != llm_cache_key("m", "sys", "p", 0.2, 512)
+    assert base != llm_cache_key("m", "sys", "p", 0.7, 512, sample=1)
+    assert base != llm_cache_key("m", None, "p", 0.7, 512)
+
+
+def test_ttl_size_eviction_and_token_counters(tmp_path):
+    cache = LLMResponseCache(tmp_path / "c.db", max_entries=2)
+    for i in range(3):
+        cache.put(f"k{i}", f"code {i}", tokens=100)
+    assert cache.get("k2") == "code 2"
+    assert cache.get("missing") is None
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.saved_tokens) == (1, 1, 100)
+    assert cache.evict() == 1 and len(cache) == 2
+    cache.ttl = -1
+    assert cache.get("k2") is None
+    cache.close()
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from core.local_backtest import (
+    Bars,
+    LocalBacktestRunner,
+    Signals,
+    backtest,
+    compute_metrics,
+    load_bars,
+    positions_from_signals,
+    strategy_returns,
+)
+from core.result_extractor import BacktestResult
+
+
+def _bars(close):
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    return Bars(np.arange(n) * 86400, close, close, close, close, np.ones(n))
+
+
+def test_positions_from_signals_reverse_and_exit():
+    le = np.array([0, 1, 0, 0, 0, 0, 1, 0], bool)
+    se = np.array([0, 0, 0, 1, 0, 0, 0, 0], bool)
+    lx = np.array([0, 0, 0, 0, 0, 0, 0, 1], bool)
+    sx = np.array([0, 0, 0, 0, 1, 0, 0, 0], bool)
+    pos = positions_from_signals(le, se, lx, sx)
+    assert pos.tolist() == [0, 1, 1, -1, 0, 0, 1, 0]
+
+
+def test_backtest_metrics_single_long_trade():
+    bars = _bars([100, 100, 110, 121, 121])
+    sig = Signals(
+        long_entry=np.array([0, 1, 0, 0, 0], bool),
+        short_entry=np.zeros(5, bool),
+        long_exit=np.array([0, 0, 0, 1, 0], bool),
+    )
+    (res,) = backtest(bars, sig)
+    assert isinstance(res, BacktestResult)
+    assert res.net_profit_pct == pytest.approx(21.0)
+    assert res.max_drawdown_pct == pytest.approx(0.0)
+    assert res.total_trades == 1
+    assert res.win_rate == pytest.approx(1.0)
+
+
+def test_batched_rows_match_single_runs():
+    rng = np.random.default_rng(0)
+    bars = _bars(100 * np.cumprod(1 + rng.normal(0, 0.01, 500)))
+    le = rng.random((4, 500)) < 0.05
+    se = rng.random((4, 500)) < 0.05
+    batch = backtest(bars, Signals(le, se))
+    for i in range(4):
+        (single,) = backtest(bars, Signals(le[i], se[i]))
+        assert single == batch[i]
+
+
+def test_event_engine_matches_dense_reference():
+    rng = np.random.default_rng(1)
+    bars = _bars(100 * np.cumprod(1 + rng.normal(0, 0.02, 400)))
+    le, se, lx, sx = (rng.random((6, 400)) < 0.03 for _ in range(4))
+    results = backtest(bars, Signals(le, se, lx, sx), commission_pct=0.1)
+    position = positions_from_signals(le, se, lx, sx)
+    reference = compute_metrics(strategy_returns(bars.close, position, 0.1), position)
+    for got, want in zip(results, reference):
+        assert got.total_trades == want.total_trades
+        for field in ("net_profit_pct", "max_drawdown_pct", "sharpe_ratio", "win_rate", "profit_factor"):
+            assert getattr(got, field) == pytest.approx(getattr(want, field), rel=1e-9, abs=1e-9)
+
+
+def test_runner_and_csv_loader(tmp_path):
+    path = tmp_path / "bars.csv"
+    path.write_text("date,open,high,low,close,volume\n"
+                    "2024-01-02,1,1,1,11,5\n2024-01-01,1,1,1,10,5\n2024-01-03,1,1,1,12,5\n")
+    bars = load_bars(path)
+    assert bars.close.tolist() == [10, 11, 12]
+    assert len(bars.slice(start=int(bars.time[1]))) == 2
+
+    runner = LocalBacktestRunner(bars, lambda code, b: Signals(np.array([1, 0, 0], bool), np.zeros(3, bool)))
+    res = runner.run_backtest("//@version=5")
+    assert res.net_profit_pct == pytest.approx(20.0)
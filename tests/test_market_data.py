@@ -0,0 +1,61 @@
+import pickle
+import numpy as np
+import pytest
+from core.evaluator import PopulationEvaluator
+from core.local_backtest import Bars, Signals
+from core.market_data import MarketDataRunner, MarketDataStore, to_epoch
+from core.scorer import BaseScorer
+
+DAY = 86400
+
+
+def _bars(n, start=0, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    return Bars(start + np.arange(n) * DAY, close, close * 1.01, close * 0.99, close, np.ones(n))
+
+
+def every_kth_bar(code, bars):
+    """Signal function: enter long every k-th bar, where k is the code length."""
+    entries = np.zeros(len(bars), dtype=bool)
+    entries[::len(code)] = True
+    return Signals(entries, np.zeros(len(bars), dtype=bool), np.roll(entries, 1))
+
+
+class TradesScorer(BaseScorer):
+    def score(self, result):
+        return float(result.total_trades)
+
+
+def test_write_slice_and_append(tmp_path):
+    store = MarketDataStore(tmp_path)
+    bars = _bars(100)
+    assert store.write("BINANCE:BTCUSDT", "1D", bars) == 100
+    assert store.keys() == [("BINANCE:BTCUSDT", "1D")]
+
+    view = store.bars("BINANCE:BTCUSDT", "1D", start=10 * DAY, end="1970-01-21")
+    np.testing.assert_array_equal(view.close, bars.close[10:20])
+    assert isinstance(view.close.base, np.memmap) or isinstance(view.close, np.memmap)
+    assert not view.close.flags.writeable
+
+    store.write("BINANCE:BTCUSDT", "1D", _bars(5, start=100 * DAY, seed=1), append=True)
+    reopened = MarketDataStore(tmp_path)
+    assert reopened.info("BINANCE:BTCUSDT", "1D")["rows"] == 105
+    with pytest.raises(ValueError):
+        reopened.write("BINANCE:BTCUSDT", "1D", _bars(5), append=True)
+    with pytest.raises(KeyError):
+        reopened.bars("ETH", "1D")
+
+
+def test_runner_pickles_without_bars_and_runs_in_processes(tmp_path):
+    store = MarketDataStore(tmp_path)
+    for i, symbol in enumerate(("AAA", "BBB")):
+        store.write(symbol, "1D", _bars(20_000, seed=i))
+    runner = MarketDataRunner(store, "1D", ["AAA", "BBB"], signal_fn=every_kth_bar)
+    runner.run_backtest("abcd")  # maps and caches the bars in this process
+    assert len(pickle.dumps(runner)) < 2_000
+
+    with PopulationEvaluator(runner, TradesScorer(), executor="process", max_workers=2) as ev:
+        scores = [e.score for e in ev.evaluate(["abcd", "abcdefgh"])]
+    assert scores == [10_000.0, 5_000.0]
+    assert to_epoch("1970-01-02") == DAY
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from core.local_backtest import Bars, LocalBacktestRunner
+from core.param_sweep import Range, grid, latin_hypercube, random_sample, sweep
+
+STRATEGY = """//@version=5
+strategy("Sweep")
+length = input.int(20, "BB Length")
+mult = input.float(2.0, "BB Std Dev")
+src = input.source(close)
+fast = input.int(5)
+[middle, upper, lower] = ta.bb(src, length, mult)
+trend = ta.ema(src, fast)
+if close < lower and trend > middle
+    strategy.entry("L", strategy.long)
+if ta.crossover(close, upper)
+    strategy.close("L")
+"""
+
+
+def _runner(n=600, seed=4):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    return LocalBacktestRunner(Bars(np.arange(n) * 60, close, close * 1.01, close * 0.99, close, np.ones(n)),
+                               commission_pct=0.05)
+
+
+def test_batched_sweep_matches_single_backtests():
+    runner = _runner()
+    space = {"length": Range(10, 30, 5), "mult": [1.5, 2.5], "src": ["close", "hl2"], "fast": Range(3, 9, 3)}
+    results = sweep(runner, STRATEGY, space, batch_size=7)
+    assert len(results) == 5 * 2 * 2 * 3
+    from core.pine_compiler import compile_pine
+    plan = compile_pine(STRATEGY)
+    for r in results[::5]:
+        single = runner.run_signals(plan.evaluate(runner.bars, r.inputs))[0]
+        assert r.result == single
+
+
+def test_samplers_cover_space():
+    space = {"length": Range(10, 50), "mult": Range(1.0, 3.0, 0.5), "src": ["close", "open"]}
+    points = latin_hypercube(space, 10, seed=1)
+    strata = sorted(int((p["length"] - 10) / 4) for p in points)
+    assert strata == list(range(10))
+    assert {p["mult"] for p in points} <= {1.0, 1.5, 2.0, 2.5, 3.0}
+    assert random_sample(space, 5, seed=2) == random_sample(space, 5, seed=2)
+    with pytest.raises(ValueError):
+        grid(space)
+
+    results = sweep(_runner(), STRATEGY, {"length": Range(10, 40)}, method="lhs", samples=8, seed=0)
+    assert all(isinstance(r.inputs["length"], int) for r in results)
+    with pytest.raises(KeyError):
+        sweep(_runner(), STRATEGY, {"nope": [1]})
+
+
+def test_sweep_dedupes_points_and_keeps_their_order():
+    runner = _runner()
+    space = {"length": [30, 10, 30], "mult": [2.0], "src": ["close"]}
+    results = sweep(runner, STRATEGY, space)
+    assert [r.inputs["length"] for r in results] == [30, 10, 30]
+    from core.pine_compiler import compile_pine
+    plan = compile_pine(STRATEGY)
+    for r in results:
+        assert r.result == runner.run_signals(plan.evaluate(runner.bars, r.inputs))[0]
+    assert results[0].inputs is not results[2].inputs
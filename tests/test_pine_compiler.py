@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from core.local_backtest import Bars, LocalBacktestRunner
+from core.pine_compiler import (
+    PineSyntaxError,
+    UnsupportedConstructError,
+    compile_pine,
+    parse,
+    tokenize,
+    unparse,
+)
+
+BB_STRATEGY = """//@version=5
+strategy("Bollinger Bands Strategy", overlay=true)
+
+length = input.int(20, "BB Length")
+mult = input.float(2.0, "BB Std Dev")
+[middle, upper, lower] = ta.bb(close, length, mult)
+
+longCondition = close < lower
+shortCondition = close > upper
+
+if (longCondition)
+    strategy.entry("BB Long", strategy.long)
+
+if (shortCondition)
+    strategy.entry("BB Short", strategy.short)
+
+plot(middle, "Middle Band", color=color.blue)
+"""
+
+EMA_CROSS = """//@version=5
+strategy("EMA Cross")
+fast = ta.ema(close, 10)
+slow = ta.ema(close,
+     30)
+if ta.crossover(fast, slow)
+    strategy.entry("L", strategy.long)
+else if ta.crossunder(fast, slow)
+    strategy.close("L")
+"""
+
+
+def _bars(n=400, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    return Bars(np.arange(n) * 60, close, close * 1.01, close * 0.99, close, np.ones(n))
+
+
+def test_tokenize_indent_and_continuation():
+    kinds = [t.kind for t in tokenize(EMA_CROSS)]
+    assert kinds.count("INDENT") == kinds.count("DEDENT") == 2
+    assert kinds[-1] == "EOF"
+
+
+def test_compile_bollinger_inputs_and_cse():
+    plan = compile_pine(BB_STRATEGY)
+    assert plan.title == "Bollinger Bands Strategy"
+    assert plan.inputs["length"].default == 20
+    assert plan.inputs["mult"].kind == "float"
+    assert sum(step.op == "ta.bb" for step in plan.steps) == 1
+    assert [o.direction for o in plan.orders] == ["long", "short"]
+
+
+def test_evaluate_matches_manual_arrays():
+    bars = _bars()
+    signals = compile_pine(BB_STRATEGY).evaluate(bars, {"length": 10})
+    basis = np.convolve(bars.close, np.ones(10) / 10, "valid")
+    windows = np.lib.stride_tricks.sliding_window_view(bars.close, 10)
+    lower = basis - 2.0 * windows.std(axis=-1)
+    np.testing.assert_array_equal(signals.long_entry[9:], bars.close[9:] < lower - 1e-9)
+    assert not signals.long_entry[:9].any()
+
+
+def test_else_if_close_and_runner():
+    bars = _bars()
+    signals = compile_pine(EMA_CROSS).evaluate(bars)
+    assert signals.long_entry.any()
+    assert not (signals.long_entry & signals.long_exit).any()
+    result = LocalBacktestRunner(bars).run_backtest(EMA_CROSS)
+    assert result.total_trades == int(signals.long_entry.sum())
+
+
+@pytest.mark.parametrize("line, message", [
+    ("for i = 0 to 10\n    x = i", "for loops"),
+    ('strategy.exit("x", "L", profit=10)', "strategy.exit"),
+    ("x = request.security(syminfo.tickerid, 'D', close)", "request.security"),
+])
+def test_unsupported_constructs(line, message):
+    src = '//@version=5\nstrategy("t")\n' + line + "\n"
+    with pytest.raises(UnsupportedConstructError, match=message) as info:
+        compile_pine(src)
+    assert info.value.line == 3
+
+
+def test_syntax_errors_have_positions():
+    with pytest.raises(PineSyntaxError) as info:
+        compile_pine('//@version=5\nstrategy("t")\nx = ta.sma(close, 10\n')
+    assert "unclosed" in str(info.value)
+    with pytest.raises(PineSyntaxError, match="undeclared identifier 'foo'"):
+        compile_pine('//@version=5\nstrategy("t")\nx = foo + 1\n')
+    with pytest.raises(PineSyntaxError, match="strategy"):
+        compile_pine('//@version=5\nindicator("t")\n')
+
+
+def test_unparse_round_trips():
+    source = BB_STRATEGY + "x = not (close > open and volume > 1) ? -(high - low) * 2 : (hl2 + 1)[2]\n"
+    tree = parse(source)
+    assert parse(unparse(tree)) == tree
+    assert parse(unparse(parse(EMA_CROSS))) == parse(EMA_CROSS)
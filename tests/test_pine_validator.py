@@ -0,0 +1,92 @@
+from core.evaluator import PopulationEvaluator
+from core.pine_validator import PineValidator, extract_code, validate
+from core.result_extractor import BacktestResult
+
+GOOD = """//@version=5
+strategy("EMA cross", overlay=true)
+fast = input.int(9, "Fast", minval=1)
+slow = ta.ema(close, 21)
+[macdLine, signalLine, _] = ta.macd(close, 12, 26, 9)
+var int count = 0
+if ta.crossover(ta.ema(close, fast), slow) and macdLine > signalLine
+    count := count + 1
+    strategy.entry("L", strategy.long, qty=strategy.position_size + 1)
+else if ta.crossunder(ta.ema(close, fast), slow)
+    strategy.close("L", comment="exit")
+"""
+
+
+def _messages(code):
+    return [(e.line, e.message) for e in validate(code).errors]
+
+
+def test_valid_strategy_passes():
+    assert validate(GOOD).ok
+
+
+def test_errors_are_positioned():
+    code = """//@version=5
+strategy("Bad")
+x = ta.emma(close, 10)
+if close > y
+    strategy.entry("L", strategy.long)
+y = ta.sma(close, 5)
+if close < x
+z = ta.sma(close, 5
+"""
+    assert _messages(code) == [
+        (3, "unknown 'ta.emma'"),
+        (4, "'y' used before its declaration"),
+        (7, "'if' without an indented body"),
+        (8, "unclosed '('"),
+    ]
+    error = validate("//@version=5\nstrategy(\"S\")\nz = foo + 1\n").errors[0]
+    assert (error.line, error.col, str(error)) == (3, 5, "3:5: undeclared identifier 'foo'")
+
+
+def test_declaration_checks():
+    assert _messages('strategy("S")\n') == [(1, "missing //@version=5 annotation")]
+    assert _messages('//@version=5\nplot(close)\n') == [(1, "missing strategy() declaration")]
+    assert _messages('//@version=5\nstrategy("A")\nstrategy("B")\n') == [(3, "duplicate strategy() declaration")]
+    assert (2, "unterminated string") in _messages('//@version=5\nstrategy("A", title="unterminated)\n')
+
+
+def test_extract_code_strips_fences_and_prose():
+    text = "Here is a strategy:\n\n```pinescript\n" + GOOD + "```\n\nIt buys crossovers.\n"
+    assert extract_code(text) == GOOD
+    assert extract_code("Sure!\n" + GOOD + "\nThis strategy buys dips.") == GOOD
+
+
+def test_validator_repairs_and_counts():
+    validator = PineValidator()
+    wrapped = "```\n" + GOOD.replace("//@version=5\n", "").replace("strategy(", "indicator(", 1) + "```"
+    report = validator.check(wrapped)
+    assert report.ok and report.repaired and report.code.startswith("//@version=5\nstrategy(")
+    assert validator.clean(GOOD) == GOOD
+    assert validator.clean("//@version=5\nstrategy(\"S\")\nif close > ta.nope(close)\n") is None
+    assert (validator.stats.checked, validator.stats.passed,
+            validator.stats.repaired, validator.stats.rejected) == (3, 1, 1, 1)
+
+
+class CountingRunner:
+    def __init__(self):
+        self.codes = []
+
+    def run_backtest(self, code):
+        self.codes.append(code)
+        return BacktestResult(1.0, 0.0, 0.0, 1, 0.0, 0.0)
+
+
+class ProfitScorer:
+    def score(self, result):
+        return result.net_profit_pct
+
+
+def test_evaluator_skips_rejected_strategies():
+    runner = CountingRunner()
+    evaluator = PopulationEvaluator(runner, ProfitScorer(), validator=PineValidator())
+    bad = "//@version=5\nstrategy(\"S\")\nx = undefined_thing\n"
+    good, rejected = evaluator.evaluate([GOOD, bad])
+    assert good.score == 1.0 and good.error is None
+    assert rejected.score == 0.0 and rejected.error.startswith("invalid Pine: 3:5:")
+    assert runner.codes == [GOOD]
@@ -0,0 +1,77 @@
+import threading
+import time
+from core.pipeline import Pipeline, Stage, StageError, backtest_stage, persist_stage, score_stage
+from core.result_extractor import BacktestResult
+from core.scorer import BaseScorer
+
+
+class LenRunner:
+    def run_backtest(self, code):
+        if code == "boom":
+            raise RuntimeError("bad script")
+        return BacktestResult(float(len(code)), 0.0, 0.0, 1, 0.5)
+
+
+class ProfitScorer(BaseScorer):
+    def score(self, result):
+        return result.net_profit_pct / 100
+
+
+def test_slow_stages_overlap_and_keep_order():
+    def slow(x):
+        time.sleep(0.05)
+        return x + 1
+
+    pipe = Pipeline([Stage("a", slow, workers=2), Stage("b", slow, workers=2)], queue_size=2)
+    start = time.perf_counter()
+    assert pipe.run(range(8)) == [i + 2 for i in range(8)]
+    # lockstep would take 2 * 4 waves * 0.05s; overlapped stages need ~5 waves
+    assert time.perf_counter() - start < 0.35
+
+
+def test_backpressure_bounds_items_in_flight():
+    produced, consumed, peak = [0], [0], [0]
+    lock = threading.Lock()
+
+    def source():
+        for i in range(50):
+            with lock:
+                produced[0] += 1
+                peak[0] = max(peak[0], produced[0] - consumed[0])
+            yield i
+
+    def sink(x):
+        time.sleep(0.002)
+        with lock:
+            consumed[0] += 1
+        return x
+
+    Pipeline([Stage("fast", lambda x: x, workers=2), Stage("slow", sink)], queue_size=3).run(source())
+    # 3 queues of 3, plus one item held by each worker and the feeder
+    assert peak[0] <= 3 * 3 + 4
+
+
+def test_failures_and_batched_persist():
+    saved = []
+    pipe = Pipeline([
+        Stage("check", lambda g: g if g["code"] != "explode" else 1 / 0),
+        backtest_stage(LenRunner(), workers=2),
+        score_stage(ProfitScorer()),
+        persist_stage(3, batch_size=4, save=lambda rows, generation: saved.append((generation, len(rows)))),
+    ])
+    out = pipe.run({"code": c, "score": 0.0, "meta": {}} for c in ["aa", "boom", "explode", "aaaa"])
+    assert [g["score"] for g in (out[0], out[1], out[3])] == [0.02, 0.0, 0.04]
+    assert "RuntimeError" in out[1]["meta"]["error"]
+    assert out[0]["meta"]["metrics"]["total_trades"] == 1
+    assert isinstance(out[2], StageError) and out[2].stage == "check"
+    assert sum(n for _, n in saved) == 3 and {g for g, _ in saved} == {3}
+
+
+def test_pipelined_initial_population(monkeypatch):
+    from core import controller
+    monkeypatch.setattr(controller, "generate_strategy",
+                        lambda prompt, sample=0, bypass_cache=False: "x" * (sample + 1))
+    monkeypatch.setattr(controller, "persist_stage", lambda generation, **kw: Stage("persist", lambda g: g))
+    pop = controller.create_initial_population_pipelined(5, LenRunner(), ProfitScorer(), llm_workers=3)
+    assert [g["code"] for g in pop] == ["x", "xx", "xxx", "xxxx", "xxxxx"]
+    assert [g["score"] for g in pop] == [0.01, 0.02, 0.03, 0.04, 0.05]
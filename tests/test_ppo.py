@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+
+from core import controller
+from core.local_backtest import Bars, LocalBacktestRunner
+from core.ppo import N_ACTIONS, Policy, PPOConfig, apply_actions, featurize, gae
+from core.market_data import MarketDataRunner, MarketDataStore
+from core.reinforcement import PPOTrainer, TrainerFactory
+from core.scorer import scorer_factory
+from tests.test_genetic_ops import BB, RSI
+
+
+def _bars(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return Bars(np.arange(n) * 86400, close, close * 1.01, close * 0.99, close, np.ones(n))
+
+
+def test_config_matches_config_yaml():
+    cfg = PPOConfig.from_yaml()
+    assert (cfg.learning_rate, cfg.n_steps, cfg.batch_size) == (0.0003, 2048, 64)
+
+
+def test_gae_matches_hand_computation():
+    rewards = np.array([[1.0], [0.0], [2.0]])
+    values = np.array([[0.5], [0.5], [0.5]])
+    dones = np.array([[0.0], [1.0], [0.0]])
+    adv, ret = gae(rewards, values, dones, np.array([1.0]), gamma=0.9, lam=1.0)
+    # episode 1: steps 0-1 (terminal after 1); episode 2 bootstraps from last_values
+    assert np.allclose(adv[:, 0], [1.0 + 0.9 * 0.0 - 0.5, -0.5, 2.0 + 0.9 * 1.0 - 0.5])
+    assert np.allclose(ret, adv + values)
+
+
+def test_actions_edit_slots():
+    features = featurize(BB, score=0.3)
+    assert features.shape[0] == 2 and np.all(features[:, -1] == 0.3)  # length and mult inputs
+    assert apply_actions(BB, [0, 0]) is None
+    child = apply_actions(BB, [4, 1])  # length +25% (capped at maxval 22), mult -25%
+    assert "input.int(22" in child and "input.float(1.5" in child
+    swapped = apply_actions(RSI, [0, 0, 0, 0, 1])  # ta.sma -> ta.ema
+    assert "ta.ema(close, 50)" in swapped
+
+
+def test_policy_act_update_and_state_round_trip():
+    policy = Policy(PPOConfig(batch_size=4, n_epochs=2), seed=0)
+    obs = [featurize(BB), featurize(RSI), featurize(BB, 0.5)]
+    actions, logp, values = policy.act(obs)
+    assert [len(a) for a in actions] == [2, 5, 2] and all((a >= 0).all() and (a < N_ACTIONS).all() for a in actions)
+    assert np.all(logp < 0) and values.shape == (3,)
+    state = json.loads(json.dumps(policy.get_state()))
+    expected = policy.act(obs)[1]
+    stats = policy.update(obs, actions, logp, np.array([1.0, -1.0, 0.5]), np.array([0.2, 0.1, 0.3]))
+    assert set(stats) == {"policy_loss", "value_loss", "entropy", "clip_fraction"}
+    restored = Policy(PPOConfig(batch_size=4, n_epochs=2), seed=1)
+    restored.set_state(state)
+    assert np.allclose(restored.act(obs)[1], expected)
+
+
+def test_trainer_epoch_keeps_best_and_is_batched():
+    runner = LocalBacktestRunner(_bars())
+    trainer = TrainerFactory.get_trainer("ppo", runner=runner, scorer=scorer_factory(), seed=0,
+                                         config=PPOConfig(n_steps=64, batch_size=16), n_envs=8)
+    assert isinstance(trainer, PPOTrainer)
+    population = [{"code": c, "score": e.score, "meta": e.meta}
+                  for c, e in zip((BB, RSI), trainer._evaluate([BB, RSI]))]
+    assert population[0]["score"] == scorer_factory().score(runner.run_backtest(BB))
+    new_pop = trainer.train_epoch(population)
+    assert len(new_pop) == 2
+    assert new_pop[0]["score"] >= max(g["score"] for g in population)
+    assert "metrics" in new_pop[0]["meta"]
+    assert trainer.last_stats["entropy"] > 0
+
+
+def test_controller_runs_ppo_only_on_local_data(tmp_path):
+    bars = _bars(100)
+    path = tmp_path / "bars.npz"
+    np.savez(path, **{name: getattr(bars, name) for name in ("time", "open", "high", "low", "close", "volume")})
+    runner = controller.local_runner(str(path), start_date=10 * 86400, end_date=30 * 86400)
+    assert isinstance(runner, LocalBacktestRunner) and len(runner.bars) == 20
+    MarketDataStore(tmp_path / "store").write("BTC", "1D", bars)
+    store_runner = controller.local_runner(str(tmp_path / "store"), "BTC", "1D")
+    assert isinstance(store_runner, MarketDataRunner)
+    assert store_runner.run_backtest(BB) == LocalBacktestRunner(bars).run_backtest(BB)
+    with pytest.raises(ValueError, match="symbol and a timeframe"):
+        controller.local_runner(str(tmp_path / "store"))
+    with pytest.raises(ValueError, match="--data"):
+        controller.run_pipeline("ppo", 1, 2, False, checkpoint_dir=None)
+    with pytest.raises(ValueError, match="executor queue"):
+        controller.run_pipeline("ga", 1, 2, False, checkpoint_dir=None, executor="queue", data=str(path))
+    with pytest.raises(ValueError, match="--run-id"):
+        controller.run_pipeline("ga", 1, 2, False, checkpoint_dir=None, exchange=str(tmp_path / "x"))
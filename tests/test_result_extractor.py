@@ -1,4 +1,43 @@
-from core.result_extractor import extract_from_html
-html = open("tests/fixtures/sample_tv_report.html", encoding="utf-8").read()
-metrics = extract_from_html(html)
-assert metrics["net_profit_pct"] == pytest.approx(12.34)
+import pytest
+from core.result_extractor import ReportParser, extract_from_html, extract_report
+
+TRADES = """
+<div>Net profit</div><div><span>1,234.50 USD</span><span>−4.20%</span></div>
+<table><thead><tr><th>Trade #</th><th>Type</th><th>Price</th></tr></thead>
+<tbody><tr><td>1</td><td>Entry <b>long</b></td><td>101.5</td></tr>
+<tr><td>1</td><td>Exit long</td><td>105&nbsp;USD</td></tr></tbody></table>
+"""
+
+
+def _sample():
+    with open("tests/fixtures/sample_tv_report.html", encoding="utf-8") as fh:
+        return fh.read()
+
+
+def test_extract_from_html():
+    metrics = extract_from_html(_sample())
+    assert metrics["net_profit_pct"] == pytest.approx(12.34)
+    assert metrics["total_trades"] == 100
+    assert metrics["win_rate"] == pytest.approx(55.0)
+    assert metrics["profit_factor"] == pytest.approx(1.23)
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 4096])
+def test_streamed_chunks_match_whole_page(size):
+    html = _sample() + TRADES
+    chunks = [html[i:i + size] for i in range(0, len(html), size)]
+    assert extract_report(chunks) == extract_report(html)
+
+
+def test_trade_table_and_missing_fields():
+    parser = ReportParser()
+    parser.feed(TRADES)
+    report = parser.close()
+    assert report.metrics == {"net_profit_pct": -4.2}
+    assert report.missing == ["max_drawdown_pct", "profit_factor", "sharpe_ratio", "total_trades", "win_rate"]
+    assert report.trades == [
+        {"Trade #": "1", "Type": "Entry long", "Price": "101.5"},
+        {"Trade #": "1", "Type": "Exit long", "Price": "105 USD"},
+    ]
+    with pytest.raises(ValueError, match="max_drawdown_pct, profit_factor, sharpe_ratio"):
+        extract_from_html(TRADES)
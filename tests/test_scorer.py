@@ -7,3 +7,29 @@ def test_default_scorer():
     br = BacktestResult(net_profit_pct=10, max_drawdown_pct=5, sharpe_ratio=2, total_trades=100, win_rate=0.6)
     score = scorer.score(br)
     assert 0 <= score <= 5
+
+def test_score_batch_is_bit_compatible():
+    import numpy as np
+    from core.scorer import results_to_columns
+    rng = np.random.default_rng(0)
+    results = [
+        BacktestResult(*rng.normal(0, 80, 3), int(rng.integers(0, 900)), rng.uniform(-0.2, 1.2), rng.normal())
+        for _ in range(500)
+    ]
+    results += [BacktestResult(float("nan"), -0.0, float("inf"), 0, -0.0), BacktestResult(100, 50, 3, 500, 1)]
+    scorer = DefaultScorer(ScoreConfig(profit_w=0.3, drawdown_w=0.3, sharpe_w=0.1, winrate_w=0.2, tradecount_w=0.1))
+    batch = scorer.score_batch(results_to_columns(results))
+    assert batch.tolist() == [scorer.score(r) for r in results]
+
+def test_base_scorer_default_batch_accepts_structured_arrays():
+    import numpy as np
+    from core.scorer import BaseScorer
+
+    class TradesScorer(BaseScorer):
+        def score(self, result):
+            return result.total_trades / 10
+
+    arr = np.zeros(3, dtype=[("total_trades", "i8"), ("win_rate", "f8"), ("net_profit_pct", "f8"),
+                             ("max_drawdown_pct", "f8"), ("sharpe_ratio", "f8")])
+    arr["total_trades"] = [1, 2, 3]
+    assert TradesScorer().score_batch(arr).tolist() == [0.1, 0.2, 0.3]
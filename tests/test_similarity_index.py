@@ -0,0 +1,112 @@
+from core.genetic_ops import mutate
+from core.reinforcement import GATrainer
+from core.similarity_index import SimilarityIndex, population_diversity, tokens
+from tests.test_genetic_ops import BB, RSI
+
+BB_REWRITE = """//@version=5
+// Bollinger mean reversion, renamed
+strategy("Mean reversion")
+len = input.int(20, "Length", minval=5, maxval=22)
+k = input.float(2.00, "Multiplier")
+[mid, up, dn] = ta.bb(close, len, k)
+if close < dn
+\tstrategy.entry("Buy", strategy.long)
+if close > up
+\tstrategy.close("Buy")
+"""
+
+
+def test_tokens_ignore_names_labels_and_comments():
+    assert tokens(BB) == tokens(BB_REWRITE)
+    assert tokens(BB) != tokens(BB.replace("ta.bb", "ta.kc"))
+
+
+def test_near_clones_are_found_and_distinct_strategies_are_not():
+    index = SimilarityIndex(threshold=0.9)
+    index.add("bb", BB, value=1.5)
+    index.add("rsi", RSI)
+    assert len(index) == 2 and "bb" in index
+    match = index.nearest(BB_REWRITE)
+    assert (match.key, match.similarity, match.value) == ("bb", 1.0, 1.5)
+    assert [m.key for m in index.query(RSI.replace("r < 30", "r < 25"), threshold=0.5)] == ["rsi"]
+    assert index.nearest(RSI.replace("ta.rsi(close, 14)", "ta.mom(close, 10) + ta.atr(14)")) is None
+    assert index.add_unique("again", BB_REWRITE).key == "bb" and "again" not in index
+    assert population_diversity([BB, RSI, BB_REWRITE]) == 2 / 3
+
+
+def test_from_database_indexes_stored_strategies(monkeypatch):
+    from database.db_handler import get_engine, init_db
+    from database.models import Base
+    from database.strategy_db import save_strategies
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    Base.metadata.drop_all(bind=get_engine())
+    init_db()
+    try:
+        save_strategies([{"code": BB, "score": 2.0, "meta": {}}, {"code": RSI, "score": 1.0, "meta": {}},
+                         {"code": BB_REWRITE, "score": 1.0, "meta": {"score_estimated": True}}],
+                        generation=1)
+        index = SimilarityIndex.from_database()
+        assert len(index) == 3
+        assert sorted((m.value is None, m.value) for m in index.query(BB_REWRITE)) == [(False, 2.0), (True, None)]
+    finally:
+        Base.metadata.drop_all(bind=get_engine())
+
+
+class CountingRunner:
+    def __init__(self):
+        self.calls = 0
+
+    def run_backtest(self, code):
+        self.calls += 1
+        return code
+
+
+class LenScorer:
+    def score(self, result):
+        return float(len(result))
+
+
+def test_ga_skips_only_near_clones_with_the_same_literals():
+    index = SimilarityIndex(threshold=0.8)  # one mutated literal keeps ~0.9 of the shingles
+    index.add("old", BB_REWRITE, value=10.0)
+    runner = CountingRunner()
+    trainer = GATrainer(runner, LenScorer(), seed=0, similarity_index=index, near_clone_weight=0.5)
+    mutants = [m for m in (mutate(BB, trainer.rng) for _ in range(20)) if m and tokens(m) != tokens(BB)]
+    assert any(index.nearest(m) for m in mutants)
+    assert trainer._near_clones(mutants) == {}  # new parameters are real back-tests
+    clones = trainer._near_clones([BB, RSI])
+    assert list(clones) == [0] and clones[0]["score"] == 5.0
+    assert clones[0]["meta"]["near_clone_of"] == "old" and clones[0]["meta"]["score_estimated"]
+
+    population = [{"code": code, "score": 0.0, "meta": {}} for code in (BB, RSI) * 5]
+    new_pop = trainer.train_epoch(population)
+    skipped = [g for g in new_pop if "near_clone_of" in g["meta"]]
+    assert runner.calls == len(population) - len(trainer.select_elites(population)) - len(skipped)
+    assert len(index) > 1  # evaluated children were indexed
+
+
+def test_min_diversity_floor():
+    parents = [{"code": BB, "score": 1.0}, {"code": RSI, "score": 1.0}]
+    index = SimilarityIndex(threshold=0.8)
+    plain = GATrainer(CountingRunner(), LenScorer(), seed=3, similarity_index=index)
+    diverse = GATrainer(CountingRunner(), LenScorer(), seed=3, similarity_index=index, min_diversity=0.5)
+    family = [p["code"] for p in parents]
+    assert population_diversity(family + diverse.breed(parents, 10), 0.8) > \
+        population_diversity(family + plain.breed(parents, 10), 0.8)
+
+
+def test_pipelined_generation_skips_near_clones_and_indexes_children(monkeypatch):
+    from core import controller
+    saved = []
+    monkeypatch.setattr("database.strategy_db.save_strategies", lambda rows, generation, run_id=None: saved.extend(rows))
+    monkeypatch.setattr(controller, "save_strategies", lambda rows, generation, run_id=None: saved.extend(rows))
+    index = SimilarityIndex(threshold=0.8)
+    index.add("old", BB_REWRITE, value=10.0)
+    runner = CountingRunner()
+    trainer = GATrainer(runner, LenScorer(), seed=0, similarity_index=index)
+    monkeypatch.setattr(trainer, "breed", lambda parents, n: [BB, RSI])
+    population = [{"code": RSI.replace("14", str(n)), "score": float(n), "meta": {}} for n in range(2, 12)]
+    new_pop = controller.train_epoch_pipelined(trainer, population, generation=1, backtest_workers=2)
+    assert runner.calls == 1 and len(new_pop) == 4 and len(saved) == 4
+    assert [g["score"] for g in new_pop if g["meta"].get("score_estimated")] == [5.0]
+    assert len(index) == 2  # the back-tested RSI child was indexed
@@ -1,11 +1,14 @@
 import os
 import pytest
 from database.strategy_db import save_strategy, get_strategies
-from database.db_handler import init_db
+from database.db_handler import get_engine, init_db
+from database.models import Base
 
 @pytest.fixture(autouse=True)
 def use_memory_db(monkeypatch):
     monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    # the in-memory engine is cached across tests; start each from empty tables
+    Base.metadata.drop_all(bind=get_engine())
     init_db()
     yield
 
@@ -27,3 +30,95 @@ def test_get_with_filters():
     assert all(r.generation == 1 for r in res1)
     top1 = get_strategies(limit=1)
     assert len(top1) == 1
+
+def test_save_strategies_bulk():
+    from database.strategy_db import save_strategies
+    pop = [{"code": f"c{i}", "score": i / 10, "meta": {"i": i}} for i in range(50)]
+    assert save_strategies(pop, generation=3) == 50
+    assert save_strategies([]) == 0
+    rows = get_strategies(generation=3)
+    assert len(rows) == 50
+    assert sorted(r.meta["i"] for r in rows) == list(range(50))
+
+def test_metric_columns_and_leaderboard():
+    from core.result_extractor import BacktestResult
+    from database.strategy_db import get_leaderboard, save_strategies
+    save_strategy(1, 0.9, "a", {}, result=BacktestResult(10, -5, 2.0, 40, 0.6, 1.5))
+    save_strategies([
+        {"code": "b", "score": 0.8, "meta": {"metrics": {"sharpe_ratio": 0.5, "max_drawdown_pct": -30,
+                                                         "total_trades": 5}}},
+        {"code": "c", "score": 0.7, "meta": {}},
+    ], generation=1)
+    top = get_leaderboard(limit=5)
+    assert [r.code for r in top] == ["a", "b", "c"]
+    assert top[0].total_trades == 40 and top[0].sharpe_ratio == 2.0
+    assert top[2].sharpe_ratio is None
+    assert [r.code for r in get_leaderboard(min_sharpe=1.0)] == ["a"]
+    assert [r.code for r in get_leaderboard(max_drawdown=20, min_trades=1)] == ["a"]
+    save_strategy(1, 0.6, "d", {"metrics": {"max_drawdown_pct": 12}})
+    assert get_leaderboard(limit=5)[-1].max_drawdown_pct == -12
+    assert [r.code for r in get_leaderboard(max_drawdown=20)] == ["a", "d"]
+
+def test_top_k_per_generation():
+    from database.strategy_db import get_top_k_per_generation, save_strategies
+    for gen in (1, 2, 3):
+        save_strategies([{"code": f"g{gen}s{i}", "score": i} for i in range(5)], generation=gen)
+    board = get_top_k_per_generation(k=2)
+    assert list(board) == [1, 2, 3]
+    assert [r.code for r in board[2]] == ["g2s4", "g2s3"]
+    assert list(get_top_k_per_generation(k=1, generations=[3])) == [3]
+
+def test_init_db_upgrades_old_schema(monkeypatch, tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    with create_engine(url).begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE strategies (id INTEGER PRIMARY KEY, generation INTEGER NOT NULL,"
+            " score FLOAT NOT NULL, code TEXT NOT NULL, meta JSON NOT NULL, created_at DATETIME NOT NULL)"
+        ))
+    monkeypatch.setenv("DATABASE_URL", url)
+    init_db()
+    from database.db_handler import get_engine
+    inspector = inspect(get_engine())
+    assert "sharpe_ratio" in {c["name"] for c in inspector.get_columns("strategies")}
+    assert "ix_strategies_generation_score" in {i["name"] for i in inspector.get_indexes("strategies")}
+    save_strategy(1, 0.5, "x", {"metrics": {"win_rate": 0.5}})
+    assert get_strategies()[0].win_rate == 0.5
+
+def test_iter_strategies_streams_projected_rows():
+    from database.strategy_db import iter_strategies, save_strategies
+    save_strategies([{"code": "x" * 100, "score": i} for i in range(25)], generation=1)
+    rows = list(iter_strategies(columns=("id", "score"), chunk_size=7))
+    assert len(rows) == 25
+    assert rows[0]._fields == ("id", "score")
+    assert [r.score for r in rows] == list(range(25))
+    assert next(iter_strategies(chunk_size=3)).code == "x" * 100
+    with pytest.raises(ValueError):
+        next(iter_strategies(columns=("nope",)))
+
+def test_keyset_pagination_by_score():
+    from database.strategy_db import get_strategy_page, save_strategies
+    save_strategies([{"code": f"c{i}", "score": i % 4} for i in range(10)], generation=1)
+    seen, cursor = [], None
+    while True:
+        page, cursor = get_strategy_page(after=cursor, limit=3, columns=("generation",), order_by="score")
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert len(seen) == 10 and len({r.id for r in seen}) == 10
+    assert [r.score for r in seen] == sorted((i % 4 for i in range(10)), reverse=True)
+    ids, cursor = get_strategy_page(limit=4)
+    assert cursor == (ids[-1].id,)
+
+def test_rescore_strategies_uses_batch_scores():
+    from core.result_extractor import BacktestResult
+    from core.scorer import DefaultScorer, ScoreConfig
+    from database.strategy_db import rescore_strategies, save_strategies
+    results = [BacktestResult(i * 5, -i, i / 4, i * 10, i / 10, 1.0) for i in range(7)]
+    save_strategies([{"code": f"c{i}", "score": 0.0, "result": r} for i, r in enumerate(results)]
+                    + [{"code": "failed", "score": 0.25}], generation=1)
+    scorer = DefaultScorer(ScoreConfig(profit_w=1, drawdown_w=0, sharpe_w=0, winrate_w=0, tradecount_w=0))
+    assert rescore_strategies(scorer, chunk_size=3) == 7
+    by_code = {r.code: r.score for r in get_strategies()}
+    assert [by_code[f"c{i}"] for i in range(7)] == [scorer.score(r) for r in results]
+    assert by_code["failed"] == 0.25
@@ -1,9 +1,119 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
 import pytest
 from unittest.mock import patch
-from core.strategy_generator import generate_strategy
+from core.strategy_generator import _retry_delay, generate_strategies, generate_strategy
 
 @patch("core.strategy_generator._ask_gpt")
 def test_generate_strategy(mock_ask):
     mock_ask.return_value = "//@version=5\nstrategy(...)"
     code = generate_strategy("測試")
     assert code.startswith("//@version=5")
+
+
+def test_retry_after_is_capped():
+    def error(retry_after):
+        return SimpleNamespace(response=SimpleNamespace(headers={"retry-after": retry_after}))
+
+    assert _retry_delay(error("2.5"), 0, 1.0) == 2.5
+    assert _retry_delay(error("86400"), 0, 1.0) == 60.0
+    assert 0 <= _retry_delay(error("soon"), 20, 1.0) <= 60.0
+
+
+@pytest.fixture
+def stub_openai(monkeypatch):
+    """本地 stub HTTP server：第一個請求回 429，其餘延遲 0.2 秒後回傳。"""
+    state = {"calls": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with lock:
+                state["calls"] += 1
+                first = state["calls"] == 1
+                state["in_flight"] += 1
+                state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+            try:
+                if first:
+                    payload, status = {"error": {"message": "rate limited"}}, 429
+                else:
+                    time.sleep(0.2)
+                    tag = re.search(r"prompt \d+", body["messages"][1]["content"]).group()
+                    content = "//@version=5\n// " + tag
+                    payload, status = {
+                        "id": "x", "object": "chat.completion", "created": 0, "model": body["model"],
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                    }, 200
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    yield state
+    server.shutdown()
+
+
+def test_generate_strategies_concurrent_with_retry(stub_openai):
+    prompts = [f"prompt {i:02d}" for i in range(10)]
+    start = time.perf_counter()
+    codes = generate_strategies(prompts, concurrency=5)
+    elapsed = time.perf_counter() - start
+    assert codes == [f"//@version=5\n// {p}" for p in prompts]
+    assert stub_openai["calls"] == 11  # one 429 retried
+    assert stub_openai["max_in_flight"] <= 5
+    assert elapsed < 10 * 0.2
+
+
+def test_async_batches_close_their_client(stub_openai, monkeypatch):
+    from core import strategy_generator
+
+    clients = []
+    real = strategy_generator._new_async_client
+
+    def tracked():
+        clients.append(real())
+        return clients[-1]
+
+    monkeypatch.setattr(strategy_generator, "_new_async_client", tracked)
+    generate_strategies(["prompt 01", "prompt 02"], concurrency=2)
+    generate_strategies(["prompt 03"])
+    assert len(clients) == 2 and all(c.is_closed() for c in clients)
+
+
+def test_response_cache_hits_and_bypass(stub_openai, tmp_path):
+    from core.llm_cache import LLMResponseCache
+    from core.strategy_generator import configure_response_cache
+
+    cache = LLMResponseCache(tmp_path / "llm.db", ttl=3600)
+    configure_response_cache(cache)
+    try:
+        first = generate_strategies(["prompt 01", "prompt 01"], concurrency=2)
+        calls = stub_openai["calls"]
+        assert generate_strategies(["prompt 01", "prompt 01"]) == first
+        assert stub_openai["calls"] == calls
+        assert cache.stats.hits == 2 and len(cache) == 2  # one entry per sample
+        generate_strategies(["prompt 01"], bypass_cache=True)
+        assert stub_openai["calls"] == calls + 1
+    finally:
+        configure_response_cache(None)
+        cache.close()